@@ -0,0 +1,104 @@
+# chat/activity.py
+"""
+Per-member inbox activity stream.
+
+Every new message records (last_activity, last_message) on the thread's
+ThreadMembership rows with a single UPDATE and pushes an 'inbox' event to
+each member's inbox socket (InboxConsumer), so clients can move the thread to
+the top without refetching. The inbox query reads its order straight from the
+viewer's membership rows (indexed by profile, -last_activity), and the
+ChatThread row - encryption key, settings - is not rewritten per message.
+
+The preview is stored as a pointer to the message; its text only travels in
+the socket event, since message content is encrypted at rest. Members a
+message is shadow-hidden from (in its deleted_by, i.e. they blocked the
+sender) get neither the update nor the event.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from core.realtime import broadcast_many
+
+from .models import ChatMessage, ThreadMembership
+
+PREVIEW_LENGTH = 100
+
+
+def inbox_group(profile_id):
+    """Channel-layer group joined by every inbox socket a profile has open"""
+    return f'inbox_{profile_id}'
+
+
+def preview_for(message, content=None):
+    """Short inbox preview for a message; content is the plaintext (message.content is encrypted on save)"""
+    if message.client_encrypted_content:
+        return '[Encrypted]'
+    if content:
+        return content[:PREVIEW_LENGTH]
+    if message.is_voice_message:
+        return '[Voice message]'
+    return '[Attachment]'
+
+
+def inbox_event(profile_id, thread_id, message, at, preview):
+    """(group, payload) telling one member's inbox that a thread moved to the top"""
+    return inbox_group(profile_id), {
+        'type': 'inbox.event',
+        'action': 'thread_activity',
+        'thread_id': thread_id,
+        'message_id': message.id if message else None,
+        'sender_id': message.sender_id if message else None,
+        'last_activity': at.isoformat(),
+        'preview': preview,
+    }
+
+
+def record_activity(thread_id, message=None, preview='', at=None):
+    """
+    Move a thread to the top of every member's inbox: one UPDATE of its
+    membership rows, then an inbox event per member once the transaction commits.
+    """
+    return record_activity_many({thread_id: message}, preview=preview, at=at)
+
+
+def record_activity_many(messages_by_thread, preview='', at=None):
+    """
+    record_activity for several threads at once ({thread_id: message}), e.g. a
+    post shared into many DMs. Three queries however many threads are passed.
+    """
+    if not messages_by_thread:
+        return 0
+    at = at or timezone.now()
+    thread_ids = list(messages_by_thread)
+    members = ThreadMembership.objects.filter(thread_id__in=thread_ids)
+
+    message_threads = {m.id: tid for tid, m in messages_by_thread.items() if m is not None}
+    hidden = [
+        (message_threads[message_id], profile_id)
+        for message_id, profile_id in ChatMessage.deleted_by.through.objects.filter(
+            chatmessage_id__in=list(message_threads)
+        ).values_list('chatmessage_id', 'userprofile_id')
+    ] if message_threads else []
+    if hidden:
+        members = members.exclude(reduce(or_, (Q(thread_id=t, profile_id=p) for t, p in hidden)))
+    member_rows = list(members.values_list('thread_id', 'profile_id'))
+
+    if len(thread_ids) == 1:
+        message = messages_by_thread[thread_ids[0]]
+        state = {'last_message': message} if message is not None else {}
+    else:
+        # Each row points at its own thread's newest message (the one just written)
+        newest = ChatMessage.objects.filter(thread_id=OuterRef('thread_id')).order_by('-created_at', '-id')
+        state = {'last_message': Subquery(newest.values('id')[:1])}
+    updated = members.update(last_activity=at, **state)
+
+    events = [
+        inbox_event(profile_id, thread_id, messages_by_thread[thread_id], at, preview)
+        for thread_id, profile_id in member_rows
+    ]
+    transaction.on_commit(lambda: broadcast_many(events))
+    return updated
@@ -0,0 +1,142 @@
+# chat/direct_threads.py
+"""
+Lookup and creation of 1-on-1 (direct) threads through DirectThreadIndex.
+
+Every DM has one index row keyed by the ordered (min_profile_id, max_profile_id)
+pair, so finding the DM between two profiles is a single unique-index lookup
+instead of a double join over the participants table. Creating a DM goes
+through here so the row is written in the same transaction; the unique
+constraint turns a concurrent duplicate into an IntegrityError we recover from.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+
+from .models import ChatThread, DirectThreadIndex, ThreadMembership
+
+logger = logging.getLogger(__name__)
+
+
+def ordered_pair(profile_a_id, profile_b_id):
+    return (profile_a_id, profile_b_id) if profile_a_id < profile_b_id else (profile_b_id, profile_a_id)
+
+
+def get_direct_thread(profile_a, profile_b):
+    """The DM between two profiles, or None"""
+    low, high = ordered_pair(profile_a.id, profile_b.id)
+    return ChatThread.objects.filter(
+        direct_index__min_profile_id=low, direct_index__max_profile_id=high
+    ).first()
+
+
+def get_direct_thread_ids(profile, other_ids):
+    """{other_profile_id: thread_id} for the DMs profile has with any of other_ids (one query)"""
+    lower = [pid for pid in other_ids if pid < profile.id]
+    higher = [pid for pid in other_ids if pid > profile.id]
+    if not lower and not higher:
+        return {}
+    rows = DirectThreadIndex.objects.filter(
+        Q(min_profile_id=profile.id, max_profile_id__in=higher)
+        | Q(max_profile_id=profile.id, min_profile_id__in=lower)
+    ).values_list('min_profile_id', 'max_profile_id', 'thread_id')
+    return {
+        (high if low == profile.id else low): thread_id
+        for low, high, thread_id in rows
+    }
+
+
+def _create_direct_thread(initiator, other, **fields):
+    thread = ChatThread.objects.create(initiator=initiator, is_group=False, **fields)
+    thread.participants.add(initiator, other)
+    low, high = ordered_pair(initiator.id, other.id)
+    DirectThreadIndex.objects.create(min_profile_id=low, max_profile_id=high, thread=thread)
+    return thread
+
+
+def get_or_create_direct_thread(initiator, other, **fields):
+    """
+    Return (thread, created) for the DM between initiator and other.
+    fields are passed to ChatThread when a new thread is created.
+    """
+    thread = get_direct_thread(initiator, other)
+    if thread:
+        return thread, False
+    try:
+        with transaction.atomic():
+            return _create_direct_thread(initiator, other, **fields), True
+    except IntegrityError:
+        # Another request created the DM between our lookup and insert
+        thread = get_direct_thread(initiator, other)
+        if thread is None:
+            raise
+        return thread, False
+
+
+def bulk_create_direct_threads(initiator, others, **fields):
+    """
+    Create DMs between initiator and each of others with bulk inserts.
+    Returns {other_profile_id: thread_id}. If any pair was created concurrently,
+    falls back to get_or_create_direct_thread for each one.
+    """
+    if not others:
+        return {}
+    try:
+        with transaction.atomic():
+            threads = ChatThread.objects.bulk_create([
+                ChatThread(initiator=initiator, is_group=False, **fields) for _ in others
+            ])
+            ThreadMembership.objects.bulk_create([
+                ThreadMembership(thread_id=thread.id, profile_id=profile_id)
+                for other, thread in zip(others, threads)
+                for profile_id in (initiator.id, other.id)
+            ])
+            DirectThreadIndex.objects.bulk_create([
+                DirectThreadIndex(
+                    min_profile_id=min(initiator.id, other.id),
+                    max_profile_id=max(initiator.id, other.id),
+                    thread=thread
+                )
+                for other, thread in zip(others, threads)
+            ])
+            return {other.id: thread.id for other, thread in zip(others, threads)}
+    except IntegrityError:
+        logger.info(f"Concurrent DM creation for {initiator.id}; creating threads one by one")
+        return {
+            other.id: get_or_create_direct_thread(initiator, other, **fields)[0].id
+            for other in others
+        }
+
+
+def backfill_direct_index(batch_size=2000):
+    """
+    Index every existing two-person, non-group thread that has no index row.
+    Where a pair has several DMs (duplicates from before the index), the most
+    recently updated one becomes canonical. Returns (indexed, duplicate_threads).
+    """
+    candidates = ChatThread.objects.filter(is_group=False, direct_index__isnull=True) \
+        .annotate(num_participants=Count('participants')).filter(num_participants=2) \
+        .order_by('-updated_at').values_list('id', flat=True)
+
+    taken = set(DirectThreadIndex.objects.values_list('min_profile_id', 'max_profile_id'))
+    indexed = 0
+    duplicates = 0
+    batch = list(candidates)
+    for start in range(0, len(batch), batch_size):
+        thread_ids = batch[start:start + batch_size]
+        members = {}
+        for thread_id, profile_id in ThreadMembership.objects.filter(thread_id__in=thread_ids) \
+                .values_list('thread_id', 'profile_id'):
+            members.setdefault(thread_id, []).append(profile_id)
+
+        rows = []
+        for thread_id in thread_ids:
+            pair = ordered_pair(*members[thread_id])
+            if pair in taken:
+                duplicates += 1
+                continue
+            taken.add(pair)
+            rows.append(DirectThreadIndex(min_profile_id=pair[0], max_profile_id=pair[1], thread_id=thread_id))
+        DirectThreadIndex.objects.bulk_create(rows, ignore_conflicts=True)
+        indexed += len(rows)
+    return indexed, duplicates
@@ -5,7 +5,7 @@ Handles group-specific operations like removing members, promoting admins, etc.
 from rest_framework import permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from chat.models import ChatThread
+from chat.models import ChatThread, ThreadMembership
 from core.views import _get_profile
 import logging
 
@@ -30,8 +30,7 @@ class ChatThreadRemoveParticipant(APIView):
             return Response({'detail': 'Not a group chat'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if user is admin
-        is_admin = thread.admin == profile or thread.admins.filter(id=profile.id).exists() or thread.initiator == profile
-        if not is_admin:
+        if not thread.is_admin(profile):
             logger.warning(f"[GROUP forbidden] Profile {profile.id} attempted remove on thread {pk}. "
                           f"Initiator: {thread.initiator_id}, Admin: {thread.admin_id}")
             return Response({'detail': 'Only admins can remove members'}, status=status.HTTP_403_FORBIDDEN)
@@ -48,13 +47,9 @@ class ChatThreadRemoveParticipant(APIView):
             if participant == profile:
                 return Response({'detail': 'Use leave endpoint to remove yourself'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Remove participant
+            # Remove participant (their membership row, admin role included)
             thread.participants.remove(participant)
             
-            # Also remove from admins if they were admin
-            if thread.admins.filter(id=participant.id).exists():
-                thread.admins.remove(participant)
-            
             # Send notification to removed user
             from core.models import Notification
             Notification.objects.create(
@@ -92,8 +87,7 @@ class ChatThreadPromoteAdmin(APIView):
             return Response({'detail': 'Not a group chat'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if user is admin
-        is_admin = thread.admin == profile or thread.admins.filter(id=profile.id).exists() or thread.initiator == profile
-        if not is_admin:
+        if not thread.is_admin(profile):
             logger.warning(f"[GROUP forbidden] Profile {profile.id} attempted promote on thread {pk}. "
                           f"Initiator: {thread.initiator_id}, Admin: {thread.admin_id}")
             return Response({'detail': 'Only admins can promote members'}, status=status.HTTP_403_FORBIDDEN)
@@ -107,15 +101,17 @@ class ChatThreadPromoteAdmin(APIView):
             participant = UserProfile.objects.get(id=participant_id)
             
             # Check if participant is in group
-            if not thread.participants.filter(id=participant.id).exists():
+            membership = thread.membership(participant)
+            if not membership:
                 return Response({'detail': 'User is not a member of this group'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Check if already admin
-            if thread.admins.filter(id=participant.id).exists():
+            if membership.role == ThreadMembership.ROLE_ADMIN:
                 return Response({'detail': 'User is already an admin'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Promote to admin
-            thread.admins.add(participant)
+            membership.role = ThreadMembership.ROLE_ADMIN
+            membership.save(update_fields=['role'])
             
             # Send notification to promoted user
             from core.models import Notification
@@ -154,8 +150,7 @@ class ChatThreadDemoteAdmin(APIView):
             return Response({'detail': 'Not a group chat'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if user is admin
-        is_admin = thread.admin == profile or thread.admins.filter(id=profile.id).exists() or thread.initiator == profile
-        if not is_admin:
+        if not thread.is_admin(profile):
             logger.warning(f"[GROUP forbidden] Profile {profile.id} attempted admin action on thread {pk}. "
                            f"Thread initiator: {thread.initiator_id}, admin: {thread.admin_id}")
             return Response({'detail': 'Only admins can demote admins'}, status=status.HTTP_403_FORBIDDEN)
@@ -172,13 +167,12 @@ class ChatThreadDemoteAdmin(APIView):
             if thread.admin == participant:
                 return Response({'detail': 'Cannot demote primary admin. Transfer ownership first.'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Check if actually an admin
-            if not thread.admins.filter(id=participant.id).exists():
+            # Demote from admin (no row matches if they are not an admin)
+            demoted = thread.memberships.filter(profile=participant, role=ThreadMembership.ROLE_ADMIN) \
+                .update(role=ThreadMembership.ROLE_MEMBER)
+            if not demoted:
                 return Response({'detail': 'User is not an admin'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Demote from admin
-            thread.admins.remove(participant)
-            
             # Send notification to demoted user
             from core.models import Notification
             Notification.objects.create(
@@ -227,20 +221,16 @@ class ChatThreadTransferOwnership(APIView):
             from core.models import UserProfile
             new_admin = UserProfile.objects.get(id=participant_id)
             
-            # Check if participant is in group
-            if not thread.participants.filter(id=new_admin.id).exists():
+            # Check if participant is in group; make sure new admin has the admin role
+            if not thread.set_member_state(new_admin, role=ThreadMembership.ROLE_ADMIN):
                 return Response({'detail': 'User is not a member of this group'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Transfer ownership
             old_admin = thread.admin
             thread.admin = new_admin
             
-            # Make sure new admin is in admins list
-            if not thread.admins.filter(id=new_admin.id).exists():
-                thread.admins.add(new_admin)
-            
-            # Keep old admin as regular admin (or remove if you want)
-            # thread.admins.remove(old_admin)  # Uncomment to demote old owner
+            # Keep old admin as regular admin (or demote if you want)
+            # thread.set_member_state(old_admin, role=ThreadMembership.ROLE_MEMBER)  # Uncomment to demote old owner
             
             thread.save()
             
@@ -271,7 +261,7 @@ class ChatThreadLeave(APIView):
         # If you're the primary admin, you need to transfer ownership first
         if thread.admin == profile:
             # Check if there are other admins
-            other_admins = thread.admins.exclude(id=profile.id)
+            other_admins = thread.admin_profiles().exclude(id=profile.id)
             if other_admins.exists():
                 # Auto-transfer to first other admin
                 new_admin = other_admins.first()
@@ -282,23 +272,14 @@ class ChatThreadLeave(APIView):
                 # Promote first remaining member to admin
                 new_admin = thread.participants.exclude(id=profile.id).first()
                 thread.admin = new_admin
-                thread.admins.add(new_admin)
+                thread.set_member_state(new_admin, role=ThreadMembership.ROLE_ADMIN)
                 thread.save()
                 logger.info(f"[GROUP] Auto-promoted {new_admin.user.username} to admin as {profile.user.username} left")
 
         
-        # Clear message history for this user
-        # This ensures that if they rejoin, they don't see old messages
-        from chat.models import ChatMessage
-        messages = thread.messages.all()
-        Membership = ChatMessage.deleted_by.through
-        new_relations = [Membership(chatmessage_id=m.id, userprofile_id=profile.id) for m in messages]
-        Membership.objects.bulk_create(new_relations, ignore_conflicts=True)
-
-        # Remove from participants and admins
+        # Remove from participants (drops their admin role with the membership row).
+        # Old history stays hidden if they rejoin: rejoining starts a new watermark
         thread.participants.remove(profile)
-        if thread.admins.filter(id=profile.id).exists():
-            thread.admins.remove(profile)
         
         # If no participants left, archive the group instead of deleting
         # This allows users to search for it and rejoin later
@@ -313,7 +294,7 @@ class ChatThreadLeave(APIView):
         admins = set()
         if thread.admin:
             admins.add(thread.admin)
-        for a in thread.admins.all():
+        for a in thread.admin_profiles():
             admins.add(a)
             
         for admin_profile in admins:
@@ -350,9 +331,9 @@ class GroupSearch(APIView):
         groups = ChatThread.objects.filter(
             is_group=True,
             group_name__icontains=query
-        ).filter(
+        ).exclude(status='deleted').filter(
             # Show if user is NOT a participant OR if user hid the group (soft deleted)
-            ~Q(participants=profile) | Q(hidden_by=profile)
+            ~Q(participants=profile) | Q(memberships__profile=profile, memberships__hidden=True)
         ).distinct().prefetch_related('participants__user')[:20]
         
         serializer = ChatThreadSerializer(groups, many=True, context={'request': request})
@@ -371,24 +352,23 @@ class GroupRejoin(APIView):
             return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
         try:
-            thread = ChatThread.objects.get(pk=pk, is_group=True)
+            thread = ChatThread.objects.exclude(status='deleted').get(pk=pk, is_group=True)
         except ChatThread.DoesNotExist:
             return Response({'detail': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Check if user is already a participant
-        is_participant = thread.participants.filter(id=profile.id).exists()
+        membership = thread.membership(profile)
         
-        if is_participant:
+        if membership:
             # If participant BUT hidden/deleted, UNHIDE (Rejoin)
-            if thread.hidden_by.filter(id=profile.id).exists() or thread.deleted_by.filter(id=profile.id).exists():
-                thread.hidden_by.remove(profile)
-                thread.deleted_by.remove(profile)
+            if membership.hidden or membership.deleted:
+                thread.set_member_state(profile, hidden=False, deleted=False)
                 logger.info(f"[GROUP] {profile.user.username} un-hid/rejoined group {pk}")
             else:
                 return Response({'detail': 'Already a member of this group'}, status=status.HTTP_400_BAD_REQUEST)
         else:
-            # Not a participant - Add user to group
-            thread.participants.add(profile)
+            # Not a participant - Add user to group; messages from before they joined stay hidden
+            thread.add_members(profile)
             logger.info(f"[GROUP] {profile.user.username} joined group {pk}")
         
         # If group was archived, reactivate it
@@ -397,7 +377,7 @@ class GroupRejoin(APIView):
             # If no admin exists, make the rejoining user the admin
             if not thread.admin:
                 thread.admin = profile
-                thread.admins.add(profile)
+                thread.set_member_state(profile, role=ThreadMembership.ROLE_ADMIN)
             thread.save()
             logger.info(f"[GROUP] Group {pk} reactivated by {profile.user.username}")
         
@@ -406,7 +386,7 @@ class GroupRejoin(APIView):
         admins = set()
         if thread.admin:
             admins.add(thread.admin)
-        for a in thread.admins.all():
+        for a in thread.admin_profiles():
             admins.add(a)
             
         for admin_profile in admins:
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:43
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    # Attachments uploaded before the media pipeline existed will never be processed
+    MessageAttachment = apps.get_model('chat', 'MessageAttachment')
+    MessageAttachment.objects.update(processing_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_chatthread_unique_group_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messageattachment',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='messageattachment',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Generated thumbnails: {size: {format: storage name}}'),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_messageattachment_processing_status_and_more'),
+        ('core', '0007_post_image_variants_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_type', models.CharField(choices=[('image', 'Image'), ('video', 'Video'), ('audio', 'Audio'), ('document', 'Document'), ('voice', 'Voice Message')], max_length=20)),
+                ('mime_type', models.CharField(blank=True, max_length=100)),
+                ('total_size', models.BigIntegerField(help_text='Declared file size in bytes')),
+                ('received_bytes', models.BigIntegerField(default=0)),
+                ('is_voice', models.BooleanField(default=False)),
+                ('content', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete'), ('aborted', 'Aborted')], default='uploading', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='core.userprofile')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='chat.chatthread')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['owner', 'status'], name='chat_upload_owner_i_57188a_idx'), models.Index(fields=['status', 'updated_at'], name='chat_upload_status_b8951d_idx')],
+            },
+        ),
+    ]
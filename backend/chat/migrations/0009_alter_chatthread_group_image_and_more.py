@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:47
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatthread',
+            name='group_image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_media_storage, upload_to='group_avatars/'),
+        ),
+        migrations.AlterField(
+            model_name='messageattachment',
+            name='file',
+            field=models.FileField(storage=core.storage.get_media_storage, upload_to='chat_attachments/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='messageattachment',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_media_storage, upload_to='chat_thumbnails/%Y/%m/%d/'),
+        ),
+    ]
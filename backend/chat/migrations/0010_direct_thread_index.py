@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_direct_index(apps, schema_editor):
+    ChatThread = apps.get_model('chat', 'ChatThread')
+    DirectThreadIndex = apps.get_model('chat', 'DirectThreadIndex')
+    Membership = ChatThread.participants.through
+
+    thread_ids = list(
+        ChatThread.objects.filter(is_group=False).annotate(n=Count('participants')).filter(n=2)
+        .order_by('-updated_at').values_list('id', flat=True)
+    )
+    members = {}
+    for thread_id, profile_id in Membership.objects.filter(chatthread_id__in=thread_ids) \
+            .values_list('chatthread_id', 'userprofile_id').iterator():
+        members.setdefault(thread_id, []).append(profile_id)
+
+    # Most recently updated DM wins where a pair has duplicates
+    seen = set()
+    rows = []
+    for thread_id in thread_ids:
+        pair = tuple(sorted(members[thread_id]))
+        if pair not in seen:
+            seen.add(pair)
+            rows.append(DirectThreadIndex(min_profile_id=pair[0], max_profile_id=pair[1], thread_id=thread_id))
+    DirectThreadIndex.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_alter_chatthread_group_image_and_more'),
+        ('core', '0009_userprofile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectThreadIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.userprofile')),
+                ('min_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.userprofile')),
+                ('thread', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='direct_index', to='chat.chatthread')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('min_profile', 'max_profile'), name='unique_direct_thread_pair'), models.CheckConstraint(condition=models.Q(('min_profile__lt', models.F('max_profile'))), name='direct_thread_pair_ordered')],
+            },
+        ),
+        migrations.RunPython(backfill_direct_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# (old ChatThread M2M, ThreadMembership field, value) for per-member state
+MEMBER_STATE = [
+    ('admins', 'role', 'admin'),
+    ('muted_by', 'muted', True),
+    ('pinned_by', 'pinned', True),
+    ('hidden_by', 'hidden', True),
+    ('deleted_by', 'deleted', True),
+]
+
+
+def copy_member_state(apps, schema_editor):
+    ChatThread = apps.get_model('chat', 'ChatThread')
+    ThreadMembership = apps.get_model('chat', 'ThreadMembership')
+    for m2m, field, value in MEMBER_STATE:
+        through = getattr(ChatThread, m2m).through
+        pairs = through.objects.values_list('chatthread_id', 'userprofile_id')
+        by_thread = {}
+        for thread_id, profile_id in pairs.iterator():
+            by_thread.setdefault(thread_id, []).append(profile_id)
+        for thread_id, profile_ids in by_thread.items():
+            # Only participants get state; stale rows for former members are dropped
+            ThreadMembership.objects.filter(thread_id=thread_id, profile_id__in=profile_ids).update(**{field: value})
+
+
+def restore_member_state(apps, schema_editor):
+    ChatThread = apps.get_model('chat', 'ChatThread')
+    ThreadMembership = apps.get_model('chat', 'ThreadMembership')
+    for m2m, field, value in MEMBER_STATE:
+        through = getattr(ChatThread, m2m).through
+        rows = ThreadMembership.objects.filter(**{field: value}).values_list('thread_id', 'profile_id')
+        through.objects.bulk_create(
+            [through(chatthread_id=thread_id, userprofile_id=profile_id) for thread_id, profile_id in rows.iterator()],
+            batch_size=2000, ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_direct_thread_index'),
+        ('core', '0009_userprofile_follow_counts'),
+    ]
+
+    operations = [
+        # Adopt the existing participants table as the through model; no schema change
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ThreadMembership',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('thread', models.ForeignKey(db_column='chatthread_id', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='chat.chatthread')),
+                        ('profile', models.ForeignKey(db_column='userprofile_id', on_delete=django.db.models.deletion.CASCADE, related_name='thread_memberships', to='core.userprofile')),
+                    ],
+                    options={
+                        'db_table': 'chat_chatthread_participants',
+                        'unique_together': {('thread', 'profile')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='chatthread',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='chat_threads', through='chat.ThreadMembership', to='core.userprofile'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='role',
+            field=models.CharField(choices=[('member', 'Member'), ('admin', 'Admin')], default='member', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='muted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='pinned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='hidden',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='last_read',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='joined_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='threadmembership',
+            index=models.Index(fields=['profile', 'deleted', 'hidden'], name='chat_member_inbox_idx'),
+        ),
+        migrations.RunPython(copy_member_state, restore_member_state),
+        migrations.RemoveField(
+            model_name='chatthread',
+            name='admins',
+        ),
+        migrations.RemoveField(
+            model_name='chatthread',
+            name='muted_by',
+        ),
+        migrations.RemoveField(
+            model_name='chatthread',
+            name='pinned_by',
+        ),
+        migrations.RemoveField(
+            model_name='chatthread',
+            name='hidden_by',
+        ),
+        migrations.RemoveField(
+            model_name='chatthread',
+            name='deleted_by',
+        ),
+    ]
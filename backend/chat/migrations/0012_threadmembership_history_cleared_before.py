@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_threadmembership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadmembership',
+            name='history_cleared_before',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='chatthread',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('archived', 'Archived'), ('blocked', 'Blocked'), ('pending', 'Pending Message Request'), ('rejected', 'Request Rejected'), ('deleted', 'Deleted')], default='pending', max_length=20),
+        ),
+    ]
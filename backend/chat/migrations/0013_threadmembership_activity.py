@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_activity(apps, schema_editor):
+    # Seed every membership from its thread: last bump time and newest message
+    ChatThread = apps.get_model('chat', 'ChatThread')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ThreadMembership = apps.get_model('chat', 'ThreadMembership')
+    ThreadMembership.objects.update(
+        last_activity=Subquery(ChatThread.objects.filter(pk=OuterRef('thread_id')).values('updated_at')[:1]),
+        last_message=Subquery(
+            ChatMessage.objects.filter(thread_id=OuterRef('thread_id')).order_by('-created_at', '-id').values('id')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_threadmembership_history_cleared_before'),
+        ('core', '0009_userprofile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadmembership',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='threadmembership',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage'),
+        ),
+        migrations.AddIndex(
+            model_name='threadmembership',
+            index=models.Index(fields=['profile', '-last_activity'], name='chat_member_activity_idx'),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
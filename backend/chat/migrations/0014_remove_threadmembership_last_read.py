@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_threadmembership_activity'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='threadmembership',
+            name='last_read',
+        ),
+    ]
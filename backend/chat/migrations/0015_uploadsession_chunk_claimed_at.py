@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0014_remove_threadmembership_last_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='chunk_claimed_at',
+            field=models.DateTimeField(blank=True, help_text='Set while a PUT is writing a chunk', null=True),
+        ),
+    ]
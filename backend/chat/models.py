@@ -1,6 +1,10 @@
+import os
+import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from core.models import UserProfile, Post
+from core.storage import get_media_storage
 
 class ChatThread(models.Model):
     STATUS_CHOICES = [
@@ -9,6 +13,7 @@ class ChatThread(models.Model):
         ('blocked', 'Blocked'),
         ('pending', 'Pending Message Request'),
         ('rejected', 'Request Rejected'),
+        ('deleted', 'Deleted'),  # detached from every member, messages being purged
     ]
     
     REQUEST_STATUS_CHOICES = [
@@ -17,7 +22,7 @@ class ChatThread(models.Model):
         ('none', 'None'),
     ]
     
-    participants = models.ManyToManyField(UserProfile, related_name='chat_threads')
+    participants = models.ManyToManyField(UserProfile, through='ThreadMembership', related_name='chat_threads')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -28,9 +33,8 @@ class ChatThread(models.Model):
     # Group Chat
     is_group = models.BooleanField(default=False)
     group_name = models.CharField(max_length=255, blank=True, null=True)
-    group_image = models.ImageField(upload_to='group_avatars/', blank=True, null=True)
+    group_image = models.ImageField(upload_to='group_avatars/', storage=get_media_storage, blank=True, null=True)
     admin = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='administered_groups_legacy')
-    admins = models.ManyToManyField(UserProfile, blank=True, related_name='administered_groups')
     
     # Group Permissions
     group_members_can_invite = models.BooleanField(default=True)
@@ -43,11 +47,7 @@ class ChatThread(models.Model):
     # Message Request System
     initiator = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='initiated_threads')
     
-    # Instagram-like features
-    muted_by = models.ManyToManyField(UserProfile, blank=True, related_name='muted_threads')
-    pinned_by = models.ManyToManyField(UserProfile, blank=True, related_name='pinned_threads')
-    hidden_by = models.ManyToManyField(UserProfile, blank=True, related_name='hidden_threads')
-    deleted_by = models.ManyToManyField(UserProfile, blank=True, related_name='deleted_threads')
+    # Per-member state (admin role, muted, pinned, hidden, deleted) lives on ThreadMembership
     disappearing_messages_duration = models.IntegerField(null=True, blank=True, help_text='Duration in seconds before messages disappear')
 
     class Meta:
@@ -70,6 +70,114 @@ class ChatThread(models.Model):
         participant_names = ', '.join([p.user.username for p in self.participants.all()[:2]])
         return f"Chat: {participant_names}"
 
+    def membership(self, profile):
+        """This profile's ThreadMembership, or None if they are not a participant"""
+        return self.memberships.filter(profile=profile).first()
+
+    def is_admin(self, profile, include_initiator=True):
+        """Owner (legacy admin field), admin-role member or, by default, the thread initiator"""
+        if self.admin_id == profile.id or (include_initiator and self.initiator_id == profile.id):
+            return True
+        return self.memberships.filter(profile=profile, role=ThreadMembership.ROLE_ADMIN).exists()
+
+    def admin_profiles(self):
+        return UserProfile.objects.filter(
+            thread_memberships__thread=self, thread_memberships__role=ThreadMembership.ROLE_ADMIN
+        )
+
+    def add_members(self, *profiles, **defaults):
+        """
+        Add members who only see messages sent from now on: a member who left
+        (and so lost their row) must not get their old history back on re-add.
+        """
+        defaults.setdefault('history_cleared_before', timezone.now())
+        self.participants.add(*profiles, through_defaults=defaults)
+
+    def set_member_state(self, profile, **state):
+        """Update one member's flags (muted, pinned, hidden, deleted, role...) in a single UPDATE"""
+        return self.memberships.filter(profile=profile).update(**state)
+
+    def surface_message(self, message):
+        """
+        Visibility bookkeeping for a new message: hide it from members who blocked
+        the sender and bring the thread back for anyone who hid or deleted it.
+        """
+        blockers = list(self.participants.exclude(id=message.sender_id).filter(blocked_users=message.sender_id))
+        if blockers:
+            message.deleted_by.add(*blockers)
+        self.restore_for_all()
+
+    def clear_history(self, profile, now=None):
+        """Hide everything sent so far from this member (one UPDATE, however long the thread)"""
+        return self.set_member_state(profile, history_cleared_before=now or timezone.now())
+
+    def restore_for_all(self):
+        """Un-hide/un-delete the thread for every member; only touches rows that need it"""
+        return self.memberships.filter(models.Q(hidden=True) | models.Q(deleted=True)) \
+            .update(hidden=False, deleted=False)
+
+
+class ThreadMembership(models.Model):
+    """
+    A participant of a ChatThread together with their per-thread state.
+    Uses the table of the original participants M2M, so every existing
+    participant row is a membership.
+    """
+    ROLE_MEMBER = 'member'
+    ROLE_ADMIN = 'admin'
+    ROLE_CHOICES = [
+        (ROLE_MEMBER, 'Member'),
+        (ROLE_ADMIN, 'Admin'),
+    ]
+
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='memberships', db_column='chatthread_id')
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='thread_memberships', db_column='userprofile_id')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=ROLE_MEMBER)
+    muted = models.BooleanField(default=False)
+    pinned = models.BooleanField(default=False)
+    hidden = models.BooleanField(default=False)
+    deleted = models.BooleanField(default=False)
+    joined_at = models.DateTimeField(default=timezone.now)
+    # Messages created at or before this are hidden from this member ("clear chat")
+    history_cleared_before = models.DateTimeField(null=True, blank=True)
+    # Inbox activity stream: when the thread last saw a message, and which one (the preview).
+    # Written with one UPDATE per message so the thread row itself is not rewritten
+    last_activity = models.DateTimeField(default=timezone.now)
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        db_table = 'chat_chatthread_participants'
+        unique_together = ('thread', 'profile')
+        indexes = [
+            # Inbox: a profile's visible threads
+            models.Index(fields=['profile', 'deleted', 'hidden'], name='chat_member_inbox_idx'),
+            # Inbox order: a profile's threads by latest activity
+            models.Index(fields=['profile', '-last_activity'], name='chat_member_activity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id} in thread {self.thread_id} ({self.role})"
+
+
+class DirectThreadIndex(models.Model):
+    """
+    Canonical 1-on-1 thread for a pair of profiles, keyed by (lower id, higher id).
+    The unique constraint makes DM lookup a single index probe and stops
+    concurrent requests from creating duplicate DMs. Maintained by chat.direct_threads.
+    """
+    min_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')
+    max_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')
+    thread = models.OneToOneField(ChatThread, on_delete=models.CASCADE, related_name='direct_index')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['min_profile', 'max_profile'], name='unique_direct_thread_pair'),
+            models.CheckConstraint(condition=models.Q(min_profile__lt=models.F('max_profile')), name='direct_thread_pair_ordered'),
+        ]
+
+    def __str__(self):
+        return f"DM {self.min_profile_id}:{self.max_profile_id} -> thread {self.thread_id}"
+
 
 class ChatMessage(models.Model):
     thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='messages')
@@ -106,7 +214,8 @@ class ChatMessage(models.Model):
             models.Index(fields=['expires_at']),
         ]
 
-    def save(self, *args, **kwargs):
+    def encrypt_content(self):
+        """Move plaintext content into encrypted_content (also used before bulk_create)"""
         from core.security.encryption import encrypt_text
         if self.content is not None:
             ciphertext, version = encrypt_text(self.content)
@@ -114,6 +223,16 @@ class ChatMessage(models.Model):
                 self.encrypted_content = ciphertext
                 self.key_version = version
             self.content = None # Never store plaintext in the database
+
+    def apply_thread_expiry(self):
+        """Stamp expires_at from the thread's disappearing-messages timer (new messages only)"""
+        if self._state.adding and self.expires_at is None and self.thread.disappearing_messages_duration:
+            from .retention import expiry_for
+            self.expires_at = expiry_for(self.thread.disappearing_messages_duration)
+
+    def save(self, *args, **kwargs):
+        self.encrypt_content()
+        self.apply_thread_expiry()
         super().save(*args, **kwargs)
     @property
     def is_edited(self):
@@ -133,13 +252,21 @@ class MessageAttachment(models.Model):
         ('voice', 'Voice Message'),
     ]
     
+    PROCESSING_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='chat_attachments/%Y/%m/%d/')
+    file = models.FileField(upload_to='chat_attachments/%Y/%m/%d/', storage=get_media_storage)
     file_type = models.CharField(max_length=20, choices=FILE_TYPE_CHOICES)
     file_size = models.IntegerField(help_text='File size in bytes')
     file_name = models.CharField(max_length=255)
-    thumbnail = models.ImageField(upload_to='chat_thumbnails/%Y/%m/%d/', null=True, blank=True)
+    thumbnail = models.ImageField(upload_to='chat_thumbnails/%Y/%m/%d/', storage=get_media_storage, null=True, blank=True)
     duration = models.IntegerField(null=True, blank=True, help_text='Duration in seconds for audio/video')
+    variants = models.JSONField(default=dict, blank=True, help_text='Generated thumbnails: {size: {format: storage name}}')
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -290,3 +417,47 @@ class UserRestriction(models.Model):
     
     def __str__(self):
         return f"{self.user.user.username} {self.restriction_type}ed {self.restricted_user.user.username}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked attachment upload in progress.
+    Chunks are appended to a temporary file; finalizing turns it into a chat message.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='upload_sessions')
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='upload_sessions')
+    file_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=20, choices=MessageAttachment.FILE_TYPE_CHOICES)
+    mime_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField(help_text='Declared file size in bytes')
+    received_bytes = models.BigIntegerField(default=0)
+    is_voice = models.BooleanField(default=False)
+    content = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    message = models.ForeignKey(ChatMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    chunk_claimed_at = models.DateTimeField(null=True, blank=True,
+                                            help_text='Set while a PUT is writing a chunk')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'status']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.received_bytes}/{self.total_size}) by {self.owner.user.username}"
+
+    @property
+    def temp_path(self):
+        """Where received chunks are stored until the upload is finalized"""
+        return os.path.join(settings.CHAT_UPLOAD_TEMP_DIR, f'{self.id}.part')
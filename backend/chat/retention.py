@@ -0,0 +1,143 @@
+# chat/retention.py
+"""
+Message retention: disappearing messages, cleared history and thread deletion.
+
+- A thread with disappearing_messages_duration set stamps expires_at on every
+  new message. Read paths filter expired rows with unexpired() so they vanish on
+  time; sweep_expired_messages removes the rows later, walking the expires_at
+  index in bounded batches so no single DELETE holds locks for long.
+- "Clear chat" sets ThreadMembership.history_cleared_before instead of writing a
+  deleted_by row per message; read paths compare created_at with visible_after().
+- Deleting a whole thread detaches it from every member right away and leaves
+  the messages to purge_thread, which deletes them in chunks in the background.
+
+The sweep_expired_messages management command runs both cleanups.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.realtime import broadcast_many, thread_event
+
+from .models import ChatMessage, ChatThread, DirectThreadIndex, ThreadMembership
+
+logger = logging.getLogger(__name__)
+
+# Longest timer a thread may set (90 days)
+MAX_DISAPPEARING_DURATION = 60 * 60 * 24 * 90
+
+# Stand-in watermark for members who never cleared their history
+HISTORY_START = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def unexpired(prefix='', now=None):
+    """
+    Q matching messages that have not expired yet.
+    prefix reaches the message through a relation, e.g. unexpired('messages__').
+    """
+    now = now or timezone.now()
+    return Q(**{f'{prefix}expires_at__isnull': True}) | Q(**{f'{prefix}expires_at__gt': now})
+
+
+def expiry_for(duration, now=None):
+    """expires_at for a message sent now into a thread with the given duration"""
+    if not duration:
+        return None
+    return (now or timezone.now()) + timedelta(seconds=duration)
+
+
+def expiries_for_threads(thread_ids, now=None):
+    """{thread_id: expires_at} for the threads in thread_ids with a timer set (one query)"""
+    now = now or timezone.now()
+    durations = ChatThread.objects.filter(
+        id__in=thread_ids, disappearing_messages_duration__gt=0
+    ).values_list('id', 'disappearing_messages_duration')
+    return {thread_id: expiry_for(duration, now) for thread_id, duration in durations}
+
+
+def visible_after(field='memberships__history_cleared_before'):
+    """
+    Expression for the viewer's history watermark, never NULL, for annotating a
+    ChatThread queryset already filtered to the viewer's membership.
+    Visible messages have created_at greater than it.
+    """
+    return Coalesce(F(field), Value(HISTORY_START, output_field=DateTimeField()))
+
+
+def sweep_expired_messages(batch_size=500, max_batches=None, now=None):
+    """
+    Delete messages whose expires_at has passed, oldest first, batch_size at a
+    time. Attachments, reactions and share links go with them through the
+    cascade (attachment files are released by gc_media_blobs). Each batch is
+    its own transaction and its message_deleted events go out after commit.
+    Returns the number of messages deleted.
+    """
+    now = now or timezone.now()
+    expired = ChatMessage.objects.filter(expires_at__lte=now).order_by('expires_at', 'id')
+
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = list(expired.values_list('id', 'thread_id')[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            ChatMessage.objects.filter(id__in=[message_id for message_id, _ in rows]).delete()
+        broadcast_many([
+            thread_event(thread_id, 'message_deleted', message_id=message_id, expired=True)
+            for message_id, thread_id in rows
+        ])
+        deleted += len(rows)
+        batches += 1
+
+    if deleted:
+        logger.info(f"Swept {deleted} expired messages in {batches} batches")
+    return deleted
+
+
+def _delete_messages_in_chunks(messages, batch_size):
+    """Delete a message queryset batch_size rows (and their cascades) per transaction"""
+    deleted = 0
+    while True:
+        ids = list(messages.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            ChatMessage.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+
+def retire_thread(thread):
+    """
+    Make a thread disappear for everyone in a few small statements: drop its
+    memberships and DM index row and mark it deleted. The messages stay until
+    purge_thread removes them.
+    """
+    with transaction.atomic():
+        ThreadMembership.objects.filter(thread=thread).delete()
+        DirectThreadIndex.objects.filter(thread=thread).delete()
+        ChatThread.objects.filter(pk=thread.pk).update(status='deleted', group_name=None)
+
+
+def purge_thread(thread_id, batch_size=1000):
+    """Delete a retired thread's messages in chunks, then the thread itself"""
+    if not ChatThread.objects.filter(pk=thread_id, status='deleted').exists():
+        # Not retired (or the retiring transaction rolled back): keep everything
+        logger.warning(f"Not purging thread {thread_id}: it is not marked deleted")
+        return 0
+    deleted = _delete_messages_in_chunks(ChatMessage.objects.filter(thread_id=thread_id), batch_size)
+    ChatThread.objects.filter(pk=thread_id, status='deleted').delete()
+    logger.info(f"Purged thread {thread_id} ({deleted} messages)")
+    return deleted
+
+
+def purge_deleted_threads(batch_size=1000):
+    """Finish purges that were interrupted (e.g. by a restart). Returns threads purged."""
+    thread_ids = list(ChatThread.objects.filter(status='deleted').values_list('id', flat=True))
+    for thread_id in thread_ids:
+        purge_thread(thread_id, batch_size)
+    return len(thread_ids)
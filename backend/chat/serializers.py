@@ -1,38 +1,43 @@
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from rest_framework import serializers
 from chat.models import (
-    ChatThread, ChatMessage, MessageAttachment, MessageReaction, TypingIndicator
+    ChatThread, ChatMessage, MessageAttachment, MessageReaction, TypingIndicator, ThreadMembership
 )
 from core.models import SharedPost, Post, UserProfile, UserEvent
-from core.serializers import UserProfileSerializer
+from core.serializers import ProfileSummarySerializer
+from core.utils.avatar_utils import get_avatar_url_from_profile
+from core.utils.media_urls import get_variant_urls, media_url
+from chat.retention import unexpired
 
 class MessageAttachmentSerializer(serializers.ModelSerializer):
     """Serializer for message attachments (images, videos, audio, documents)"""
     file_url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
     
     class Meta:
         model = MessageAttachment
         fields = ('id', 'file_url', 'file_type', 'file_size', 'file_name', 
-                  'thumbnail_url', 'duration', 'created_at')
+                  'thumbnail_url', 'variants', 'duration', 'processing_status', 'created_at')
         read_only_fields = ('created_at',)
     
     def get_file_url(self, obj):
-        request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+        if obj.file:
+            return media_url(obj.file.storage, obj.file.name, self.context.get('request'))
         return None
     
     def get_thumbnail_url(self, obj):
-        request = self.context.get('request')
-        if obj.thumbnail and request:
-            return request.build_absolute_uri(obj.thumbnail.url)
+        if obj.thumbnail:
+            return media_url(obj.thumbnail.storage, obj.thumbnail.name, self.context.get('request'))
         return None
 
+    def get_variants(self, obj):
+        return get_variant_urls(obj.file, obj.variants, self.context.get('request'))
+
 
 class MessageReactionSerializer(serializers.ModelSerializer):
     """Serializer for message reactions"""
-    user = UserProfileSerializer(read_only=True)
+    user = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = MessageReaction
@@ -40,7 +45,7 @@ class MessageReactionSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
 class ChatMessageSerializer(serializers.ModelSerializer):
-    sender = UserProfileSerializer(read_only=True)
+    sender = ProfileSummarySerializer(read_only=True)
     reply_to = serializers.SerializerMethodField()
     attachments = serializers.SerializerMethodField()
     reactions = serializers.SerializerMethodField()
@@ -112,7 +117,9 @@ class ChatMessageSerializer(serializers.ModelSerializer):
                 'file_type': att.file_type,
                 'file_size': att.file_size,
                 'file_name': att.file_name,
-                'duration': att.duration
+                'duration': att.duration,
+                'processing_status': att.processing_status,
+                'variants': get_variant_urls(att.file, att.variants, request)
             }
             if att.file and request:
                 data['file_url'] = request.build_absolute_uri(att.file.url)
@@ -204,26 +211,28 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             return None
 
     def _get_avatar_url(self, profile, request):
-        if profile.avatar:
-            if request:
-                return request.build_absolute_uri(profile.avatar.url)
-            return profile.avatar.url
-        elif profile.default_avatar_url:
-            return profile.default_avatar_url
-        else:
-            return f"https://api.dicebear.com/7.x/avataaars/svg?seed={profile.user.username}"
+        return get_avatar_url_from_profile(profile, request)
 
 
 class TypingIndicatorSerializer(serializers.ModelSerializer):
-    user = UserProfileSerializer(read_only=True)
+    user = ProfileSummarySerializer(read_only=True)
     is_active = serializers.BooleanField(read_only=True)
     class Meta:
         model = TypingIndicator
         fields = ('id', 'user', 'last_typed_at', 'is_active')
         read_only_fields = ('last_typed_at',)
 
+def admin_memberships():
+    """Prefetch for ChatThreadSerializer.admins: one query for a whole page of threads"""
+    return Prefetch(
+        'memberships',
+        queryset=ThreadMembership.objects.filter(role=ThreadMembership.ROLE_ADMIN).select_related('profile__user'),
+        to_attr='admin_memberships'
+    )
+
+
 class ChatThreadSerializer(serializers.ModelSerializer):
-    participants = UserProfileSerializer(many=True, read_only=True)
+    participants = ProfileSummarySerializer(many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
     is_group = serializers.BooleanField(read_only=True)
@@ -231,13 +240,64 @@ class ChatThreadSerializer(serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
     blocked_by_id = serializers.SerializerMethodField()
     
-    admin = UserProfileSerializer(read_only=True)
-    admins = UserProfileSerializer(many=True, read_only=True)
-    initiator = UserProfileSerializer(read_only=True)
+    admin = ProfileSummarySerializer(read_only=True)
+    admins = serializers.SerializerMethodField()
+    initiator = ProfileSummarySerializer(read_only=True)
+    is_muted = serializers.SerializerMethodField()
+    is_pinned = serializers.SerializerMethodField()
+    updated_at = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatThread
-        fields = ['id', 'participants', 'last_message', 'unread_count', 'updated_at', 'is_group', 'group_name', 'status', 'blocked_by_id', 'admin', 'admins', 'initiator']
+        fields = ['id', 'participants', 'last_message', 'unread_count', 'updated_at', 'is_group', 'group_name', 'status', 'blocked_by_id', 'admin', 'admins', 'initiator', 'is_muted', 'is_pinned', 'disappearing_messages_duration']
+        read_only_fields = ['disappearing_messages_duration']
+
+    def get_admins(self, obj):
+        if hasattr(obj, 'admin_memberships'):
+            admins = [m.profile for m in obj.admin_memberships]
+        else:
+            admins = obj.admin_profiles().select_related('user')
+        return ProfileSummarySerializer(admins, many=True, context=self.context).data
+
+    def _viewer_membership(self, obj):
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return None
+        cache = self.context.setdefault('_thread_memberships', {})
+        if obj.id not in cache:
+            cache[obj.id] = obj.memberships.filter(profile__user=request.user).values('muted', 'pinned', 'history_cleared_before', 'last_activity').first()
+        return cache[obj.id]
+
+    def _visible_messages(self, obj, profile):
+        """obj's messages this profile can see: not expired, deleted or before their cleared history"""
+        messages = obj.messages.filter(unexpired()).exclude(deleted_by=profile)
+        if hasattr(obj, 'visible_after'):
+            return messages.filter(created_at__gt=obj.visible_after)
+        membership = self._viewer_membership(obj)
+        if membership and membership['history_cleared_before']:
+            messages = messages.filter(created_at__gt=membership['history_cleared_before'])
+        return messages
+
+    def get_is_muted(self, obj):
+        # Inbox queries annotate the viewer's flags from their membership row
+        if hasattr(obj, 'is_muted'):
+            return bool(obj.is_muted)
+        membership = self._viewer_membership(obj)
+        return bool(membership and membership['muted'])
+
+    def get_updated_at(self, obj):
+        # Latest activity from the viewer's membership; message writes no longer touch the thread row
+        last_activity = getattr(obj, 'last_activity', None)
+        if last_activity is None:
+            membership = self._viewer_membership(obj)
+            last_activity = membership['last_activity'] if membership else obj.updated_at
+        return serializers.DateTimeField().to_representation(last_activity)
+
+    def get_is_pinned(self, obj):
+        if hasattr(obj, 'is_pinned'):
+            return bool(obj.is_pinned)
+        membership = self._viewer_membership(obj)
+        return bool(membership and membership['pinned'])
 
     def get_status(self, obj):
         if obj.is_group:
@@ -296,8 +356,10 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         return None
 
     def get_last_message(self, obj):
-        # Optimized: Use annotated last_message_id if available
-        if hasattr(obj, 'last_message_id') and obj.last_message_id:
+        # Optimized: Use annotated last_message_id if available (None: nothing visible)
+        if hasattr(obj, 'last_message_id'):
+            if not obj.last_message_id:
+                return None
             try:
                 msg = ChatMessage.objects.get(id=obj.last_message_id)
                 return ChatMessageSerializer(msg, context=self.context).data
@@ -306,11 +368,12 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         
         # Fallback for single object retrieval
         request = self.context.get('request')
-        messages = obj.messages.filter(is_deleted_for_everyone=False)
+        messages = obj.messages.filter(unexpired(), is_deleted_for_everyone=False)
         
         if request and request.user.is_authenticated:
             try:
-                messages = messages.exclude(deleted_by=request.user.userprofile)
+                messages = self._visible_messages(obj, request.user.userprofile) \
+                    .filter(is_deleted_for_everyone=False)
             except: pass
             
         last_msg = messages.order_by('-created_at').first()
@@ -319,13 +382,14 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         return None
 
     def get_unread_count(self, obj):
+        # The inbox annotates the count
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             try:
                 profile = request.user.userprofile
-                return obj.messages.filter(read=False).exclude(
-                    Q(sender=profile) | Q(deleted_by=profile)
-                ).count()
+                return self._visible_messages(obj, profile).filter(read=False).exclude(sender=profile).count()
             except:
                 pass
         return 0
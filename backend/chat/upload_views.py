@@ -0,0 +1,319 @@
+"""
+Resumable Upload Views
+Chunked attachment uploads: init -> PUT chunks -> finalize.
+
+Chunks are streamed from the request straight to a temporary file, so large
+videos and voice notes never sit in worker memory. Clients that lose their
+connection ask for the current offset and continue from there.
+"""
+import os
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from chat.models import ChatThread, UploadSession
+from chat.serializers import ChatMessageSerializer
+from core.realtime import broadcast_to_thread
+from core.services.media_service import MediaService
+from core.validators import (
+    get_file_type, sanitize_filename, validate_upload_size, validate_sniffed_type, SNIFF_BYTES
+)
+from core.views import _get_profile
+
+logger = logging.getLogger(__name__)
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def _session_state(session):
+    return {
+        'id': str(session.id),
+        'offset': session.received_bytes,
+        'total_size': session.total_size,
+        'status': session.status,
+        'chunk_size': settings.CHAT_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def _offset_response(session):
+    response = Response(_session_state(session))
+    response['Upload-Offset'] = str(session.received_bytes)
+    return response
+
+
+def _get_session(profile, upload_id):
+    return UploadSession.objects.filter(pk=upload_id, owner=profile).first()
+
+
+def remove_temp_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _parse_offset(request):
+    """
+    Read the chunk's start offset from 'Upload-Offset' or 'Content-Range: bytes start-end/total'.
+    Returns None if neither header is usable.
+    """
+    offset = request.headers.get('Upload-Offset')
+    if offset is None:
+        content_range = request.headers.get('Content-Range', '')
+        if content_range.startswith('bytes ') and '-' in content_range:
+            offset = content_range[6:].split('-', 1)[0]
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return None
+    return offset if offset >= 0 else None
+
+
+class UploadSessionCreate(APIView):
+    """Start a chunked upload for a thread"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        thread_id = request.data.get('thread')
+        file_name = request.data.get('file_name')
+        if not thread_id or not file_name:
+            return Response({'detail': 'Thread and file_name required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            total_size = int(request.data.get('file_size'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'file_size required'}, status=status.HTTP_400_BAD_REQUEST)
+        if total_size <= 0:
+            return Response({'detail': 'Empty file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            thread = ChatThread.objects.get(pk=thread_id, participants=profile)
+        except (ChatThread.DoesNotExist, ValueError):
+            return Response({'detail': 'Thread not found or access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        is_voice = str(request.data.get('voice', '')).lower() in ('1', 'true', 'yes')
+        file_type = get_file_type(file_name)
+        if not file_type:
+            return Response({'detail': 'Unsupported file type'}, status=status.HTTP_400_BAD_REQUEST)
+        if is_voice and file_type != 'audio':
+            return Response({'detail': 'Voice messages must be audio files'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            validate_upload_size(file_type, total_size)
+        except ValidationError as e:
+            return Response({'detail': e.messages[0]}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        session = UploadSession.objects.create(
+            owner=profile,
+            thread=thread,
+            file_name=sanitize_filename(os.path.basename(file_name))[:255],
+            file_type=file_type,
+            total_size=total_size,
+            is_voice=is_voice,
+            content=request.data.get('content', '') or ''
+        )
+        os.makedirs(settings.CHAT_UPLOAD_TEMP_DIR, exist_ok=True)
+        open(session.temp_path, 'wb').close()
+
+        return Response(_session_state(session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetail(APIView):
+    """
+    GET: current offset (for resuming)
+    PUT: append a chunk at the given offset
+    DELETE: abort the upload
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, upload_id):
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        session = _get_session(profile, upload_id)
+        if not session:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return _offset_response(session)
+
+    def put(self, request, upload_id):
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        offset = _parse_offset(request)
+        if offset is None:
+            return Response({'detail': 'Upload-Offset or Content-Range header required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return Response({'detail': 'Empty chunk'}, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.CHAT_UPLOAD_MAX_CHUNK_SIZE:
+            return Response({'detail': 'Chunk too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        session = _get_session(profile, upload_id)
+        if not session:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if offset + length > session.total_size:
+            return Response({'detail': 'Chunk exceeds declared file size'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Claim the offset with a conditional UPDATE instead of holding a row lock
+        # while the client trickles the chunk in; a stale claim from a dead worker
+        # can be taken over once the lease expires
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.CHAT_UPLOAD_CHUNK_CLAIM_SECONDS)
+        claimed = UploadSession.objects.filter(
+            Q(chunk_claimed_at__isnull=True) | Q(chunk_claimed_at__lt=stale),
+            pk=session.pk, status='uploading', received_bytes=offset
+        ).update(chunk_claimed_at=now)
+        if not claimed:
+            session.refresh_from_db()
+            if session.status != 'uploading':
+                return Response({'detail': f'Upload is {session.status}'}, status=status.HTTP_409_CONFLICT)
+            if offset != session.received_bytes:
+                # Client is out of sync (e.g. a retried chunk); tell it where to resume
+                return Response({'detail': 'Offset mismatch', **_session_state(session)},
+                                status=status.HTTP_409_CONFLICT)
+            return Response({'detail': 'Another chunk is being written', **_session_state(session)},
+                            status=status.HTTP_409_CONFLICT)
+        claim = UploadSession.objects.filter(pk=session.pk, chunk_claimed_at=now)
+
+        written = 0
+        mime_type = session.mime_type
+        try:
+            with open(session.temp_path, 'r+b') as out:
+                out.seek(offset)
+                stream = request.stream
+                while written < length:
+                    block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+
+                    if offset == 0 and written == 0 and not mime_type:
+                        # First bytes of the file: reject mismatched content before storing more
+                        mime_type = validate_sniffed_type(block[:SNIFF_BYTES], session.file_type)
+
+                    out.write(block)
+                    written += len(block)
+                out.truncate(offset + written)
+        except FileNotFoundError:
+            claim.update(chunk_claimed_at=None)
+            return Response({'detail': 'Upload expired'}, status=status.HTTP_410_GONE)
+        except ValidationError as e:
+            claim.update(status='aborted', chunk_claimed_at=None, updated_at=timezone.now())
+            remove_temp_file(session.temp_path)
+            return Response({'detail': e.messages[0]}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        # Only the holder of the claim may advance the offset; if the lease was
+        # taken over or the upload aborted meanwhile, this chunk is discarded
+        if not claim.filter(status='uploading', received_bytes=offset).update(
+            received_bytes=offset + written, mime_type=mime_type,
+            chunk_claimed_at=None, updated_at=timezone.now()
+        ):
+            session.refresh_from_db()
+            return Response({'detail': 'Upload changed while the chunk was written', **_session_state(session)},
+                            status=status.HTTP_409_CONFLICT)
+
+        session.refresh_from_db()
+        return _offset_response(session)
+
+    def delete(self, request, upload_id):
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        session = _get_session(profile, upload_id)
+        if not session:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if session.status == 'uploading':
+            session.status = 'aborted'
+            session.save(update_fields=['status', 'updated_at'])
+        remove_temp_file(session.temp_path)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalize(APIView):
+    """Turn a fully received upload into a chat message"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, upload_id):
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(pk=upload_id, owner=profile).first()
+            if not session:
+                return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            if session.status == 'complete' and session.message_id:
+                # Retried finalize after a dropped response
+                return Response(ChatMessageSerializer(session.message, context={'request': request}).data)
+            if session.status != 'uploading':
+                return Response({'detail': f'Upload is {session.status}'}, status=status.HTTP_409_CONFLICT)
+            if session.received_bytes != session.total_size:
+                return Response({'detail': 'Upload incomplete', **_session_state(session)},
+                                status=status.HTTP_409_CONFLICT)
+
+            if not session.thread.participants.filter(id=profile.id).exists():
+                return Response({'detail': 'Thread not found or access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+            try:
+                fh = open(session.temp_path, 'rb')
+            except FileNotFoundError:
+                return Response({'detail': 'Upload expired'}, status=status.HTTP_410_GONE)
+
+            with fh:
+                # Trust the file, not the counters: it must have exactly the declared
+                # size and still sniff as the declared type
+                try:
+                    if os.fstat(fh.fileno()).st_size != session.total_size:
+                        raise ValidationError('Uploaded file does not match the declared size')
+                    if validate_sniffed_type(fh.read(SNIFF_BYTES), session.file_type) != session.mime_type:
+                        raise ValidationError('File content does not match its type')
+                    fh.seek(0)
+                except ValidationError as e:
+                    session.status = 'aborted'
+                    session.save(update_fields=['status', 'updated_at'])
+                    temp_path = session.temp_path
+                    transaction.on_commit(lambda: remove_temp_file(temp_path))
+                    return Response({'detail': e.messages[0]}, status=status.HTTP_409_CONFLICT)
+
+                message = MediaService.create_attachment_message(
+                    profile, session.thread, File(fh, name=session.file_name),
+                    'voice' if session.is_voice else session.file_type,
+                    content=session.content,
+                    is_voice=session.is_voice
+                )
+
+            session.status = 'complete'
+            session.message = message
+            session.save(update_fields=['status', 'message', 'updated_at'])
+
+            temp_path = session.temp_path
+            transaction.on_commit(lambda: remove_temp_file(temp_path))
+
+            message_data = ChatMessageSerializer(message, context={'request': request}).data
+            transaction.on_commit(lambda: broadcast_to_thread(
+                session.thread_id, 'new_message', data=message_data, sender=profile.user.username
+            ))
+
+        return Response(message_data, status=status.HTTP_201_CREATED)
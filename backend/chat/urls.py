@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import group_views
+from . import upload_views
 
 urlpatterns = [
     # Threads
@@ -10,6 +11,7 @@ urlpatterns = [
     path('threads/<int:pk>/delete/', views.ChatThreadDestroy.as_view(), name='chat-thread-delete'),
     path('threads/<int:pk>/accept/', views.ChatThreadAccept.as_view(), name='chat-thread-accept'),
     path('threads/<int:pk>/reject/', views.ChatThreadReject.as_view(), name='chat-thread-reject'),
+    path('threads/<int:pk>/disappearing/', views.DisappearingMessagesSet.as_view(), name='chat-thread-disappearing'),
     
     # Group Management
     path('threads/<int:pk>/leave/', group_views.ChatThreadLeave.as_view(), name='chat-thread-leave'),
@@ -22,6 +24,13 @@ urlpatterns = [
     path('messages/', views.ChatMessageCreate.as_view(), name='chat-message-create'),
     path('messages/<int:pk>/delete/', views.ChatMessageDelete.as_view(), name='chat-message-delete'),
     path('messages/<int:pk>/update/', views.ChatMessageUpdate.as_view(), name='chat-message-update'),
+    path('messages/media/', views.ChatMediaUpload.as_view(), name='chat-media-upload'),
+    path('messages/voice/', views.ChatVoiceMessageUpload.as_view(), name='chat-voice-upload'),
+
+    # Resumable uploads
+    path('uploads/', upload_views.UploadSessionCreate.as_view(), name='chat-upload-create'),
+    path('uploads/<uuid:upload_id>/', upload_views.UploadSessionDetail.as_view(), name='chat-upload-detail'),
+    path('uploads/<uuid:upload_id>/finalize/', upload_views.UploadSessionFinalize.as_view(), name='chat-upload-finalize'),
     
     # Search
     path('search/', views.ChatMessageSearch.as_view(), name='chat-search'),
@@ -1,17 +1,28 @@
 from rest_framework import permissions, status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Prefetch, Count
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, Count, F
 from django.db import transaction
 from django.utils import timezone
 from core.models import UserProfile, Post, Notification, SharedPost, Follow
 from chat.models import (
-    ChatThread, ChatMessage, 
+    ChatThread, ChatMessage, ThreadMembership,
     UserRestriction, BlockedUser, MessageRequest, GroupInvitation
 )
 from core.serializers import NotificationSerializer
-from chat.serializers import ChatThreadSerializer, ChatMessageSerializer
+from chat.serializers import ChatThreadSerializer, ChatMessageSerializer, admin_memberships
 from core.views import _get_profile
+from core.utils.avatar_utils import get_avatar_url_from_profile
+from core.realtime import broadcast_to_thread
+from core.services.media_service import MediaService
+from core.services.follow_service import FollowService
+from .activity import preview_for, record_activity
+from .direct_threads import get_or_create_direct_thread
+from .retention import MAX_DISAPPEARING_DURATION, purge_thread, retire_thread, unexpired, visible_after
+from core.background import run_in_background
+from core.validators import validate_chat_attachment
 
 # ============================================================================
 # CHAT API VIEWS
@@ -33,16 +44,23 @@ class ChatThreadListCreate(APIView):
         
         # Subquery for last message to avoid massive joins
         last_message_subquery = ChatMessage.objects.filter(
+            unexpired(),
             thread=OuterRef('pk'),
+            created_at__gt=OuterRef('visible_after'),
             is_deleted_for_everyone=False
         ).exclude(
             deleted_by=profile
         ).order_by('-created_at').values('id')[:1]
 
-        # First, get all threads user participates in
-        all_threads = ChatThread.objects.filter(participants=profile)
-        logger.info(f"[THREADS] User {profile.user.username} participates in {all_threads.count()} threads")
-        
+        # First, get all threads user participates in (and hasn't deleted);
+        # the viewer's membership row also carries their mute/pin state, history watermark
+        # and the thread's last activity (the inbox order)
+        all_threads = ChatThread.objects.filter(
+            memberships__profile=profile, memberships__deleted=False
+        ).annotate(
+            is_muted=F('memberships__muted'), is_pinned=F('memberships__pinned'),
+            visible_after=visible_after(), last_activity=F('memberships__last_activity')
+        )
         # Check for SharedPost existence
         has_shared_posts = SharedPost.objects.filter(
             chat_message__thread=OuterRef('pk')
@@ -57,19 +75,19 @@ class ChatThreadListCreate(APIView):
         threads = all_threads.annotate(
             unread_count=Count(
                 'messages', 
-                filter=Q(messages__read=False) & ~Q(messages__sender=profile),
+                filter=Q(messages__read=False) & ~Q(messages__sender=profile) & ~Q(messages__deleted_by=profile)
+                & unexpired('messages__') & Q(messages__created_at__gt=F('visible_after')),
                 distinct=True # Avoid duplication from joins
             ),
             visible_message_count=Count(
                 'messages',
-                filter=Q(messages__is_deleted_for_everyone=False) & ~Q(messages__deleted_by=profile),
+                filter=Q(messages__is_deleted_for_everyone=False) & ~Q(messages__deleted_by=profile)
+                & unexpired('messages__') & Q(messages__created_at__gt=F('visible_after')),
                 distinct=True
             ),
             has_shared_post=Exists(has_shared_posts)
         )
         
-        logger.info(f"[THREADS DEBUG] After annotation: {threads.count()} threads")
-        
         threads = threads.exclude(
             # Hide if:
             # 1. No visible messages AND
@@ -80,33 +98,22 @@ class ChatThreadListCreate(APIView):
             Q(updated_at__lt=recent_cutoff) &
             ~Q(is_group=True) # Keep empty groups visible (they have names/purpose)
         )
-        logger.info(f"[THREADS DEBUG] After hidden_by exclusion: {threads.count()} threads")
-        
-        threads = threads.exclude(deleted_by=profile)
-        logger.info(f"[THREADS DEBUG] After deleted_by exclusion: {threads.count()} threads")
         
         threads = threads.exclude(status='archived')
-        logger.info(f"[THREADS DEBUG] After archived exclusion: {threads.count()} threads")
         
         # Add participant count AFTER other filters to avoid join issues
         threads = threads.annotate(
             p_count=Count('participants', distinct=True)
         )
         
-        # Log some sample p_counts for debugging
-        sample_threads = list(threads[:5])
-        for t in sample_threads:
-            logger.info(f"[THREADS DEBUG] Thread {t.id}: is_group={t.is_group}, p_count={t.p_count}")
-        
         # TEMPORARILY DISABLED - All threads have p_count=1 due to creation bug
         # Only exclude threads where user is chatting with themselves (p_count=1)
         # Don't exclude valid 1-on-1 chats (p_count=2)
         # threads = threads.exclude(
         #     Q(is_group=False) & Q(p_count=1)
         # )
-        logger.info(f"[THREADS DEBUG] After participant count filter: {threads.count()} threads (FILTER DISABLED)")
         
-        threads = threads.prefetch_related('participants__user').annotate(
+        threads = threads.prefetch_related('participants__user', admin_memberships()).annotate(
             last_message_id=Subquery(last_message_subquery)
         )
 
@@ -121,9 +128,7 @@ class ChatThreadListCreate(APIView):
 
 
         # Ensure unique threads and order by activity
-        threads = threads.distinct().order_by('-updated_at')
-        
-        logger.info(f"[THREADS] Final thread count for {profile.user.username}: {threads.count()}")
+        threads = threads.distinct().order_by('-last_activity', '-id')
         
         serializer = ChatThreadSerializer(threads, many=True, context={'request': request})
         return Response(serializer.data)
@@ -170,29 +175,22 @@ class ChatThreadListCreate(APIView):
 
                     # Check for ANY existing 1-on-1 thread between these two users
                     # Re-use even if deleted/hidden to prevent duplicates
-                    threads = ChatThread.objects.filter(
-                        participants=profile,
-                        is_group=False
-                    ).filter(
-                        participants=other_profile
-                    )
+                    thread, created = get_or_create_direct_thread(profile, other_profile, status='active')
+                    if created:
+                        serializer = ChatThreadSerializer(thread, context={'request': request})
+                        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+                    # UN-DELETE and UN-HIDE for current user
+                    thread.set_member_state(profile, deleted=False, hidden=False)
                     
-                    if threads.exists():
-                        # Use the most recent one
-                        thread = threads.order_by('-updated_at').first()
-                        
-                        # UN-DELETE and UN-HIDE for current user
-                        thread.deleted_by.remove(profile)
-                        thread.hidden_by.remove(profile)
+                    if thread.status in ['rejected', 'blocked']:
+                        thread.status = 'active'
                         
-                        if thread.status in ['rejected', 'blocked']:
-                            thread.status = 'active'
-                            
-                        thread.updated_at = timezone.now()
-                        thread.save()
-                        
-                        serializer = ChatThreadSerializer(thread, context={'request': request})
-                        return Response(serializer.data)
+                    thread.updated_at = timezone.now()
+                    thread.save()
+                    
+                    serializer = ChatThreadSerializer(thread, context={'request': request})
+                    return Response(serializer.data)
                 else:
                     return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -212,9 +210,10 @@ class ChatThreadListCreate(APIView):
                     group_name=title if is_group else None,
                     admin=profile if is_group else None # Set initiator as primary admin
                 )
-                thread.participants.add(profile)
-                if is_group:
-                    thread.admins.add(profile) # Also add to admins list
+                # Group creator is also an admin member
+                thread.participants.add(profile, through_defaults={
+                    'role': ThreadMembership.ROLE_ADMIN if is_group else ThreadMembership.ROLE_MEMBER
+                })
                 logger.info(f"[THREAD CREATE] Added initiator {profile.user.username} (ID: {profile.id})")
                 
                 for participant_id in participant_ids:
@@ -223,7 +222,7 @@ class ChatThreadListCreate(APIView):
                     if participant:
                         logger.info(f"[THREAD CREATE] Found participant: {participant.user.username} (ID: {participant.id})")
                         if participant != profile:
-                            thread.participants.add(participant)
+                            thread.add_members(participant)
                             logger.info(f"[THREAD CREATE] Added participant {participant.user.username}")
                         else:
                             logger.warning(f"[THREAD CREATE] Skipped adding self")
@@ -252,9 +251,10 @@ class ChatThreadDetail(APIView):
             return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
         try:
-            thread = ChatThread.objects.get(pk=pk, participants=profile)
-            if thread.deleted_by.filter(id=profile.id).exists():
-                raise ChatThread.DoesNotExist
+            # Annotating after the filter reuses the viewer's membership join
+            thread = ChatThread.objects.filter(
+                pk=pk, memberships__profile=profile, memberships__deleted=False
+            ).annotate(visible_after=visible_after()).get()
 
         except ChatThread.DoesNotExist:
             return Response({'detail': 'Thread not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -266,6 +266,8 @@ class ChatThreadDetail(APIView):
         
         # Base query
         messages_query = thread.messages.filter(
+            unexpired(),
+            created_at__gt=thread.visible_after,
             is_deleted_for_everyone=False
         ).exclude(
             deleted_by=profile
@@ -324,8 +326,7 @@ class ChatThreadDetail(APIView):
             return Response({'detail': 'Only group chats can be updated'}, status=status.HTTP_400_BAD_REQUEST)
             
         # Check if user is admin or owner
-        is_admin = thread.admin == profile or thread.admins.filter(id=profile.id).exists() or thread.initiator == profile
-        if not is_admin:
+        if not thread.is_admin(profile):
             return Response({'detail': 'Only admins can update group settings'}, status=status.HTTP_403_FORBIDDEN)
             
         # Update fields
@@ -373,7 +374,7 @@ class ChatThreadAddParticipants(APIView):
             try:
                 new_member = UserProfile.objects.get(id=p_id)
                 if not thread.participants.filter(id=new_member.id).exists():
-                    thread.participants.add(new_member)
+                    thread.add_members(new_member)
                     added_count += 1
             except UserProfile.DoesNotExist:
                 pass
@@ -394,22 +395,19 @@ class ChatThreadDestroy(APIView):
             
             # Clear message history for this user (for both Group and 1:1)
             # This ensures that even if they rejoin/unhide, previous messages are gone for them
-            from chat.models import ChatMessage
-            messages = thread.messages.all()
-            Membership = ChatMessage.deleted_by.through
-            # Bulk create relations to avoid N queries
-            new_relations = [Membership(chatmessage_id=m.id, userprofile_id=profile.id) for m in messages]
-            Membership.objects.bulk_create(new_relations, ignore_conflicts=True)
+            thread.clear_history(profile)
 
             if thread.is_group:
                 # Check if the user is an admin or initiator of the group
-                is_admin = thread.admin == profile or thread.admins.filter(id=profile.id).exists()
+                is_admin = thread.is_admin(profile, include_initiator=False)
                 
                 if is_admin:
                     # HARD DELETE for groups if user is admin
-                    # This completely removes the group and all its messages for all members
+                    # This completely removes the group and all its messages for all members;
+                    # the messages are purged in chunks in the background
                     thread_id = thread.id
-                    thread.delete()
+                    retire_thread(thread)
+                    transaction.on_commit(lambda: run_in_background(purge_thread, thread_id))
                     
                     logger.info(f"[DELETE] Group {thread_id} HARD DELETED by admin {profile.user.username}")
                     return Response({
@@ -419,8 +417,7 @@ class ChatThreadDestroy(APIView):
                 else:
                     # SOFT DELETE for non-admins - just hide/clear history for this user
                     # This allows the group to persist for other members
-                    thread.deleted_by.add(profile)
-                    thread.hidden_by.add(profile)
+                    thread.set_member_state(profile, deleted=True, hidden=True)
                     
                     logger.info(f"[DELETE] Group {pk} soft deleted (hidden/history cleared) for {profile.user.username}")
                     return Response({
@@ -431,7 +428,8 @@ class ChatThreadDestroy(APIView):
                 # HARD DELETE for 1:1 chats
                 # This completely removes the thread and all its messages
                 thread_id = thread.id
-                thread.delete()
+                retire_thread(thread)
+                transaction.on_commit(lambda: run_in_background(purge_thread, thread_id))
                 
                 logger.info(f"[DELETE] 1:1 Thread {thread_id} HARD DELETED by {profile.user.username}")
                 return Response({'status': 'Conversation permanently deleted'}, status=status.HTTP_200_OK)
@@ -510,46 +508,18 @@ class ChatMessageCreate(APIView):
                         logger.error(f"Failed to create shared post link: {e}")
                         raise e # Rollback transaction
 
-                # SHADOW BAN LOGIC: Check if any participant has blocked the sender
-                recipients = thread.participants.exclude(id=profile.id)
-                for recipient in recipients:
-                    if recipient.blocked_users.filter(id=profile.id).exists():
-                        message.deleted_by.add(recipient)
-
-
-
+                # SHADOW BAN LOGIC: hide from participants who blocked the sender
                 # UNHIDE/UNDELETE LOGIC: Ensure visibility for all participants
-                thread.hidden_by.clear()
-                thread.deleted_by.clear()
+                thread.surface_message(message)
                 
-                # Update Thread
-                thread.updated_at = timezone.now()
-                thread.save()
+                # Move the thread up every member's inbox (membership rows only, not the thread row)
+                record_activity(thread.id, message, preview=preview_for(message, content))
 
-                # BROADCAST TO WEBSOCKET
-                try:
-                    from channels.layers import get_channel_layer
-                    from asgiref.sync import async_to_sync
-                    
-                    channel_layer = get_channel_layer()
-                    message_data = ChatMessageSerializer(message, context={'request': request}).data
-                    
-                    async_to_sync(channel_layer.group_send)(
-                        f'thread_{thread.id}',
-                        {
-                            'type': 'chat.message',
-                            'action': 'new_message',
-                            'data': message_data,
-                            'sender': profile.user.username
-                        }
-                    )
-                except Exception as ws_error:
-                    # Don't fail the request if WS fails
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"WebSocket broadcast failed: {ws_error}")
-
-            return Response(ChatMessageSerializer(message, context={'request': request}).data, status=status.HTTP_201_CREATED)
+                # BROADCAST TO WEBSOCKET (failures are logged, never fail the request)
+                message_data = ChatMessageSerializer(message, context={'request': request}).data
+                broadcast_to_thread(thread.id, 'new_message', data=message_data, sender=profile.user.username)
+
+            return Response(message_data, status=status.HTTP_201_CREATED)
         
         except Exception as e:
             import logging
@@ -593,25 +563,9 @@ class ChatMessageDelete(APIView):
             message.save()
 
             # BROADCAST DELETE TO WEBSOCKET
-            try:
-                from channels.layers import get_channel_layer
-                from asgiref.sync import async_to_sync
-                
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f'thread_{message.thread.id}',
-                    {
-                        'type': 'chat.message',
-                        'action': 'message_deleted',
-                        'message_id': message.id,
-                        'sender': profile.user.username
-                    }
-                )
-            except Exception as ws_error:
-                # Log but continue
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"WebSocket delete broadcast failed: {ws_error}")
+            broadcast_to_thread(
+                message.thread_id, 'message_deleted', message_id=message.id, sender=profile.user.username
+            )
 
         else:
             # Delete for me
@@ -668,7 +622,7 @@ class ChatThreadReject(APIView):
             thread = ChatThread.objects.get(pk=pk, participants=profile)
             # For 1:1 chats, mark as rejected and hide
             if not thread.is_group:
-                thread.deleted_by.add(profile)
+                thread.set_member_state(profile, deleted=True)
                 thread.status = 'rejected'
                 thread.save()
             else:
@@ -726,11 +680,8 @@ class MessageForward(APIView):
         )
 
         # Clear hidden status for ALL participants (unhide logic)
-        if target_thread.hidden_by.exists():
-            target_thread.hidden_by.clear()
-            # Update target thread timestamp
-            target_thread.updated_at = timezone.now()
-            target_thread.save()
+        target_thread.memberships.filter(hidden=True).update(hidden=False)
+        record_activity(target_thread.id, new_message, preview=preview_for(new_message, content))
         
         return Response(ChatMessageSerializer(new_message, context={'request': request}).data)
 
@@ -761,12 +712,9 @@ class ThreadMuteView(APIView):
         profile = _get_profile(request)
         if not profile:
              return Response(status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            thread = ChatThread.objects.get(pk=pk, participants=profile)
-            thread.muted_by.add(profile)
-            return Response({'status': 'muted'})
-        except ChatThread.DoesNotExist:
+        if not ThreadMembership.objects.filter(thread_id=pk, profile=profile).update(muted=True):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'muted'})
 
 class ThreadUnmuteView(APIView):
     """Unmute a thread"""
@@ -775,12 +723,9 @@ class ThreadUnmuteView(APIView):
         profile = _get_profile(request)
         if not profile:
              return Response(status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            thread = ChatThread.objects.get(pk=pk, participants=profile)
-            thread.muted_by.remove(profile)
-            return Response({'status': 'unmuted'})
-        except ChatThread.DoesNotExist:
+        if not ThreadMembership.objects.filter(thread_id=pk, profile=profile).update(muted=False):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'unmuted'})
 
 class ThreadPinView(APIView):
     """Pin a thread"""
@@ -789,12 +734,9 @@ class ThreadPinView(APIView):
         profile = _get_profile(request)
         if not profile:
              return Response(status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            thread = ChatThread.objects.get(pk=pk, participants=profile)
-            thread.pinned_by.add(profile)
-            return Response({'status': 'pinned'})
-        except ChatThread.DoesNotExist:
+        if not ThreadMembership.objects.filter(thread_id=pk, profile=profile).update(pinned=True):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'pinned'})
 
 class ThreadUnpinView(APIView):
     """Unpin a thread"""
@@ -803,27 +745,102 @@ class ThreadUnpinView(APIView):
         profile = _get_profile(request)
         if not profile:
              return Response(status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            thread = ChatThread.objects.get(pk=pk, participants=profile)
-            thread.pinned_by.remove(profile)
-            return Response({'status': 'unpinned'})
-        except ChatThread.DoesNotExist:
+        if not ThreadMembership.objects.filter(thread_id=pk, profile=profile).update(pinned=False):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'unpinned'})
 
 class DisappearingMessagesSet(APIView):
+    """
+    Turn disappearing messages on or off for a thread.
+    Body: {"duration": seconds} to enable, {"duration": null} (or 0) to disable.
+    Applies to messages sent from now on; in groups only admins may change it.
+    """
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request, pk):
-        return Response({'status': 'disappearing messages set'})
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            thread = ChatThread.objects.get(pk=pk, memberships__profile=profile, memberships__deleted=False)
+        except ChatThread.DoesNotExist:
+            return Response({'detail': 'Thread not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if thread.is_group and not thread.is_admin(profile):
+            return Response({'detail': 'Only admins can change disappearing messages'}, status=status.HTTP_403_FORBIDDEN)
+
+        duration = request.data.get('duration')
+        try:
+            duration = int(duration) if duration not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'detail': 'duration must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+        if duration is not None and not 0 <= duration <= MAX_DISAPPEARING_DURATION:
+            return Response(
+                {'detail': f'duration must be between 0 and {MAX_DISAPPEARING_DURATION} seconds'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        duration = duration or None
+
+        ChatThread.objects.filter(pk=thread.pk).update(disappearing_messages_duration=duration)
+        broadcast_to_thread(
+            thread.id, 'disappearing_messages_changed',
+            duration=duration, sender=profile.user.username
+        )
+        return Response({'status': 'disappearing messages set', 'duration': duration})
 
 class ChatMediaUpload(APIView):
+    """
+    Send a file (image, video, audio, document) as a chat message.
+    Only cheap checks run here; thumbnails, EXIF stripping and duration probing
+    happen in the background and arrive over WebSocket as 'attachment_ready'.
+    """
     permission_classes = [permissions.IsAuthenticated]
-    def post(self, request):
-        return Response({'status': 'uploaded'})
+    parser_classes = [MultiPartParser, FormParser]
+    voice = False
 
-class ChatVoiceMessageUpload(APIView):
-    permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        return Response({'status': 'uploaded'})
+        profile = _get_profile(request)
+        if not profile:
+            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'detail': 'File required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        thread_id = request.data.get('thread')
+        if not thread_id:
+            return Response({'detail': 'Thread required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            thread = ChatThread.objects.get(pk=thread_id, participants=profile)
+        except (ChatThread.DoesNotExist, ValueError):
+            return Response({'detail': 'Thread not found or access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            file_type = validate_chat_attachment(upload, deep=False)
+        except ValidationError as e:
+            return Response({'detail': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.voice:
+            if file_type != 'audio':
+                return Response({'detail': 'Voice messages must be audio files'}, status=status.HTTP_400_BAD_REQUEST)
+            file_type = 'voice'
+
+        message = MediaService.create_attachment_message(
+            profile, thread, upload, file_type,
+            content=request.data.get('content', ''),
+            is_voice=self.voice
+        )
+        message_data = ChatMessageSerializer(message, context={'request': request}).data
+        transaction.on_commit(lambda: broadcast_to_thread(
+            thread.id, 'new_message', data=message_data, sender=profile.user.username
+        ))
+
+        return Response(message_data, status=status.HTTP_201_CREATED)
+
+class ChatVoiceMessageUpload(ChatMediaUpload):
+    """Send a recorded voice note; same pipeline as ChatMediaUpload"""
+    voice = True
 
 class ChatMessageSearch(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -840,13 +857,11 @@ class ChatMessageSearch(APIView):
         # Search threads user is part of (even if deleted/hidden)
         # This overrides delete visibility as requested
         threads = ChatThread.objects.filter(
-            participants=profile
+            memberships__profile=profile, memberships__deleted=False
         ).filter(
             Q(group_name__icontains=query) | 
             Q(participants__user__username__icontains=query) |
             Q(participants__nickname__icontains=query)
-        ).exclude(
-            deleted_by=profile
         ).distinct()
         
         # We limit to 20 results
@@ -917,12 +932,8 @@ class BlockUserView(APIView):
                     restriction.restriction_type = 'block'
                     restriction.save()
                 
-                # Remove from followers/following
-                from core.models import Follow
-                # remove if I follow them
-                Follow.objects.filter(follower=profile, followee=user_to_block).delete()
-                # remove if they follow me
-                Follow.objects.filter(follower=user_to_block, followee=profile).delete()
+                # Remove from followers/following (both directions)
+                FollowService.remove_mutual(profile, user_to_block)
 
                 logger.info(f"User {profile.user.username} blocked {user_to_block.user.username}")
                 return Response({
@@ -1009,11 +1020,7 @@ class ReportMessageView(APIView):
 
 def get_avatar_url(profile, request=None):
     """Get avatar URL for a user profile"""
-    if profile.avatar:
-        return request.build_absolute_uri(profile.avatar.url) if request else profile.avatar.url
-    elif profile.default_avatar_url:
-        return profile.default_avatar_url
-    return f"https://api.dicebear.com/7.x/avataaars/svg?seed={profile.user.username}"
+    return get_avatar_url_from_profile(profile, request)
 
 
 class MessageRequestList(APIView):
@@ -1160,7 +1167,7 @@ class GroupInvitationAccept(APIView):
         
         # Add user to group
         group = invitation.group
-        group.participants.add(profile)
+        group.add_members(profile)
         
         invitation.status = 'accepted'
         invitation.save()
@@ -1307,14 +1314,7 @@ class UserRestrictionList(APIView):
         
         data = []
         for restriction in restrictions:
-            # Safely build avatar URL
-            avatar_url = None
-            if restriction.restricted_user.avatar:
-                avatar_url = request.build_absolute_uri(restriction.restricted_user.avatar.url)
-            elif restriction.restricted_user.default_avatar_url:
-                avatar_url = restriction.restricted_user.default_avatar_url
-            else:
-                avatar_url = f"https://api.dicebear.com/7.x/avataaars/svg?seed={restriction.restricted_user.user.username}"
+            avatar_url = get_avatar_url_from_profile(restriction.restricted_user, request)
 
             data.append({
                 'id': restriction.id,
@@ -1405,27 +1405,27 @@ class BlockUserView(APIView):
         if profile.id == target_user.id:
              return Response({'error': 'Cannot block yourself'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1. Create UserRestriction
-        UserRestriction.objects.get_or_create(
-            user=profile,
-            restricted_user=target_user,
-            restriction_type='block'
-        )
+        with transaction.atomic():
+            # 1. Create UserRestriction
+            UserRestriction.objects.get_or_create(
+                user=profile,
+                restricted_user=target_user,
+                restriction_type='block'
+            )
 
-        # 2. Add to blocked_users (legacy/redundant but kept for safety)
-        profile.blocked_users.add(target_user)
-        BlockedUser.objects.get_or_create(blocker=profile, blocked=target_user)
+            # 2. Add to blocked_users (legacy/redundant but kept for safety)
+            profile.blocked_users.add(target_user)
+            BlockedUser.objects.get_or_create(blocker=profile, blocked=target_user)
 
-        # 3. Unfollow both directions
-        Follow.objects.filter(follower=profile, followee=target_user).delete()
-        Follow.objects.filter(follower=target_user, followee=profile).delete()
+            # 3. Unfollow both directions
+            FollowService.remove_mutual(profile, target_user)
 
-        # 4. Hide/Block threads
-        threads = ChatThread.objects.filter(participants=profile).filter(participants=target_user)
-        for thread in threads:
-            if thread.status != 'blocked':
-                thread.status = 'blocked'
-                thread.save()
+            # 4. Hide/Block threads
+            threads = ChatThread.objects.filter(participants=profile).filter(participants=target_user)
+            for thread in threads:
+                if thread.status != 'blocked':
+                    thread.status = 'blocked'
+                    thread.save()
 
         return Response({'status': 'blocked', 'user_id': user_id})
 
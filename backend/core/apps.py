@@ -5,4 +5,6 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        import core.signals  # noqa
\ No newline at end of file
+        import core.signals  # noqa
+        import core.metrics  # noqa
+        import core.profiling  # noqa  (installs the SQL hook on new connections)
@@ -0,0 +1,102 @@
+# core/background.py
+"""
+Background execution helpers.
+
+Request threads hand slow work to these executors instead of doing it inline:
+- run_in_background: I/O and ORM work on a small thread pool
+- run_cpu_bound: CPU-heavy pure functions on a process pool (image decoding, transcoding)
+
+Set BACKGROUND_TASKS_EAGER = True (e.g. in tests) to run everything inline.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread_pool = None
+_process_pool = None
+
+
+def _is_eager():
+    return getattr(settings, 'BACKGROUND_TASKS_EAGER', False)
+
+
+def _get_thread_pool():
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_THREAD_WORKERS', 4),
+                thread_name_prefix='background'
+            )
+        return _thread_pool
+
+
+def _get_process_pool():
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # 'spawn' keeps workers free of the parent's DB connections and threads.
+            # Functions sent here must be importable without Django being set up.
+            _process_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'MEDIA_PROCESSING_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def _run_logged(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background task {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+
+
+def _run_with_db_cleanup(fn, *args, **kwargs):
+    # Worker threads own their connections; drop stale ones around each task
+    close_old_connections()
+    try:
+        return _run_logged(fn, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on the background thread pool.
+    Exceptions are logged, never raised to the caller.
+    """
+    if _is_eager():
+        # Inline: share the caller's connection (and any test transaction)
+        return _run_logged(fn, *args, **kwargs)
+    return _get_thread_pool().submit(_run_with_db_cleanup, fn, *args, **kwargs)
+
+
+def run_cpu_bound(fn, *args):
+    """
+    Run a picklable, Django-free function on the process pool and wait for its result.
+    Call this from background threads only - never from a request thread.
+    """
+    if _is_eager():
+        return fn(*args)
+    return _get_process_pool().submit(fn, *args).result()
+
+
+@atexit.register
+def shutdown():
+    """Stop the executors, letting queued work finish"""
+    global _thread_pool, _process_pool
+    with _lock:
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=True)
+            _thread_pool = None
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True)
+            _process_pool = None
@@ -1,6 +1,9 @@
 import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .realtime import group_send
+
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.thread_id = self.scope['url_route']['kwargs']['thread_id']
@@ -17,7 +20,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message = data.get('message')
         sender = self.scope['user'].username if self.scope.get('user') and self.scope['user'].is_authenticated else 'anon'
         # broadcast to group
-        await self.channel_layer.group_send(self.group_name, {
+        await group_send(self.channel_layer, self.group_name, {
             'type': 'chat.message',
             'message': message,
             'sender': sender,
@@ -27,3 +30,35 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Send full event payload to WebSocket
         # This allows sending full message objects, delete events, etc.
         await self.send(text_data=json.dumps(event))
+
+
+class InboxConsumer(AsyncWebsocketConsumer):
+    """
+    One socket per signed-in user for inbox-level events from chat.activity:
+    a thread moved to the top, with its preview. Server-push only.
+    """
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+        profile_id = await self.get_profile_id(user)
+        if profile_id is None:
+            await self.close()
+            return
+        from chat.activity import inbox_group
+        self.group_name = inbox_group(profile_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def inbox_event(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    @database_sync_to_async
+    def get_profile_id(self, user):
+        from .models import UserProfile
+        return UserProfile.objects.filter(user=user).values_list('id', flat=True).first()
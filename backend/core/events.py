@@ -0,0 +1,149 @@
+# core/events.py
+"""
+Write-behind ingestion for post impressions and views.
+
+Feeds report every post they show; writing a row per report would put a DB
+write on every scroll. Instead events go into an in-process EventBuffer:
+- repeats of (user, post, kind) within IMPRESSION_DEDUP_WINDOW collapse in memory
+- a daemon thread flushes every EVENT_FLUSH_INTERVAL seconds, or sooner once
+  EVENT_BUFFER_MAX distinct events are waiting
+- a flush is one bulk_create(ignore_conflicts=True) into PostImpression plus a
+  few grouped counter UPDATEs on Post (views_count / impressions_count)
+
+Events still buffered when a process dies are lost; impressions are
+best-effort analytics, not an audit log.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on post ids accepted per impressions request
+MAX_IMPRESSION_BATCH = 200
+
+COUNTER_FIELDS = {
+    'impression': 'impressions_count',
+    'view': 'views_count',
+}
+
+
+def window_start(timestamp, window_seconds):
+    """Start of the dedup window containing timestamp (a unix time)"""
+    return datetime.fromtimestamp(timestamp - timestamp % window_seconds, tz=dt_timezone.utc)
+
+
+class EventBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}  # (user_id, post_id, kind, window) -> (source, created_at)
+        self._flusher = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, user_id, post_id, kind='impression', source='', now=None):
+        """Buffer one event. Returns False if it repeats one already buffered for this window."""
+        now = now or time.time()
+        key = (user_id, post_id, kind, window_start(now, settings.IMPRESSION_DEDUP_WINDOW))
+        with self._lock:
+            if key in self._events:
+                return False
+            self._events[key] = (source[:20], datetime.fromtimestamp(now, tz=dt_timezone.utc))
+            full = len(self._events) >= settings.EVENT_BUFFER_MAX
+        self._ensure_flusher()
+        if full:
+            run_in_background(self.flush)
+        return True
+
+    def flush(self):
+        """Write buffered events. Returns the number of new impression rows."""
+        with self._lock:
+            events, self._events = self._events, {}
+        if not events:
+            return 0
+        try:
+            return self._write(events)
+        except Exception as e:
+            logger.error(f"Dropped {len(events)} buffered events: {e}", exc_info=True)
+            return 0
+
+    def _write(self, events):
+        from .models import Post, PostImpression
+
+        post_ids = {post_id for _, post_id, _, _ in events}
+        live_posts = set(Post.objects.filter(id__in=post_ids).values_list('id', flat=True))
+        # Rows an earlier flush (or another process) already wrote for these windows
+        existing = set(PostImpression.objects.filter(
+            user_id__in={user_id for user_id, _, _, _ in events},
+            post_id__in=live_posts,
+            window__in={window for _, _, _, window in events},
+        ).values_list('user_id', 'post_id', 'kind', 'window'))
+
+        rows = [
+            PostImpression(
+                user_id=user_id, post_id=post_id, kind=kind, window=window,
+                source=source, created_at=created_at
+            )
+            for (user_id, post_id, kind, window), (source, created_at) in events.items()
+            if post_id in live_posts and (user_id, post_id, kind, window) not in existing
+        ]
+        if not rows:
+            return 0
+
+        # {field: {post_id: increment}}, applied as one UPDATE per (field, increment)
+        increments = defaultdict(Counter)
+        for row in rows:
+            increments[COUNTER_FIELDS[row.kind]][row.post_id] += 1
+
+        with transaction.atomic():
+            PostImpression.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+            for field, per_post in increments.items():
+                by_amount = defaultdict(list)
+                for post_id, amount in per_post.items():
+                    by_amount[amount].append(post_id)
+                for amount, ids in by_amount.items():
+                    Post.objects.filter(id__in=ids).update(**{field: F(field) + amount})
+        return len(rows)
+
+    def _ensure_flusher(self):
+        # Eager mode (tests) has no flusher thread; call flush() directly
+        if self._flusher is not None or getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_forever, name='event-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(settings.EVENT_FLUSH_INTERVAL)
+            close_old_connections()
+            self.flush()
+            close_old_connections()
+
+
+event_buffer = EventBuffer()
+
+
+def record_impressions(profile, post_ids, source=''):
+    """Buffer impressions of post_ids shown to profile. Returns how many were new for this window."""
+    return sum(event_buffer.add(profile.id, post_id, 'impression', source) for post_id in post_ids)
+
+
+def record_view(profile, post_id, source=''):
+    return event_buffer.add(profile.id, post_id, 'view', source)
+
+
+@atexit.register
+def flush_on_exit():
+    event_buffer.flush()
@@ -0,0 +1,22 @@
+"""
+Management command to index existing 1-on-1 chat threads in DirectThreadIndex.
+Threads created through chat.direct_threads are indexed as they are created;
+this covers rows written before the index existed or outside that module.
+"""
+from django.core.management.base import BaseCommand
+
+from chat.direct_threads import backfill_direct_index
+
+
+class Command(BaseCommand):
+    help = 'Index existing two-person threads by participant pair'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Threads processed per batch')
+
+    def handle(self, *args, **options):
+        indexed, duplicates = backfill_direct_index(batch_size=options['batch_size'])
+        if duplicates:
+            self.stdout.write(f'Skipped {duplicates} duplicate DM threads (another thread is already indexed for the pair)')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} direct threads'))
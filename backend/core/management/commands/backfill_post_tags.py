@@ -0,0 +1,20 @@
+"""
+Management command to index existing posts in the Tag/PostTag tables.
+Posts are indexed as they are saved; this covers posts written before the
+tables existed or through bulk updates that skip save().
+"""
+from django.core.management.base import BaseCommand
+
+from core.utils.tags import backfill_post_tags
+
+
+class Command(BaseCommand):
+    help = 'Create Tag and PostTag rows from every post\'s tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Posts processed per batch')
+
+    def handle(self, *args, **options):
+        written = backfill_post_tags(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} post tags'))
@@ -0,0 +1,21 @@
+"""
+Management command to build UserTagVector rows for existing authors.
+Vectors are refreshed as posts are created, edited and deleted; this covers
+posts written before similar-user search existed, or after changing
+EMBEDDING_DIM. Running servers pick the rows up on their next index refresh.
+"""
+from django.core.management.base import BaseCommand
+
+from core.user_embeddings import refresh_all_user_vectors
+
+
+class Command(BaseCommand):
+    help = 'Compute hashtag vectors for every author of a public post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Authors processed per batch')
+
+    def handle(self, *args, **options):
+        count = refresh_all_user_vectors(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed tag vectors for {count} authors'))
@@ -0,0 +1,31 @@
+"""
+Management command for the "posts you may like" neighbors:
+- folds like/save/share events newer than the last run into the post
+  co-occurrence table (only the users with new activity are touched)
+- refreshes the top-K most similar posts of every post that changed
+Run it from cron every few minutes; use --full after bulk deletes or to
+pick up unliked/unsaved posts, which incremental runs do not subtract.
+"""
+from django.core.management.base import BaseCommand
+
+from core.services.similarity_service import DEFAULT_TOP_K, PostSimilarityService
+
+
+class Command(BaseCommand):
+    help = 'Build item-item post similarity from user events (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Discard stored co-occurrences and rebuild from every event')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Events folded in per transaction')
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='Neighbors kept per post')
+
+    def handle(self, *args, **options):
+        events, posts = PostSimilarityService.build(
+            full=options['full'], chunk_size=options['chunk_size'], top_k=options['top_k']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {events} new events, refreshed neighbors of {posts} posts'
+        ))
@@ -1,42 +1,115 @@
 """
-Management command to extract and update hashtags for all existing posts
+Management command to re-extract hashtags from every post's caption/content.
+
+Posts are read in id-ordered keyset chunks; hashtag extraction runs on a
+process pool while the main process writes finished chunks back in order.
+Each chunk is one transaction that bulk-updates only Post.tags, rewrites the
+chunk's PostTag rows, and advances a JobCheckpoint, so an interrupted run
+picks up after the last written chunk. Posts without hashtags in their text
+keep their tags. Use --restart to start over from the first post.
 """
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
-from core.models import Post
-import re
+from django.db import transaction
+
+from core.models import JobCheckpoint, Post
+from core.user_embeddings import refresh_user_vectors
+from core.utils.tags import extract_post_tags, replace_post_tags
+
+CHECKPOINT_NAME = 'extract_hashtags'
 
 
 class Command(BaseCommand):
     help = 'Extract hashtags from post content/caption and update tags field'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Posts read, extracted and written per chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Extraction processes (1 runs inline)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the saved checkpoint and start from the first post')
+
     def handle(self, *args, **options):
-        posts = Post.objects.all()
-        updated_count = 0
-        
-        self.stdout.write(f'Processing {posts.count()} posts...')
-        
-        for post in posts:
-            # Get text content
-            text = post.caption or post.content or ''
-            
-            if text:
-                # Extract hashtags using regex
-                hashtags = re.findall(r"#(\w+)", text)
-                
-                if hashtags:
-                    # Clean and deduplicate tags
-                    tags = [tag.lstrip('#').lower().strip() for tag in hashtags if tag and tag.strip()]
-                    tags = list(set(tags))[:15]  # Limit to 15 unique tags
-                    
-                    # Update post
-                    post.tags = tags
-                    post.save()
-                    updated_count += 1
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ Post {post.id}: {len(tags)} tags extracted - {tags}')
-                    )
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'\n✅ Successfully updated {updated_count} posts with hashtags!')
-        )
+        self.verbosity = options['verbosity']
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        if options['restart'] and checkpoint.position:
+            checkpoint.position = 0
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        elif checkpoint.position:
+            self.stdout.write(f'Resuming after post {checkpoint.position}')
+
+        workers = max(options['workers'], 1)
+        pool = None
+        if workers > 1:
+            # 'spawn' keeps workers free of this process's DB connection
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+        self.scanned = self.updated = 0
+        try:
+            # Keep a few chunks in flight; write them back strictly in id order
+            in_flight = deque()
+            for chunk in self._chunks(checkpoint.position, options['chunk_size']):
+                texts = [(post_id, meta['text']) for post_id, meta in chunk.items()]
+                in_flight.append((chunk, self._submit(pool, texts)))
+                if len(in_flight) >= workers * 2:
+                    self._write(checkpoint, *in_flight.popleft())
+            while in_flight:
+                self._write(checkpoint, *in_flight.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {self.scanned} posts, updated tags on {self.updated}'
+        ))
+
+    def _chunks(self, after_id, chunk_size):
+        """{post_id: fields} for successive id ranges, streamed from the database"""
+        while True:
+            rows = Post.objects.filter(id__gt=after_id).order_by('id').values_list(
+                'id', 'caption', 'content', 'tags', 'author_id', 'created_at', 'is_public'
+            )[:chunk_size]
+            chunk = {
+                post_id: {
+                    'text': caption or content or '', 'tags': tags, 'author_id': author_id,
+                    'created_at': created_at, 'is_public': is_public,
+                }
+                for post_id, caption, content, tags, author_id, created_at, is_public
+                in rows.iterator(chunk_size=chunk_size)
+            }
+            if not chunk:
+                return
+            yield chunk
+            after_id = max(chunk)
+
+    def _submit(self, pool, texts):
+        if pool is not None:
+            return pool.submit(extract_post_tags, texts)
+        future = Future()
+        future.set_result(extract_post_tags(texts))
+        return future
+
+    def _write(self, checkpoint, chunk, future):
+        changed = [(post_id, tags) for post_id, tags in future.result() if tags != chunk[post_id]['tags']]
+        with transaction.atomic():
+            Post.objects.bulk_update(
+                [Post(id=post_id, tags=tags) for post_id, tags in changed], ['tags'], batch_size=500
+            )
+            replace_post_tags([
+                (post_id, tags, chunk[post_id]['created_at'], chunk[post_id]['is_public'])
+                for post_id, tags in changed
+            ])
+            checkpoint.position = max(chunk)
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        # bulk_update skips signals, so refresh the authors' similarity vectors here
+        refresh_user_vectors({chunk[post_id]['author_id'] for post_id, _ in changed})
+
+        self.scanned += len(chunk)
+        self.updated += len(changed)
+        if self.verbosity >= 2:
+            self.stdout.write(f'Up to post {checkpoint.position}: {len(changed)} of {len(chunk)} updated')
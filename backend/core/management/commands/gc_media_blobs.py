@@ -0,0 +1,117 @@
+"""
+Management command to garbage-collect the content-addressed media store:
+- recounts references to every blob from the media fields (rows deleted via
+  the ORM or cascades never release their files)
+- deletes blobs nobody references once they have been idle for the grace period
+- deletes files under cas/ that have no MediaBlob row (e.g. rolled-back uploads)
+"""
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.models import ChatThread, MessageAttachment
+from core.models import UserProfile, Post, Collection, MediaBlob
+from core.storage import CAS_PREFIX, content_addressed_storage
+
+# (model, field) pairs stored through get_media_storage
+MEDIA_FIELDS = [
+    (UserProfile, 'avatar'),
+    (Post, 'image'),
+    (Collection, 'cover_image'),
+    (ChatThread, 'group_image'),
+    (MessageAttachment, 'file'),
+    (MessageAttachment, 'thumbnail'),
+]
+
+# (model, field) pairs holding {size: {format: storage name}} thumbnails
+VARIANT_FIELDS = [
+    (Post, 'image_variants'),
+    (MessageAttachment, 'variants'),
+]
+
+
+def count_references():
+    """Return Counter of storage name -> number of rows pointing at it"""
+    refs = Counter()
+    for model, field in MEDIA_FIELDS:
+        names = model.objects.filter(**{f'{field}__startswith': CAS_PREFIX}).values_list(field, flat=True)
+        refs.update(names.iterator(chunk_size=2000))
+
+    for model, field in VARIANT_FIELDS:
+        for variants in model.objects.exclude(**{field: {}}).values_list(field, flat=True).iterator(chunk_size=2000):
+            for formats in (variants or {}).values():
+                refs.update(name for name in formats.values() if name.startswith(CAS_PREFIX))
+    return refs
+
+
+class Command(BaseCommand):
+    help = 'Reconcile media blob reference counts and delete orphaned blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Only delete blobs unreferenced for at least this long')
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting anything')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        storage = content_addressed_storage
+
+        refs = count_references()
+
+        # 1. Reconcile counts
+        to_fix = []
+        for blob in MediaBlob.objects.only('id', 'name', 'ref_count').iterator(chunk_size=2000):
+            actual = refs.get(blob.name, 0)
+            if blob.ref_count != actual:
+                blob.ref_count = actual
+                to_fix.append(blob)
+        if not dry_run:
+            for blob in to_fix:
+                fields = {'ref_count': blob.ref_count}
+                if blob.ref_count == 0:
+                    fields['updated_at'] = timezone.now()
+                MediaBlob.objects.filter(pk=blob.pk).update(**fields)
+        self.stdout.write(f'Reconciled {len(to_fix)} reference counts')
+
+        # 2. Delete unreferenced blobs past the grace period
+        orphans = MediaBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+        freed = 0
+        deleted = 0
+        for blob in orphans.iterator():
+            if refs.get(blob.name):
+                continue
+            if not dry_run:
+                # Re-check in the DELETE itself: an upload of the same content may
+                # have re-referenced the blob since it was read
+                removed, _ = MediaBlob.objects.filter(pk=blob.pk, ref_count=0, updated_at__lt=cutoff).delete()
+                if not removed:
+                    continue
+                storage.delete_blob(blob.name)
+            freed += blob.size
+            deleted += 1
+
+        # 3. Files on disk with no MediaBlob row
+        stray = 0
+        root = storage.path(CAS_PREFIX.rstrip('/'))
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        cutoff_ts = time.time() - options['grace_minutes'] * 60
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if name in known or refs.get(name) or os.path.getmtime(path) >= cutoff_ts:
+                    continue
+                stray += 1
+                freed += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} orphaned blobs and {stray} stray files ({freed / (1024 * 1024):.1f}MB)'
+        ))
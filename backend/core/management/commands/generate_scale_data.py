@@ -0,0 +1,272 @@
+"""
+Management command to generate a production-sized synthetic dataset.
+
+Everything is written with bulk_create in batches (no per-object saves,
+signals or Python loops over M2M managers), with skewed distributions so
+hot spots look like production:
+- users and profiles (one shared password hash: password123)
+- posts per user and tag popularity follow heavy-tailed distributions;
+  PostTag rows are written alongside
+- follows pick followees with Zipf-like popularity, then counters are reconciled
+- like/save/share events concentrate on popular posts
+- 1-on-1 threads between followers with encrypted messages and inbox state
+
+Generated usernames start with --prefix; --clear deletes a previous run
+with the same prefix first. After generation, tag vectors are rebuilt;
+run build_post_similarity and refresh_recommendations separately if needed.
+
+Example: python manage.py generate_scale_data --users 100000 --posts-per-user 20
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from chat.models import ChatMessage, ChatThread, DirectThreadIndex, ThreadMembership
+from core.models import Follow, Post, UserEvent, UserProfile
+from core.services.follow_service import FollowService
+from core.user_embeddings import refresh_user_vectors
+from core.utils.avatar_utils import generate_default_avatar_url
+from core.utils.tags import replace_post_tags
+
+User = get_user_model()
+
+TOPICS = [
+    'photography', 'travel', 'cooking', 'kpop', 'drama', 'manga', 'gaming', 'football',
+    'fitness', 'education', 'technology', 'stem', 'music', 'art', 'books', 'movies',
+    'fashion', 'nature', 'pets', 'coffee', 'design', 'startup', 'running', 'yoga',
+    'anime', 'history', 'science', 'poetry', 'cycling', 'hiking', 'baking', 'python',
+]
+WORDS = (
+    'today just finally another really great little weekend morning evening new old '
+    'favourite amazing quiet busy long short city beach home studio trip project'
+).split()
+EVENT_TYPES = ['like', 'like', 'like', 'save', 'share']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values we set instead of auto_now_add"""
+    fields = [model._meta.get_field('created_at') for model in models]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate a large synthetic dataset (users, posts, follows, events, chats)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts-per-user', type=float, default=20, help='Mean; heavy-tailed per user')
+        parser.add_argument('--follows-per-user', type=float, default=30, help='Mean; followees are Zipf-distributed')
+        parser.add_argument('--events-per-user', type=float, default=50, help='Mean like/save/share events')
+        parser.add_argument('--threads-per-user', type=float, default=2, help='Mean 1-on-1 threads started')
+        parser.add_argument('--messages-per-thread', type=float, default=20)
+        parser.add_argument('--days', type=int, default=180, help='Spread timestamps over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='scale_', help='Username prefix of generated users')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete users with --prefix first')
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = options['days'] * 86400
+        prefix = options['prefix']
+
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            self.stdout.write(f'Deleted {deleted} rows from a previous run')
+
+        profile_ids = self._step('users', self._create_users, prefix, options['users'])
+        post_ids = self._step('posts', self._create_posts, profile_ids, options['posts_per_user'])
+        self._step('follows', self._create_follows, profile_ids, options['follows_per_user'])
+        self._step('events', self._create_events, profile_ids, post_ids, options['events_per_user'])
+        self._step('threads', self._create_threads, profile_ids,
+                   options['threads_per_user'], options['messages_per_thread'])
+        self._step('tag vectors', self._refresh_vectors, profile_ids)
+        self.stdout.write(self.style.SUCCESS(f'Generated dataset for {len(profile_ids)} users'))
+
+    # -- helpers --------------------------------------------------------
+
+    def _step(self, label, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        count = len(result) if hasattr(result, '__len__') else result
+        self.stdout.write(f'{label}: {count} in {time.perf_counter() - started:.1f}s')
+        return result
+
+    def _batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _timestamps(self, count, skew=1.0):
+        """count datetimes in the last --days, biased towards now when skew > 1"""
+        ages = self.rng.random(count) ** skew * self.span
+        return [self.now - timedelta(seconds=float(age)) for age in ages]
+
+    def _zipf_weights(self, n, exponent=1.1):
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        return weights / weights.sum()
+
+    def _per_user_counts(self, n, mean):
+        """Heavy-tailed counts with the requested mean: most users do little, a few do a lot"""
+        activity = self.rng.pareto(1.5, n) + 1
+        return self.rng.poisson(activity / activity.mean() * mean)
+
+    # -- generators -----------------------------------------------------
+
+    def _create_users(self, prefix, count):
+        password = make_password('password123')
+        profile_ids = []
+        for batch in self._batches(range(count)):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}{i:07d}', email=f'{prefix}{i:07d}@example.com', password=password)
+                    for i in batch
+                ])
+                profiles = UserProfile.objects.bulk_create([
+                    UserProfile(
+                        user=user, nickname=f'Scale {i}', bio=f'Synthetic user {i}',
+                        default_avatar_url=generate_default_avatar_url(user.username),
+                        interests=[str(t) for t in self.rng.choice(TOPICS, size=3, replace=False)],
+                    )
+                    for i, user in zip(batch, users)
+                ])
+            profile_ids.extend(p.id for p in profiles)
+        return np.array(profile_ids)
+
+    def _create_posts(self, profile_ids, mean):
+        counts = self._per_user_counts(len(profile_ids), mean)
+        authors = np.repeat(profile_ids, counts)
+        self.rng.shuffle(authors)
+        topic_weights = self._zipf_weights(len(TOPICS))
+        post_ids = []
+        with explicit_timestamps(Post):
+            for batch in self._batches(authors):
+                created = sorted(self._timestamps(len(batch), skew=2.0))
+                posts = []
+                for author_id, created_at in zip(batch.tolist(), created):
+                    tags = list(dict.fromkeys(
+                        str(t) for t in self.rng.choice(TOPICS, size=self.rng.integers(1, 4), p=topic_weights)
+                    ))
+                    text = ' '.join(self.rng.choice(WORDS, size=8))
+                    posts.append(Post(
+                        author_id=author_id, caption=f'{text} ' + ' '.join(f'#{t}' for t in tags),
+                        tags=tags, created_at=created_at, is_public=bool(self.rng.random() > 0.05),
+                    ))
+                with transaction.atomic():
+                    posts = Post.objects.bulk_create(posts)
+                    replace_post_tags([(p.id, p.tags, p.created_at, p.is_public) for p in posts])
+                post_ids.extend(p.id for p in posts)
+        return np.array(post_ids)
+
+    def _create_follows(self, profile_ids, mean):
+        n = len(profile_ids)
+        counts = np.minimum(self._per_user_counts(n, mean), n - 1)
+        followers = np.repeat(np.arange(n), counts)
+        # Popularity rank is a random permutation, so celebrities are spread over the id range
+        popularity = self.rng.permutation(n)
+        followees = popularity[self.rng.choice(n, size=len(followers), p=self._zipf_weights(n))]
+        pairs = np.unique(np.stack([followers, followees], axis=1), axis=0)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        self.follow_pairs = profile_ids[pairs]
+
+        created = 0
+        with explicit_timestamps(Follow):
+            for batch in self._batches(pairs):
+                stamps = self._timestamps(len(batch))
+                Follow.objects.bulk_create([
+                    Follow(follower_id=int(profile_ids[a]), followee_id=int(profile_ids[b]), created_at=at)
+                    for (a, b), at in zip(batch, stamps)
+                ], ignore_conflicts=True)
+                created += len(batch)
+        for batch in self._batches(profile_ids.tolist()):
+            FollowService.reconcile_counts(batch)
+        return created
+
+    def _create_events(self, profile_ids, post_ids, mean):
+        if not len(post_ids):
+            return 0
+        counts = self._per_user_counts(len(profile_ids), mean)
+        users = np.repeat(profile_ids, counts)
+        hot = self.rng.permutation(len(post_ids))
+        posts = post_ids[hot[self.rng.choice(len(post_ids), size=len(users), p=self._zipf_weights(len(post_ids), 0.9))]]
+        kinds = self.rng.choice(EVENT_TYPES, size=len(users))
+
+        with explicit_timestamps(UserEvent):
+            for start in range(0, len(users), self.batch_size):
+                rows = slice(start, start + self.batch_size)
+                stamps = self._timestamps(len(users[rows]), skew=2.0)
+                UserEvent.objects.bulk_create([
+                    UserEvent(user_id=int(u), post_id=int(p), event_type=str(k), created_at=at)
+                    for u, p, k, at in zip(users[rows], posts[rows], kinds[rows], stamps)
+                ], ignore_conflicts=True)
+        return len(users)
+
+    def _create_threads(self, profile_ids, threads_per_user, messages_per_thread):
+        # DMs between a follower and someone they follow, so heavy followers chat more
+        follows = getattr(self, 'follow_pairs', np.zeros((0, 2), dtype=np.int64))
+        wanted = min(int(len(profile_ids) * threads_per_user), len(follows))
+        picked = follows[self.rng.choice(len(follows), size=wanted, replace=False)] if wanted else follows[:0]
+        pairs = {(int(min(a, b)), int(max(a, b))) for a, b in picked}
+        existing = set(DirectThreadIndex.objects.values_list('min_profile_id', 'max_profile_id'))
+        pairs = sorted(pairs - existing)
+
+        phrases = [' '.join(self.rng.choice(WORDS, size=6)) for _ in range(200)]
+        message_count = 0
+        with explicit_timestamps(ChatMessage):
+            for batch in self._batches(pairs):
+                with transaction.atomic():
+                    threads = ChatThread.objects.bulk_create([
+                        ChatThread(initiator_id=a, is_group=False, status='active') for a, _ in batch
+                    ])
+                    ThreadMembership.objects.bulk_create([
+                        ThreadMembership(thread_id=thread.id, profile_id=pid)
+                        for (a, b), thread in zip(batch, threads) for pid in (a, b)
+                    ])
+                    DirectThreadIndex.objects.bulk_create([
+                        DirectThreadIndex(min_profile_id=a, max_profile_id=b, thread=thread)
+                        for (a, b), thread in zip(batch, threads)
+                    ])
+
+                    messages = []
+                    for (a, b), thread in zip(batch, threads):
+                        count = max(1, int(self.rng.poisson(messages_per_thread)))
+                        for at in sorted(self._timestamps(count, skew=3.0)):
+                            message = ChatMessage(
+                                thread=thread, sender_id=a if self.rng.random() < 0.5 else b,
+                                content=phrases[int(self.rng.integers(len(phrases)))], created_at=at,
+                            )
+                            message.encrypt_content()
+                            messages.append(message)
+                    ChatMessage.objects.bulk_create(messages, batch_size=self.batch_size)
+                    message_count += len(messages)
+
+                    # Inbox state: each membership points at its thread's newest message
+                    newest = ChatMessage.objects.filter(thread_id=OuterRef('thread_id')).order_by('-created_at', '-id')
+                    ThreadMembership.objects.filter(thread__in=threads).update(
+                        last_message=Subquery(newest.values('id')[:1]),
+                        last_activity=Subquery(newest.values('created_at')[:1]),
+                    )
+        self.stdout.write(f'messages: {message_count}')
+        return len(pairs)
+
+    def _refresh_vectors(self, profile_ids):
+        for batch in self._batches(profile_ids.tolist()):
+            refresh_user_vectors(batch)
+        return len(profile_ids)
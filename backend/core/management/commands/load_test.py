@@ -0,0 +1,230 @@
+"""
+Management command to replay mixed traffic against the app in-process and
+report latency percentiles per endpoint.
+
+HTTP requests go through Django's test client (full middleware stack,
+session auth via force_login) from --concurrency threads, each acting as a
+randomly picked user whose username starts with --prefix (see
+generate_scale_data). The weighted mix below approximates production:
+mostly feed/explore/inbox reads, some chat sends and impression batches.
+
+WebSocket traffic goes through the ASGI application with channels'
+WebsocketCommunicator, authenticated with the same session cookie:
+inbox socket connects and chat echo round-trips (send -> group broadcast
+-> receive).
+
+Example: python manage.py load_test --requests 5000 --concurrency 8 --json report.json
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client
+
+from chat.models import ThreadMembership
+from core.models import Post, Tag, UserProfile
+
+# (endpoint label, weight)
+TRAFFIC_MIX = [
+    ('GET /api/posts/', 20),
+    ('GET /api/posts/explore/', 12),
+    ('GET /api/posts/explore/?tag=', 8),
+    ('GET /api/discover/', 4),
+    ('GET /api/trending-tags/', 3),
+    ('GET /api/recommendations/users/', 3),
+    ('GET /api/chat/threads/', 15),
+    ('GET /api/chat/threads/<id>/', 12),
+    ('POST /api/chat/messages/', 8),
+    ('POST /api/impressions/', 15),
+]
+
+
+class Session:
+    """One logged-in virtual user: a test client plus the ids it can act on"""
+
+    def __init__(self, user, thread_ids):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+        self.session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.thread_ids = thread_ids
+
+
+class Command(BaseCommand):
+    help = 'Replay mixed HTTP and WebSocket traffic and report p50/p95/p99 latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Total HTTP requests to send')
+        parser.add_argument('--concurrency', type=int, default=8, help='HTTP client threads')
+        parser.add_argument('--sessions', type=int, default=200, help='Distinct users to log in as')
+        parser.add_argument('--ws-clients', type=int, default=20, help='Concurrent WebSocket clients (0 to skip)')
+        parser.add_argument('--ws-messages', type=int, default=10, help='Chat echo round-trips per WebSocket client')
+        parser.add_argument('--prefix', default='scale_', help='Username prefix of the users to act as')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+        sessions = self._login(options['prefix'], options['sessions'])
+        self.post_ids = list(Post.objects.filter(is_public=True).order_by('-id').values_list('id', flat=True)[:5000])
+        self.tags = list(Tag.objects.order_by('id').values_list('name', flat=True)[:200])
+
+        started = time.perf_counter()
+        self._run_http(sessions, options['requests'], options['concurrency'])
+        http_elapsed = time.perf_counter() - started
+        if options['ws_clients']:
+            asyncio.run(self._run_ws(sessions, options['ws_clients'], options['ws_messages']))
+
+        report = self._report(http_elapsed, options['requests'])
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['requests']} requests in {report['elapsed_s']}s ({report['requests_per_s']} req/s)"
+        ))
+
+    # -- setup ----------------------------------------------------------
+
+    def _login(self, prefix, count):
+        profiles = list(
+            UserProfile.objects.filter(user__username__startswith=prefix, user__is_active=True)
+            .select_related('user').order_by('?')[:count]
+        )
+        if not profiles:
+            raise CommandError(f'No users starting with {prefix!r}; run generate_scale_data first')
+        threads = defaultdict(list)
+        for profile_id, thread_id in ThreadMembership.objects.filter(
+            profile__in=profiles
+        ).values_list('profile_id', 'thread_id'):
+            threads[profile_id].append(thread_id)
+        return [Session(profile.user, threads[profile.id]) for profile in profiles]
+
+    # -- HTTP -----------------------------------------------------------
+
+    def _record(self, label, seconds, ok):
+        with self.lock:
+            self.samples[label].append(seconds * 1000)
+            if not ok:
+                self.errors[label] += 1
+
+    def _request(self, rng, session, label):
+        client = session.client
+        if label == 'GET /api/posts/explore/?tag=' and self.tags:
+            return client.get('/api/posts/explore/', {'tag': rng.choice(self.tags)})
+        if label == 'GET /api/chat/threads/<id>/' and session.thread_ids:
+            return client.get(f'/api/chat/threads/{rng.choice(session.thread_ids)}/')
+        if label == 'POST /api/chat/messages/' and session.thread_ids:
+            return client.post('/api/chat/messages/', {
+                'thread': rng.choice(session.thread_ids), 'content': 'load test message',
+            }, content_type='application/json')
+        if label == 'POST /api/impressions/' and self.post_ids:
+            return client.post('/api/impressions/', {
+                'source': 'feed', 'post_ids': rng.sample(self.post_ids, min(20, len(self.post_ids))),
+            }, content_type='application/json')
+        if label.startswith('GET ') and '<' not in label and '?' not in label:
+            return client.get(label[4:])
+        return None  # nothing to act on for this user (no threads, no posts)
+
+    def _worker(self, sessions, count, seed):
+        rng = random.Random(seed)
+        labels, weights = zip(*TRAFFIC_MIX)
+        try:
+            for _ in range(count):
+                session = rng.choice(sessions)
+                label = rng.choices(labels, weights)[0]
+                started = time.perf_counter()
+                try:
+                    resp = self._request(rng, session, label)
+                except Exception:
+                    self._record(label, time.perf_counter() - started, ok=False)
+                    continue
+                if resp is not None:
+                    self._record(label, time.perf_counter() - started, ok=resp.status_code < 400)
+        finally:
+            close_old_connections()
+
+    def _run_http(self, sessions, total, concurrency):
+        concurrency = max(1, min(concurrency, total))
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        seeds = [self.rng.random() for _ in shares]
+        if concurrency == 1:
+            self._worker(sessions, shares[0], seeds[0])
+            return
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load-test') as pool:
+            for future in [pool.submit(self._worker, sessions, n, s) for n, s in zip(shares, seeds)]:
+                future.result()
+
+    # -- WebSocket ------------------------------------------------------
+
+    async def _ws_client(self, application, session, messages):
+        from channels.testing import WebsocketCommunicator
+
+        headers = [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={session.session_key}'.encode())]
+
+        started = time.perf_counter()
+        inbox = WebsocketCommunicator(application, '/ws/inbox/', headers=headers)
+        connected, _ = await inbox.connect()
+        self._record('WS connect /ws/inbox/', time.perf_counter() - started, ok=connected)
+        if connected:
+            await inbox.disconnect()
+
+        if not session.thread_ids:
+            return
+        chat = WebsocketCommunicator(application, f'/ws/chat/{session.thread_ids[0]}/', headers=headers)
+        connected, _ = await chat.connect()
+        if not connected:
+            self._record('WS echo /ws/chat/<id>/', 0, ok=False)
+            return
+        try:
+            for _ in range(messages):
+                started = time.perf_counter()
+                await chat.send_json_to({'message': 'ping'})
+                try:
+                    await chat.receive_json_from(timeout=5)
+                    ok = True
+                except asyncio.TimeoutError:
+                    ok = False
+                self._record('WS echo /ws/chat/<id>/', time.perf_counter() - started, ok=ok)
+        finally:
+            await chat.disconnect()
+
+    async def _run_ws(self, sessions, clients, messages):
+        from project.asgi import application
+
+        picked = [sessions[i % len(sessions)] for i in range(clients)]
+        await asyncio.gather(*(self._ws_client(application, s, messages) for s in picked))
+
+    # -- report ---------------------------------------------------------
+
+    def _report(self, http_elapsed, total):
+        endpoints = {}
+        self.stdout.write(f"{'endpoint':<36} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for label in sorted(self.samples):
+            ms = np.array(self.samples[label])
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            endpoints[label] = {
+                'count': len(ms), 'errors': self.errors[label],
+                'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2), 'max_ms': round(float(ms.max()), 2),
+            }
+            self.stdout.write(
+                f'{label:<36} {len(ms):>6} {self.errors[label]:>6} '
+                f'{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {ms.max():>8.1f}'
+            )
+        return {
+            'requests': total,
+            'elapsed_s': round(http_elapsed, 2),
+            'requests_per_s': round(total / http_elapsed, 1) if http_elapsed else None,
+            'endpoints': endpoints,
+        }
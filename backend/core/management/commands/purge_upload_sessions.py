@@ -0,0 +1,33 @@
+"""
+Management command to clean up abandoned chunked uploads:
+- deletes partial files for sessions idle longer than CHAT_UPLOAD_SESSION_TTL_HOURS
+- deletes finished/aborted session rows past the same age
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.models import UploadSession
+from chat.upload_views import remove_temp_file
+
+
+class Command(BaseCommand):
+    help = 'Delete stale resumable upload sessions and their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CHAT_UPLOAD_SESSION_TTL_HOURS,
+                            help='Idle time after which a session is considered abandoned')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+
+        removed = 0
+        for session in stale.iterator():
+            remove_temp_file(session.temp_path)
+            removed += 1
+
+        deleted, _ = stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} partial files, deleted {deleted} sessions'))
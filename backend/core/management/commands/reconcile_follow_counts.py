@@ -0,0 +1,27 @@
+"""
+Management command to recompute UserProfile.followers_count / following_count
+from the Follow table. Counters drift only when Follow rows are written outside
+FollowService (bulk imports, cascaded deletes), so run it after those.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import UserProfile
+from core.services.follow_service import FollowService
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized follower/following counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Profiles updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(UserProfile.objects.order_by('pk').values_list('pk', flat=True))
+
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            updated += FollowService.reconcile_counts(ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled follow counters for {updated} profiles'))
@@ -0,0 +1,36 @@
+"""
+Management command to recompute "people you may like" snapshots:
+- picks users whose snapshot is missing or older than RECOMMENDATION_SNAPSHOT_TTL
+- skips users inactive for RECOMMENDATION_ACTIVE_DAYS, so idle accounts cost nothing
+- recomputes the most recently active users first, on a pool of workers
+Run it from cron, or keep it running with --loop next to the web process.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.recommendation_snapshots import refresh_stale_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Refresh stale recommendation snapshots of active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Refresh at most this many users per pass')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Snapshots computed in parallel')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep refreshing until interrupted')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            refreshed, failed = refresh_stale_snapshots(limit=options['limit'], workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed {refreshed} recommendation snapshots ({failed} failed)'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
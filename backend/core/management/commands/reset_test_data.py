@@ -9,6 +9,7 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from core.models import UserProfile, Post, UserEvent, Follow, Notification, Comment
 from chat.models import ChatThread, ChatMessage, UserRestriction
+from core.services.follow_service import FollowService
 import random
 
 User = get_user_model()
@@ -114,6 +115,8 @@ class Command(BaseCommand):
             
             self.stdout.write(self.style.SUCCESS(f'Created {follow_count} follow relationships'))
             
+            FollowService.reconcile_counts()
+
             self.stdout.write(self.style.SUCCESS('✅ Database reset complete!'))
             self.stdout.write(self.style.SUCCESS(f'   - Kept: rama'))
             self.stdout.write(self.style.SUCCESS(f'   - Created: 100 new users (user001-user100)'))
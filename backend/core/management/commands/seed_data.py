@@ -5,7 +5,9 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import UserProfile, Post, Follow, Comment, UserEvent, Notification, SharedPost
 from chat.models import ChatThread, ChatMessage, UserRestriction, BlockedUser
+from chat.direct_threads import get_or_create_direct_thread
 from django.utils import timezone
+from core.services.follow_service import FollowService
 
 class Command(BaseCommand):
     help = 'Delete all users and create 10 users one by one with comprehensive relationships'
@@ -16,11 +18,6 @@ class Command(BaseCommand):
         # Clear ManyToMany relations first
         for t in ChatThread.objects.all():
             t.participants.clear()
-            t.admins.clear()
-            t.muted_by.clear()
-            t.pinned_by.clear()
-            t.hidden_by.clear()
-            t.deleted_by.clear()
         
         for m in ChatMessage.objects.all():
             m.deleted_by.clear()
@@ -122,8 +119,7 @@ class Command(BaseCommand):
         # Create 5 1:1 chats
         for _ in range(5):
             u1, u2 = random.sample(profiles, 2)
-            thread = ChatThread.objects.create(status='active', is_group=False)
-            thread.participants.add(u1, u2)
+            thread, _ = get_or_create_direct_thread(u1, u2, status='active')
             
             # Send few messages
             for k in range(3):
@@ -148,5 +144,7 @@ class Command(BaseCommand):
         Follow.objects.filter(follower=u1, followee=u10).delete()
         Follow.objects.filter(follower=u10, followee=u1).delete()
 
+        FollowService.reconcile_counts()
+
         self.stdout.write('Successfully created 10 users with posts, follows, chats, and blocks.')
         self.stdout.write('Seeding complete.')
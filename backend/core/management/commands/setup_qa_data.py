@@ -1,8 +1,10 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from core.models import UserProfile
-from chat.models import ChatThread, ChatMessage, BlockedUser
+from chat.models import ChatThread, ChatMessage, BlockedUser, ThreadMembership
+from chat.direct_threads import get_or_create_direct_thread
 from django.utils import timezone
+from core.services.follow_service import FollowService
 
 User = get_user_model()
 
@@ -51,16 +53,9 @@ class Command(BaseCommand):
 
         # Create 1:1 Thread (frozen)
         # Find existing thread between these two
-        thread_a = ChatThread.objects.filter(
-            is_group=False, 
-            participants=blocker
-        ).filter(
-            participants=blocked
-        ).first()
+        thread_a, created = get_or_create_direct_thread(blocker, blocked, status='active')
 
-        if not thread_a:
-            thread_a = ChatThread.objects.create(is_group=False, initiator=blocker, status='active')
-            thread_a.participants.set([blocker, blocked])
+        if created:
             self.stdout.write(f"      ↳ 1:1 Chat Thread created (ID: {thread_a.id})")
         else:
             self.stdout.write(f"      ↳ 1:1 Chat Thread found (ID: {thread_a.id})")
@@ -82,16 +77,7 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f"   🚫 SCENARIO B: Mutual Block between {u3.user.username} and {u4.user.username}"))
         
         # Create 1:1 Thread
-        thread_b = ChatThread.objects.filter(
-            is_group=False, 
-            participants=u3
-        ).filter(
-            participants=u4
-        ).first()
-
-        if not thread_b:
-            thread_b = ChatThread.objects.create(is_group=False, initiator=u3)
-            thread_b.participants.set([u3, u4])
+        thread_b, _ = get_or_create_direct_thread(u3, u4)
 
         
         # SCENARIO C: Group Chat with Blocked User
@@ -120,8 +106,8 @@ class Command(BaseCommand):
             )
             created_group = True
         
-        group.admins.add(admin)
         group.participants.set([admin, member_blocked, member_neutral])
+        group.set_member_state(admin, role=ThreadMembership.ROLE_ADMIN)
         group.save()
         
         if created_group:
@@ -180,6 +166,7 @@ class Command(BaseCommand):
         self.stdout.write(f"      ↳ {admin.user.username} COMMENTED on {member_neutral.user.username}'s post (Check if user_2 sees this comment)")
 
 
+        FollowService.reconcile_counts()
         self.stdout.write(self.style.SUCCESS('\n✅ QA Data Setup Complete!'))
         self.stdout.write("---------------------------------------------------------")
         self.stdout.write("LOGIN CREDENTIALS:")
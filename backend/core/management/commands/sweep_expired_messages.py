@@ -0,0 +1,40 @@
+"""
+Management command for chat message retention:
+- deletes messages whose disappearing timer ran out, in bounded batches along
+  the expires_at index, broadcasting a message_deleted event per message
+- finishes purging deleted threads whose background purge was interrupted
+Run it from cron, or keep it running with --loop as a small worker next to the
+ASGI process.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.retention import purge_deleted_threads, sweep_expired_messages
+
+
+class Command(BaseCommand):
+    help = 'Delete expired disappearing messages and finish purging deleted threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Messages deleted per transaction')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches per pass (default: until none are left)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping until interrupted')
+        parser.add_argument('--interval', type=int, default=30,
+                            help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = sweep_expired_messages(
+                batch_size=options['batch_size'], max_batches=options['max_batches']
+            )
+            purged = purge_deleted_threads(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {deleted} expired messages, purged {purged} deleted threads'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,269 @@
+"""
+Media serving with HTTP caching and byte ranges.
+
+- Strong ETags from the content hash (free for content-addressed blobs,
+  computed once and cached for legacy files)
+- If-None-Match / If-Modified-Since -> 304
+- Range / If-Range -> 206 for a single byte range, so audio/video players can seek
+- Full responses go out as FileResponse, which WSGI servers hand to
+  wsgi.file_wrapper (os.sendfile under gunicorn/uwsgi). With MEDIA_SENDFILE_BACKEND
+  set, the front-end server streams the file instead (X-Accel-Redirect / X-Sendfile).
+- Chat attachments are only served to participants of a thread that contains them
+- Default identicon avatars are rendered in memory on request (never written to
+  disk, so arbitrary seeds cannot fill MEDIA_ROOT) and cached by the client
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from chat.models import ChatThread
+from .models import MediaReference, UserProfile
+from .storage import CAS_PREFIX
+from .utils.avatar_renderer import DEFAULT_AVATAR_DIR, DEFAULT_AVATAR_RE, render_default_avatar
+
+logger = logging.getLogger(__name__)
+
+# Upload directories used before the content-addressed store; always private
+LEGACY_PRIVATE_PREFIXES = ('chat_attachments/', 'chat_thumbnails/')
+
+CAS_HASH_RE = re.compile(r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[\w]+)?$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+STREAM_BLOCK_SIZE = 64 * 1024
+ACL_CACHE_TIMEOUT = 300
+
+
+def _serve_default_avatar(request, name):
+    """Default identicon rendered in memory; None if name is not a default-avatar name"""
+    match = DEFAULT_AVATAR_RE.match(name)
+    if not match:
+        return None
+    # The name is the digest of the seed, so the content never changes
+    etag = '"{}-{}"'.format(*match.groups())
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render_default_avatar(name), content_type=mimetypes.guess_type(name)[0])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def _attachment_thread_ids(name, refresh=False):
+    """IDs of threads containing an attachment (file, thumbnail or variant) stored as name"""
+    cache_key = f'media_acl:{name}'
+    thread_ids = None if refresh else cache.get(cache_key)
+    if thread_ids is None:
+        thread_ids = list(
+            MediaReference.objects.filter(name=name, attachment__isnull=False)
+            .values_list('attachment__message__thread_id', flat=True).distinct()
+        )
+        cache.set(cache_key, thread_ids, ACL_CACHE_TIMEOUT)
+    return thread_ids
+
+
+def _is_public_media(name):
+    """Whether the same content is also published outside of chats"""
+    return (
+        MediaReference.objects.filter(name=name, post__isnull=False).exists()
+        or UserProfile.objects.filter(avatar=name).exists()
+    )
+
+
+def _can_access(request, name):
+    """
+    Returns (allowed, private). Media referenced by chat attachments is private
+    to the threads' participants unless the same content is public elsewhere.
+    """
+    if name.startswith(LEGACY_PRIVATE_PREFIXES) or name.startswith(CAS_PREFIX):
+        thread_ids = _attachment_thread_ids(name)
+        if not thread_ids and not name.startswith(LEGACY_PRIVATE_PREFIXES):
+            return True, False
+
+        user = request.user
+        if user.is_authenticated:
+            participant = ChatThread.objects.filter(id__in=thread_ids, participants__user=user).exists()
+            if not participant:
+                # The same content may have been sent to another thread since the lookup was cached
+                thread_ids = _attachment_thread_ids(name, refresh=True)
+                participant = ChatThread.objects.filter(id__in=thread_ids, participants__user=user).exists()
+            if participant:
+                return True, True
+
+        if name.startswith(CAS_PREFIX) and _is_public_media(name):
+            return True, False
+        return False, True
+
+    return True, False
+
+
+def _compute_etag(name, path, stat):
+    match = CAS_HASH_RE.match(name)
+    if match:
+        return f'"{match.group(1)}"'
+
+    cache_key = f'media_etag:{name}:{stat.st_size}:{int(stat.st_mtime)}'
+    etag = cache.get(cache_key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(STREAM_BLOCK_SIZE), b''):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()}"'
+        cache.set(cache_key, etag, None)
+    return etag
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+
+def _parse_range(header, size):
+    """
+    Parse a single 'bytes=' range. Returns (start, end) inclusive, None to ignore
+    the header (malformed or multi-range), or False if unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _stream_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _set_common_headers(response, etag, last_modified, private, immutable, content_type):
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Type'] = content_type
+    scope = 'private' if private else 'public'
+    if immutable:
+        response['Cache-Control'] = f'{scope}, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = f'{scope}, max-age=3600'
+    if private:
+        response['Vary'] = 'Cookie'
+
+
+@require_safe
+def serve_media(request, path):
+    name = path.replace('\\', '/').lstrip('/')
+    if name.startswith(f'{CAS_PREFIX}tmp/'):
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except Exception:
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        response = _serve_default_avatar(request, name)
+        if response is None:
+            raise Http404('Not found')
+        return response
+
+    allowed, private = _can_access(request, name)
+    if not allowed:
+        # 404 rather than 403: don't reveal which media exists
+        raise Http404('Not found')
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = _compute_etag(name, full_path, stat)
+    last_modified = http_date(stat.st_mtime)
+    immutable = name.startswith((CAS_PREFIX, DEFAULT_AVATAR_DIR))
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    # Conditional GET
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and int(stat.st_mtime) <= since
+    if not_modified:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        return response
+
+    # Byte range (ignored if If-Range no longer matches)
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header:
+        if_range = request.headers.get('If-Range')
+        if if_range:
+            if if_range.startswith(('"', 'W/')):
+                range_valid = if_range.strip() == etag
+            else:
+                range_valid = parse_http_date_safe(if_range) == int(stat.st_mtime)
+        else:
+            range_valid = True
+        if range_valid:
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    sendfile_backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if sendfile_backend and byte_range is None:
+        # Front-end server streams the file itself (and handles ranges natively)
+        response = HttpResponse()
+        if sendfile_backend == 'nginx':
+            prefix = getattr(settings, 'MEDIA_SENDFILE_URL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix + name
+        else:
+            response['X-Sendfile'] = full_path
+        _set_common_headers(response, etag, last_modified, private, immutable, content_type)
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_stream_range(full_path, start, length), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(full_path, 'rb'))
+        response['Content-Length'] = str(size)
+
+    _set_common_headers(response, etag, last_modified, private, immutable, content_type)
+    return response
@@ -0,0 +1,274 @@
+# core/metrics.py
+"""
+In-process metrics in the Prometheus text format, with no external service.
+
+Each worker process keeps its own counters, gauges and histograms and
+serves them at /api/internal/metrics/ (staff session, or
+"Authorization: Bearer <METRICS_TOKEN>" for a scraper); point the scraper
+at every worker and aggregate there. What is tracked:
+- HTTP: requests and latency per URL name (MetricsMiddleware)
+- DB: queries, time in SQL and connections opened (the SQL hook is shared
+  with request profiling, see core.profiling)
+- WebSocket: active and total connections and frames in/out per route
+  (WebSocketMetricsMiddleware, wrapped around the ASGI websocket app)
+- channel layer: group_send latency and fan-out (core.realtime.group_send)
+- chat messages created, and encrypt/decrypt operations (also through
+  core.profiling's hook)
+"""
+import math
+import os
+import threading
+import time
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def value(self, **labels):
+        """Number of observations"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(state, buckets=list(state['buckets']))) for key, state in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else _format_value(float(bound))
+                samples.append((f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', le)]), cumulative))
+            samples.append((f'{self.name}_sum', _format_labels(self.labelnames, key), state['sum']))
+            samples.append((f'{self.name}_count', _format_labels(self.labelnames, key), state['count']))
+        return samples
+
+
+REGISTRY = []
+
+http_requests = Counter('http_requests_total', 'HTTP requests by URL name, method and status', ['view', 'method', 'status'])
+http_latency = Histogram('http_request_duration_seconds', 'HTTP request latency by URL name', ['view', 'method'])
+http_in_progress = Gauge('http_requests_in_progress', 'HTTP requests being served by this worker')
+db_queries = Counter('db_queries_total', 'SQL queries run by this worker', ['alias'])
+db_query_seconds = Counter('db_query_seconds_total', 'Time spent in SQL by this worker', ['alias'])
+db_connections_opened = Counter('db_connections_opened_total', 'Database connections opened', ['alias'])
+ws_active = Gauge('websocket_connections_active', 'Open WebSocket connections on this worker', ['route'])
+ws_connections = Counter('websocket_connections_total', 'Accepted WebSocket connections', ['route'])
+ws_frames = Counter('websocket_messages_total', 'WebSocket frames by direction', ['route', 'direction'])
+group_send_latency = Histogram('channel_group_send_duration_seconds', 'Channel-layer group_send latency')
+group_send_fanout = Histogram(
+    'channel_group_send_fanout', 'Channels reached per group_send (in-memory layer only)', buckets=FANOUT_BUCKETS
+)
+chat_messages = Counter('chat_messages_total', 'Chat messages created')
+encryption_ops = Counter('encryption_operations_total', 'encrypt_text/decrypt_text calls', ['operation'])
+encryption_errors = Counter('encryption_errors_total', 'Failed encrypt_text/decrypt_text calls', ['operation'])
+encryption_seconds = Counter('encryption_seconds_total', 'Time spent in encrypt_text/decrypt_text', ['operation'])
+
+_STARTED = time.time()
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (0.0.4)"""
+    lines = [
+        '# HELP process_start_time_seconds Start time of this worker since the unix epoch',
+        '# TYPE process_start_time_seconds gauge',
+        f'process_start_time_seconds{{pid="{os.getpid()}"}} {_STARTED}',
+    ]
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Zero every metric (tests)"""
+    for metric in REGISTRY:
+        metric.clear()
+
+
+# -- instrumentation hooks ------------------------------------------------
+
+def observe_group_send(channel_layer, group, seconds):
+    group_send_latency.observe(seconds)
+    channels = getattr(channel_layer, 'groups', None)
+    if isinstance(channels, dict):
+        group_send_fanout.observe(len(channels.get(group, ())))
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    db_connections_opened.inc(alias=connection.alias)
+
+
+def _on_chat_message_saved(sender, created, **kwargs):
+    if created:
+        chat_messages.inc()
+
+
+connection_created.connect(_on_connection_created, dispatch_uid='metrics_connection_created')
+post_save.connect(_on_chat_message_saved, sender='chat.ChatMessage', dispatch_uid='metrics_chat_message')
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        http_in_progress.inc()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            http_in_progress.dec()
+            match = getattr(request, 'resolver_match', None)
+            view = (match.url_name or match.view_name) if match else 'unmatched'
+            http_requests.inc(view=view, method=request.method, status=status)
+            http_latency.observe(time.perf_counter() - started, view=view, method=request.method)
+
+
+def websocket_route(path):
+    """'/ws/chat/12/' -> 'chat': one label per consumer, not per thread"""
+    parts = [p for p in path.split('/') if p]
+    return parts[1] if len(parts) > 1 and parts[0] == 'ws' else (parts[0] if parts else 'root')
+
+
+class WebSocketMetricsMiddleware:
+    """ASGI middleware counting WebSocket connections and frames per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket' or not settings.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        route = websocket_route(scope.get('path', ''))
+        accepted = False
+
+        async def counting_receive():
+            message = await receive()
+            if message['type'] == 'websocket.receive':
+                ws_frames.inc(route=route, direction='in')
+            return message
+
+        async def counting_send(message):
+            nonlocal accepted
+            if message['type'] == 'websocket.accept' and not accepted:
+                accepted = True
+                ws_active.inc(route=route)
+                ws_connections.inc(route=route)
+            elif message['type'] == 'websocket.send':
+                ws_frames.inc(route=route, direction='out')
+            await send(message)
+
+        try:
+            return await self.app(scope, counting_receive, counting_send)
+        finally:
+            if accepted:
+                ws_active.dec(route=route)
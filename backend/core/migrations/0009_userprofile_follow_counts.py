@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    Follow = apps.get_model('core', 'Follow')
+    UserProfile = apps.get_model('core', 'UserProfile')
+    followers = Follow.objects.filter(followee=OuterRef('pk')).order_by().values('followee') \
+        .annotate(c=Count('id')).values('c')
+    following = Follow.objects.filter(follower=OuterRef('pk')).order_by().values('follower') \
+        .annotate(c=Count('id')).values('c')
+    UserProfile.objects.update(
+        followers_count=Coalesce(Subquery(followers), Value(0)),
+        following_count=Coalesce(Subquery(following), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_alter_collection_cover_image_alter_post_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_views_count(apps, schema_editor):
+    # Views recorded so far live in UserEvent (one row per user and post)
+    Post = apps.get_model('core', 'Post')
+    UserEvent = apps.get_model('core', 'UserEvent')
+    views = UserEvent.objects.filter(post=OuterRef('pk'), event_type='view').order_by().values('post') \
+        .annotate(c=Count('id')).values('c')
+    Post.objects.update(views_count=Coalesce(Subquery(views), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_userprofile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='impressions_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PostImpression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('impression', 'Impression'), ('view', 'View')], default='impression', max_length=10)),
+                ('source', models.CharField(blank=True, help_text='Surface the post was seen on (feed, explore, ...)', max_length=20)),
+                ('window', models.DateTimeField(help_text='Start of the dedup window')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impressions', to='core.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impressions', to='core.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', 'kind'], name='core_postim_post_id_00bbd8_idx'), models.Index(fields=['user', '-created_at'], name='core_postim_user_id_9429de_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'post', 'kind', 'window'), name='unique_impression_per_window')],
+            },
+        ),
+        migrations.RunPython(backfill_views_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_post_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTagVector',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tag_vector', serialize=False, to='core.userprofile')),
+                ('vector', models.BinaryField()),
+                ('latest_post_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
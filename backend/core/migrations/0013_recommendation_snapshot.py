@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_tag_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSnapshot',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation_snapshot', serialize=False, to='core.userprofile')),
+                ('items', models.JSONField(blank=True, default=list)),
+                ('computed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('requested_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
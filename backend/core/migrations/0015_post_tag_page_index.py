@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_post_tags'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='posttag',
+            name='posttag_tag_recent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_page_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _names(*names, variants=None):
+    found = {name for name in names if name}
+    for formats in (variants or {}).values():
+        found.update(name for name in formats.values() if name)
+    return found
+
+
+def backfill_media_references(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    MessageAttachment = apps.get_model('chat', 'MessageAttachment')
+    MediaReference = apps.get_model('core', 'MediaReference')
+    refs = []
+    for post in Post.objects.exclude(image='', image_variants={}).only('id', 'image', 'image_variants').iterator():
+        refs.extend(MediaReference(name=name, post_id=post.id) for name in _names(post.image.name, variants=post.image_variants))
+    for attachment in MessageAttachment.objects.only('id', 'file', 'thumbnail', 'variants').iterator():
+        refs.extend(
+            MediaReference(name=name, attachment_id=attachment.id)
+            for name in _names(attachment.file.name, attachment.thumbnail.name, variants=attachment.variants)
+        )
+    MediaReference.objects.bulk_create(refs, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_threadmembership_activity'),
+        ('core', '0015_post_tag_page_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name under MEDIA_ROOT', max_length=255)),
+                ('attachment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='media_references', to='chat.messageattachment')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='media_references', to='core.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name'], name='core_mediar_name_51eb9c_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_media_references, migrations.RunPython.noop),
+    ]
@@ -3,13 +3,15 @@ from django.conf import settings
 from django.utils import timezone
 import uuid
 
+from .storage import get_media_storage
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
     is_private = models.BooleanField(default=False)
     interests = models.JSONField(default=list, blank=True)
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar = models.ImageField(upload_to='avatars/', storage=get_media_storage, null=True, blank=True)
     default_avatar_url = models.URLField(max_length=500, null=True, blank=True)
     nickname = models.CharField(max_length=50, blank=True)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -30,6 +32,10 @@ class UserProfile(models.Model):
     # Password Recovery
     security_clue = models.CharField(max_length=255, blank=True, null=True, help_text="Hashed security clue for password recovery")
 
+    # Denormalized follow counters, maintained by FollowService
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         indexes = [
             models.Index(fields=['user']),
@@ -54,7 +60,7 @@ class UserProfile(models.Model):
         Priority:
         1. Custom uploaded avatar (if exists)
         2. default_avatar_url (if set)
-        3. Generated dicebear avatar
+        3. Generated identicon avatar
         
         Args:
             request: Optional Django request object for building absolute URIs
@@ -70,7 +76,8 @@ class Post(models.Model):
     author = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField(blank=True)
     caption = models.TextField(blank=True)
-    image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    image = models.ImageField(upload_to='posts/', storage=get_media_storage, null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text='Generated thumbnails: {size: {format: storage name}}')
     tags = models.JSONField(default=list, blank=True)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -80,6 +87,10 @@ class Post(models.Model):
     moderation_reason = models.TextField(blank=True)
     safety_score = models.IntegerField(default=100)
 
+    # Counters maintained by the impression buffer (core/events.py)
+    views_count = models.PositiveIntegerField(default=0)
+    impressions_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -100,6 +111,38 @@ class Post(models.Model):
     def comments_count(self):
         return self.comments.count()
 
+
+class Tag(models.Model):
+    """A normalised hashtag (see core/utils/tags.py)"""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostTag(models.Model):
+    """
+    Post <-> Tag index, kept in step with Post.tags on save. created_at and
+    is_public are copied from the post so tag pages and trending counts are
+    answered from this table's indexes alone.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_tags')
+    created_at = models.DateTimeField()
+    is_public = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_page_idx'),
+            models.Index(fields=['created_at', 'tag'], name='posttag_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} #{self.tag_id}"
+
 # In models.py, update the SharedPost model:
 class SharedPost(models.Model):
     """Track shared posts between users"""
@@ -145,6 +188,111 @@ class UserEvent(models.Model):
         return f"{self.user.user.username} {self.event_type}d post {self.post.id}"
 
 
+class PostCooccurrence(models.Model):
+    """
+    Sparse item-item co-occurrence of weighted like/save/share events, one row
+    per unordered pair (post_a <= post_b). The diagonal (post_a == post_b)
+    holds each post's squared norm. Maintained by PostSimilarityService.
+    """
+    post_a = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    post_b = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post_a', 'post_b'], name='unique_post_cooccurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['post_b']),
+        ]
+
+
+class PostNeighbor(models.Model):
+    """Top-K most similar posts for each post (cosine over co-occurrence)"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('post', 'neighbor')
+        indexes = [
+            models.Index(fields=['post', '-score']),
+        ]
+
+
+class JobCheckpoint(models.Model):
+    """Where an incremental offline job stopped (e.g. the last UserEvent id it processed)"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class UserTagVector(models.Model):
+    """
+    Hashed tag-frequency vector of a user's public posts, used for
+    similar-user search (core/user_embeddings.py). vector is EMBEDDING_DIM
+    float32 values; IDF weighting is applied by the in-process index.
+    """
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='tag_vector')
+    vector = models.BinaryField()
+    latest_post_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Tag vector for profile {self.profile_id}"
+
+
+class RecommendationSnapshot(models.Model):
+    """
+    Precomputed "people you may like" for one user (core/recommendation_snapshots.py).
+    items is a list of {profile_id, score, reason, matched_tags, ...}, best first.
+    """
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='recommendation_snapshot')
+    items = models.JSONField(default=list, blank=True)
+    computed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Last time the user read their suggestions; refreshes go to recent readers first
+    requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Recommendations for profile {self.profile_id}"
+
+
+class PostImpression(models.Model):
+    """
+    Append-only log of posts shown to (impression) or opened by (view) a user.
+    Written in batches by core.events; repeats within one dedup window share a
+    window start, so the unique constraint collapses them into one row.
+    """
+    KIND_IMPRESSION = 'impression'
+    KIND_VIEW = 'view'
+    KIND_CHOICES = [
+        (KIND_IMPRESSION, 'Impression'),
+        (KIND_VIEW, 'View'),
+    ]
+
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='impressions')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='impressions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_IMPRESSION)
+    source = models.CharField(max_length=20, blank=True, help_text='Surface the post was seen on (feed, explore, ...)')
+    window = models.DateTimeField(help_text='Start of the dedup window')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post', 'kind', 'window'], name='unique_impression_per_window'),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'kind']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} post {self.post_id} ({self.source})"
+
+
 class Follow(models.Model):
     follower = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='following_set')
     followee = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='followers_set')
@@ -220,7 +368,7 @@ class Collection(models.Model):
     """
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='collections')
     name = models.CharField(max_length=255)
-    cover_image = models.ImageField(upload_to='collection_covers/', blank=True, null=True)
+    cover_image = models.ImageField(upload_to='collection_covers/', storage=get_media_storage, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -245,3 +393,46 @@ class CollectionItem(models.Model):
 
     def __str__(self):
         return f"Post {self.post.id} in {self.collection.name}"
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file in the content-addressed media store (core/storage.py).
+    ref_count is maintained on save/delete and reconciled by gc_media_blobs.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text='Storage name under MEDIA_ROOT')
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class MediaReference(models.Model):
+    """
+    Which post or chat attachment stores a media name (image/file, thumbnail
+    or generated variant). Media access checks look names up here, by index,
+    instead of searching the variants JSON. Kept in sync by core.signals.
+    """
+    name = models.CharField(max_length=255, help_text='Storage name under MEDIA_ROOT')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='media_references')
+    attachment = models.ForeignKey(
+        'chat.MessageAttachment', on_delete=models.CASCADE, null=True, blank=True, related_name='media_references'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name']),
+        ]
+
+    def __str__(self):
+        owner = f"post {self.post_id}" if self.post_id else f"attachment {self.attachment_id}"
+        return f"{self.name} -> {owner}"
@@ -0,0 +1,98 @@
+# core/profile_summary.py
+"""
+Compact, cached profile summaries for nested serialization.
+
+Messages, comments, notifications and thread member lists only need who a
+profile is (id, uuid, username, nickname, avatar), not its social counts.
+Summaries are cached per profile under a version number; bumping the version
+(on profile or user save) invalidates every cached copy at once. A profile
+with no version key (never cached, or evicted) gets a fresh one, so data
+cached under an earlier version is never read again.
+"""
+import time
+
+from django.core.cache import cache
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(profile_id):
+    return f'profile_summary:v:{profile_id}'
+
+
+def _data_key(profile_id, version):
+    return f'profile_summary:{profile_id}:{version}'
+
+
+def _new_version():
+    # Differs from any version an evicted key could have reached
+    return time.time_ns() // 1000
+
+
+def invalidate_profile_summary(profile_id):
+    """Bump the profile's summary version so cached copies are ignored"""
+    try:
+        cache.incr(_version_key(profile_id))
+    except ValueError:
+        cache.set(_version_key(profile_id), _new_version(), None)
+
+
+def _get_versions(profile_ids):
+    """{profile_id: version}, starting a new version for profiles that have none"""
+    found = cache.get_many([_version_key(pid) for pid in profile_ids])
+    versions = {}
+    for pid in profile_ids:
+        version = found.get(_version_key(pid))
+        if version is None:
+            # add() so concurrent readers settle on the same version
+            cache.add(_version_key(pid), _new_version(), None)
+            version = cache.get(_version_key(pid)) or _new_version()
+        versions[pid] = version
+    return versions
+
+
+def build_profile_summary(profile):
+    """Uncached summary; avatar URLs are relative (made absolute per request)"""
+    from .utils.avatar_utils import get_avatar_url_from_profile
+    return {
+        'id': profile.id,
+        'uuid': str(profile.uuid),
+        'username': profile.user.username,
+        'nickname': profile.nickname or '',
+        'avatar': get_avatar_url_from_profile(profile),
+        'user': {
+            'id': profile.user_id,
+            'username': profile.user.username,
+        },
+    }
+
+
+def get_profile_summaries(profiles):
+    """
+    Return {profile_id: summary} for an iterable of UserProfile instances,
+    reading and filling the cache in two round trips.
+    """
+    profiles = {p.id: p for p in profiles if p is not None}
+    if not profiles:
+        return {}
+
+    versions = _get_versions(list(profiles))
+    data_keys = {pid: _data_key(pid, version) for pid, version in versions.items()}
+    cached = cache.get_many(list(data_keys.values()))
+
+    result = {}
+    missing = {}
+    for pid, key in data_keys.items():
+        if key in cached:
+            result[pid] = cached[key]
+        else:
+            summary = build_profile_summary(profiles[pid])
+            result[pid] = summary
+            missing[key] = summary
+    if missing:
+        cache.set_many(missing, SUMMARY_CACHE_TIMEOUT)
+    return result
+
+
+def get_profile_summary(profile):
+    return get_profile_summaries([profile]).get(profile.id)
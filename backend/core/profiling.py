@@ -0,0 +1,289 @@
+# core/profiling.py
+"""
+Per-request instrumentation.
+
+RequestProfilingMiddleware opens a RequestProfile for each request and
+the hot paths report into it:
+- SQL: count, time and the raw text of every query; they are fingerprinted
+  only when the profile is read, so repeated fingerprints point at N+1s
+  without taxing the requests nobody looks at
+- serializers: time spent in the outermost serializer.data per request
+- decrypt_text calls and time (core.security.encryption)
+- channel-layer sends from core.realtime
+
+The SQL and encryption hooks are the only ones in the process: each query
+and each encrypt/decrypt is timed once and reported both to the current
+profile (if any) and to core.metrics. The SQL hook is an execute_wrapper
+added to every connection when it opens, not per request.
+
+A sample of requests (REQUEST_PROFILING_SAMPLE_RATE, plus every request
+slower than REQUEST_PROFILING_SLOW_MS) is kept in an in-process ring buffer
+that staff can read at /api/internal/profiles/. Responses to staff also get
+a Server-Timing header with the breakdown (everyone, with
+REQUEST_PROFILING_SERVER_TIMING, for local development). When REQUEST_PROFILING_DUMP_DIR is set,
+sampled requests also run under cProfile and the .prof file is written for
+those slower than REQUEST_PROFILING_SLOW_MS.
+"""
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Distinct duplicated fingerprints kept per sampled request
+TOP_DUPLICATES = 5
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql):
+    """SQL with literals and IN lists collapsed, so the same query shape compares equal"""
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestProfile:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.queries = Counter()  # raw SQL -> times run
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+        self.decrypt_count = 0
+        self.decrypt_ms = 0.0
+        self.channel_sends = 0
+        self.channel_ms = 0.0
+
+    def duplicate_queries(self):
+        """[(fingerprint, count)] for query shapes run more than once, most repeated first"""
+        fingerprints = Counter()
+        for sql, n in self.queries.items():
+            fingerprints[fingerprint(sql)] += n
+        return [(sql, n) for sql, n in fingerprints.most_common() if n > 1]
+
+    def server_timing(self):
+        duplicates = sum(n - 1 for _, n in self.duplicate_queries())
+        return ', '.join([
+            f'sql;dur={self.sql_ms:.1f};desc="{self.sql_count} queries ({duplicates} duplicate)"',
+            f'serializer;dur={self.serializer_ms:.1f}',
+            f'decrypt;dur={self.decrypt_ms:.1f};desc="{self.decrypt_count} calls"',
+            f'channels;dur={self.channel_ms:.1f};desc="{self.channel_sends} sends"',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+    def as_dict(self, status_code=None):
+        return {
+            'at': timezone.now().isoformat(),
+            'method': self.method,
+            'path': self.path,
+            'status': status_code,
+            'total_ms': round(self.total_ms, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_ms, 2),
+            'duplicate_queries': [
+                {'sql': sql[:500], 'count': n} for sql, n in self.duplicate_queries()[:TOP_DUPLICATES]
+            ],
+            'serializer_ms': round(self.serializer_ms, 2),
+            'decrypt_count': self.decrypt_count,
+            'decrypt_ms': round(self.decrypt_ms, 2),
+            'channel_sends': self.channel_sends,
+            'channel_ms': round(self.channel_ms, 2),
+        }
+
+
+def current_profile():
+    """The RequestProfile of the request being served, or None"""
+    return _current.get()
+
+
+@contextmanager
+def record(kind, count=1):
+    """Time a block into the current request's profile: kind is 'decrypt' or 'channel'"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        if kind == 'decrypt':
+            profile.decrypt_count += count
+            profile.decrypt_ms += elapsed
+        elif kind == 'channel':
+            profile.channel_sends += count
+            profile.channel_ms += elapsed
+
+
+def instrument_encryption(operation):
+    """Decorator timing encrypt_text/decrypt_text once, for the metrics and the request profile"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.encryption_ops.inc(operation=operation)
+                metrics.encryption_seconds.inc(elapsed, operation=operation)
+                profile = _current.get()
+                if profile is not None and operation == 'decrypt':
+                    profile.decrypt_count += 1
+                    profile.decrypt_ms += elapsed * 1000
+        return wrapper
+    return decorator
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        alias = context['connection'].alias
+        metrics.db_queries.inc(alias=alias)
+        metrics.db_query_seconds.inc(elapsed, alias=alias)
+        profile = _current.get()
+        if profile is not None:
+            profile.sql_ms += elapsed * 1000
+            profile.sql_count += 1
+            profile.queries[sql] += 1
+
+
+def _install_sql_wrapper(sender, connection, **kwargs):
+    # Fires again on reconnect, with the same execute_wrappers list
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+connection_created.connect(_install_sql_wrapper, dispatch_uid='profiling_sql_wrapper')
+
+
+_serializers_patched = False
+
+
+def instrument_serializers():
+    """Time BaseSerializer.data; nested serializers count once, inside the outermost"""
+    global _serializers_patched
+    if _serializers_patched:
+        return
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        profile = _current.get()
+        if profile is None:
+            return original(self)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            profile.serializer_depth -= 1
+            if profile.serializer_depth == 0:
+                profile.serializer_ms += (time.perf_counter() - started) * 1000
+
+    BaseSerializer.data = property(data)
+    _serializers_patched = True
+
+
+class ProfileBuffer:
+    """The most recent sampled request profiles, newest last"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, path=None, limit=None):
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if path:
+            entries = [e for e in entries if e['path'].startswith(path)]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+profile_buffer = ProfileBuffer(int(getattr(settings, 'REQUEST_PROFILING_BUFFER_SIZE', 500)))
+
+
+def _dump_path(profile):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', profile.path).strip('_') or 'root'
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    return os.path.join(settings.REQUEST_PROFILING_DUMP_DIR, f'{stamp}_{profile.method}_{slug}_{profile.total_ms:.0f}ms.prof')
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.REQUEST_PROFILING:
+            instrument_serializers()
+
+    def __call__(self, request):
+        if not settings.REQUEST_PROFILING:
+            return self.get_response(request)
+
+        profile = RequestProfile(request.method, request.path)
+        sampled = random.random() < settings.REQUEST_PROFILING_SAMPLE_RATE
+        profiler = cProfile.Profile() if sampled and settings.REQUEST_PROFILING_DUMP_DIR else None
+        token = _current.set(profile)
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+
+        profile.total_ms = (time.perf_counter() - profile.started) * 1000
+        user = getattr(request, 'user', None)
+        if settings.REQUEST_PROFILING_SERVER_TIMING or (user is not None and user.is_staff):
+            response['Server-Timing'] = profile.server_timing()
+
+        slow = settings.REQUEST_PROFILING_SLOW_MS and profile.total_ms >= settings.REQUEST_PROFILING_SLOW_MS
+        if sampled or slow:
+            profile_buffer.add(profile.as_dict(response.status_code))
+        if profiler is not None and slow:
+            try:
+                os.makedirs(settings.REQUEST_PROFILING_DUMP_DIR, exist_ok=True)
+                profiler.dump_stats(_dump_path(profile))
+            except OSError as e:
+                logger.error(f"Could not write profile for {profile.path}: {e}")
+        return response
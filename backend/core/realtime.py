@@ -0,0 +1,85 @@
+# core/realtime.py
+"""
+Helpers for pushing events to WebSocket clients through the channel layer.
+"""
+import asyncio
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .metrics import observe_group_send
+from .profiling import record
+
+logger = logging.getLogger(__name__)
+
+
+def thread_group(thread_id):
+    """Channel-layer group joined by every socket open on a chat thread"""
+    return f'thread_{thread_id}'
+
+
+async def group_send(channel_layer, group, payload):
+    """channel_layer.group_send, with its latency and fan-out recorded in core.metrics"""
+    started = time.perf_counter()
+    try:
+        await channel_layer.group_send(group, payload)
+    finally:
+        observe_group_send(channel_layer, group, time.perf_counter() - started)
+
+
+def broadcast(group, payload):
+    """
+    Send payload to a channel-layer group.
+    Failures are logged and swallowed so they never fail the calling request.
+    """
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        with record('channel'):
+            async_to_sync(group_send)(channel_layer, group, payload)
+    except Exception as e:
+        logger.error(f"WebSocket broadcast to {group} failed: {e}")
+
+
+def broadcast_many(events):
+    """
+    Send several (group, payload) events in one trip through the channel layer,
+    e.g. one new-message event per thread after a bulk share.
+    """
+    if not events:
+        return
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        async def send_all():
+            results = await asyncio.gather(
+                *(group_send(channel_layer, group, payload) for group, payload in events),
+                return_exceptions=True
+            )
+            for (group, _), result in zip(events, results):
+                if isinstance(result, Exception):
+                    logger.error(f"WebSocket broadcast to {group} failed: {result}")
+
+        with record('channel', count=len(events)):
+            async_to_sync(send_all)()
+    except Exception as e:
+        logger.error(f"WebSocket batch broadcast of {len(events)} events failed: {e}")
+
+
+def thread_event(thread_id, action, **data):
+    """(group, payload) pair for a 'chat.message' event, for use with broadcast_many"""
+    return thread_group(thread_id), {
+        'type': 'chat.message',
+        'action': action,
+        **data
+    }
+
+
+def broadcast_to_thread(thread_id, action, **data):
+    """Send a 'chat.message' event with the given action to a thread's sockets"""
+    broadcast(*thread_event(thread_id, action, **data))
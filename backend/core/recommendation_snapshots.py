@@ -0,0 +1,151 @@
+# core/recommendation_snapshots.py
+"""
+Precomputed "people you may like" per user.
+
+get_hashtag_recommendations is too slow for the request path, so its top
+SNAPSHOT_SIZE results are stored in a RecommendationSnapshot row:
+- reads serve the stored row with stale-while-revalidate semantics: a
+  snapshot older than RECOMMENDATION_SNAPSHOT_TTL is still returned, and a
+  refresh is queued on the background pool (at most one per user at a time)
+- the refresh_recommendations command recomputes stale snapshots in a worker
+  pool, most recently active users first; users who have neither logged in
+  nor read their suggestions within RECOMMENDATION_ACTIVE_DAYS are skipped
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SIZE = 24
+# Reads record requested_at at most this often per user
+REQUEST_TOUCH_INTERVAL = timedelta(minutes=5)
+_NEVER = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def is_stale(snapshot, now=None):
+    now = now or timezone.now()
+    ttl = timedelta(seconds=settings.RECOMMENDATION_SNAPSHOT_TTL)
+    return snapshot.computed_at is None or snapshot.computed_at < now - ttl
+
+
+def compute_snapshot(profile_id):
+    """Recompute and store one user's suggestions"""
+    from .models import RecommendationSnapshot, UserProfile
+    from .recommendations import get_hashtag_recommendations
+
+    profile = UserProfile.objects.filter(id=profile_id).first()
+    if profile is None:
+        return None
+    items = [
+        {
+            'profile_id': r['profile'].id,
+            'score': round(r['score'], 4),
+            'reason': r['reason'],
+            'matched_tags': r['matched_tags'],
+            'is_active': r['is_active'],
+            'activity_badge': r['activity_badge'],
+        }
+        for r in get_hashtag_recommendations(profile, k=SNAPSHOT_SIZE)
+    ]
+    snapshot, _ = RecommendationSnapshot.objects.update_or_create(
+        profile_id=profile_id, defaults={'items': items, 'computed_at': timezone.now()}
+    )
+    return snapshot
+
+
+def _refresh_and_release(profile_id):
+    try:
+        compute_snapshot(profile_id)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(profile_id)
+
+
+def schedule_refresh(profile_id):
+    """Queue a background recompute unless one is already running in this process"""
+    with _in_flight_lock:
+        if profile_id in _in_flight:
+            return False
+        _in_flight.add(profile_id)
+    run_in_background(_refresh_and_release, profile_id)
+    return True
+
+
+def read_snapshot(profile):
+    """
+    The user's stored snapshot (or None before the first one exists), never
+    computed inline. Missing or stale snapshots get a background refresh.
+    """
+    from .models import RecommendationSnapshot
+
+    now = timezone.now()
+    snapshot = RecommendationSnapshot.objects.filter(profile=profile).first()
+    if snapshot is None:
+        RecommendationSnapshot.objects.get_or_create(profile=profile, defaults={'requested_at': now})
+        schedule_refresh(profile.id)
+        return None
+    if snapshot.requested_at is None or snapshot.requested_at < now - REQUEST_TOUCH_INTERVAL:
+        RecommendationSnapshot.objects.filter(profile=profile).update(requested_at=now)
+    if is_stale(snapshot, now):
+        schedule_refresh(profile.id)
+    return snapshot
+
+
+def stale_profile_ids(limit=None, now=None):
+    """Active users whose snapshot is missing or stale, most recently active first"""
+    from .models import UserProfile
+
+    now = now or timezone.now()
+    active_since = now - timedelta(days=settings.RECOMMENDATION_ACTIVE_DAYS)
+    stale_before = now - timedelta(seconds=settings.RECOMMENDATION_SNAPSHOT_TTL)
+    profiles = UserProfile.objects.filter(
+        Q(user__last_login__gte=active_since) | Q(recommendation_snapshot__requested_at__gte=active_since),
+        user__is_active=True,
+    ).filter(
+        Q(recommendation_snapshot__isnull=True)
+        | Q(recommendation_snapshot__computed_at__isnull=True)
+        | Q(recommendation_snapshot__computed_at__lt=stale_before)
+    ).annotate(
+        last_seen=Greatest(
+            Coalesce('user__last_login', _NEVER), Coalesce('recommendation_snapshot__requested_at', _NEVER)
+        )
+    ).order_by('-last_seen', 'id').values_list('id', flat=True)
+    return list(profiles[:limit] if limit else profiles)
+
+
+def _compute_with_cleanup(profile_id):
+    try:
+        compute_snapshot(profile_id)
+        return True
+    except Exception as e:
+        logger.error(f"Recommendation snapshot for profile {profile_id} failed: {e}", exc_info=True)
+        return False
+    finally:
+        close_old_connections()
+
+
+def refresh_stale_snapshots(limit=None, workers=4):
+    """Recompute stale snapshots of active users on a pool of workers. Returns (refreshed, failed)."""
+    profile_ids = stale_profile_ids(limit=limit)
+    if not profile_ids:
+        return 0, 0
+    if workers <= 1 or getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        results = [_compute_with_cleanup(pid) for pid in profile_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recommendations') as pool:
+            results = list(pool.map(_compute_with_cleanup, profile_ids))
+    refreshed = sum(results)
+    return refreshed, len(results) - refreshed
@@ -4,7 +4,8 @@ from django.db.models import Count, Q, Prefetch
 from django.utils import timezone
 from datetime import timedelta
 from collections import Counter
-from .models import UserProfile, Post, UserEvent, Follow
+from .models import UserProfile, Post, PostTag, UserEvent, Follow
+from .user_embeddings import get_user_index, tag_counts, tag_vector
 
 logger = logging.getLogger(__name__)
 
@@ -12,77 +13,55 @@ def get_hashtag_recommendations(profile, k=12):
     """
     Get hashtag-based recommendations.
     1. Build user profile from hashtags in their posts.
-    2. Rank other users by hashtag similarity.
+    2. Rank other users by cosine similarity of TF-IDF tag vectors (user index).
     3. Weight by recency and activity.
     """
-    # 1. Get my hashtag profile (all time but weighted? No, keep it simple first)
-    my_posts = Post.objects.filter(author=profile).prefetch_related('author__user')
-    my_tags_counter = Counter()
-    for post in my_posts:
-        if post.tags:
-            my_tags_counter.update([t.lower() for t in post.tags])
-    
+    # 1. Get my hashtag profile
+    my_tags_counter = tag_counts(Post.objects.filter(author=profile).values_list('tags', flat=True))
     if not my_tags_counter:
         return []
 
-    my_tags_set = set(my_tags_counter.keys())
-    
-    # 2. Find candidate users (shared tags)
-    # Exclude self and already followed
-    following_ids = Follow.objects.filter(follower=profile).values_list('followee_id', flat=True)
-    
-    # Get all users who have at least one shared hashtag
-    candidates = UserProfile.objects.exclude(id=profile.id).exclude(id__in=following_ids)
-    
-    active_cutoff = timezone.now() - timedelta(days=30)
-    
+    # 2. Nearest users by tag vector; exclude self and already followed
+    following_ids = set(Follow.objects.filter(follower=profile).values_list('followee_id', flat=True))
+    nearest = get_user_index().query(tag_vector(my_tags_counter), k=k * 2, exclude=following_ids | {profile.id})
+    if not nearest:
+        return []
+    candidate_ids = [pid for pid, _ in nearest]
+    candidates = UserProfile.objects.in_bulk(candidate_ids)
+
+    # Tags and latest post of every candidate in one query
+    candidate_counters = {pid: Counter() for pid in candidate_ids}
+    latest_post = {}
+    posts = Post.objects.filter(author_id__in=candidate_ids, is_public=True) \
+        .values_list('author_id', 'tags', 'created_at')
+    for author_id, tags, created_at in posts:
+        candidate_counters[author_id].update(tag_counts([tags]))
+        if author_id not in latest_post or created_at > latest_post[author_id]:
+            latest_post[author_id] = created_at
+
     recommendations = []
-    
-    for candidate in candidates:
-        candidate_posts = Post.objects.filter(author=candidate, is_public=True).order_by('-created_at')[:50]
-        if not candidate_posts:
-            continue
-            
-        candidate_tags_counter = Counter()
-        for post in candidate_posts:
-            if post.tags:
-                candidate_tags_counter.update([t.lower() for t in post.tags])
-        
-        if not candidate_tags_counter:
-            continue
-            
-        candidate_tags_set = set(candidate_tags_counter.keys())
-        shared_tags = my_tags_set & candidate_tags_set
-        
-        if not shared_tags:
+    for candidate_id, similarity in nearest:
+        candidate = candidates.get(candidate_id)
+        candidate_tags_counter = candidate_counters[candidate_id]
+        shared_tags = set(my_tags_counter) & set(candidate_tags_counter)
+        if candidate is None or not shared_tags:
             continue
-            
-        # Calculate Similarity Score (Jaccard-like or overlap)
-        # Score = (Count of shared tags) / (Total unique tags between both)
-        score = len(shared_tags) / len(my_tags_set | candidate_tags_set)
-        
-        # Weighting:
-        # Extra weight for shared tags that are frequent for BOTH
-        for tag in shared_tags:
-            # Boost score based on how much they both like this tag
-            weight = (my_tags_counter[tag] * candidate_tags_counter[tag]) ** 0.5
-            score += (weight * 0.05) # Small boost per strong shared interest
-            
+
+        score = similarity
         # Recency Boost
-        latest_post = candidate_posts[0].created_at
-        days_since_post = (timezone.now() - latest_post).days
+        days_since_post = (timezone.now() - latest_post[candidate_id]).days
         if days_since_post <= 7:
             score *= 1.2 # 20% boost for active this week
         elif days_since_post <= 30:
             score *= 1.1 # 10% boost for active this month
-            
+
         # Normalize/Cap
         score = min(score, 1.0)
-        
+
         # Reason building
         top_shared = sorted(list(shared_tags), key=lambda t: my_tags_counter[t] + candidate_tags_counter[t], reverse=True)[:3]
         reason = f"Combined interests: #{', #'.join(top_shared)}"
-        
+
         recommendations.append({
             'profile': candidate,
             'score': score,
@@ -101,11 +80,6 @@ def get_hashtag_recommendations(profile, k=12):
 def get_trending_hashtags(limit=10, days=7):
     """Simple trending tags based on count"""
     cutoff = timezone.now() - timedelta(days=days)
-    posts = Post.objects.filter(created_at__gte=cutoff, is_public=True)
-    
-    counter = Counter()
-    for post in posts:
-        if post.tags:
-            counter.update([t.lower() for t in post.tags])
-            
-    return counter.most_common(limit)
+    rows = PostTag.objects.filter(created_at__gte=cutoff, is_public=True) \
+        .values('tag__name').annotate(uses=Count('id')).order_by('-uses', 'tag__name')[:limit]
+    return [(row['tag__name'], row['uses']) for row in rows]
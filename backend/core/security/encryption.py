@@ -2,6 +2,9 @@ from cryptography.fernet import Fernet
 from django.conf import settings
 import logging
 
+from core.metrics import encryption_errors
+from core.profiling import instrument_encryption
+
 logger = logging.getLogger(__name__)
 
 # Cache for Fernet instances to avoid re-initializing
@@ -39,6 +42,7 @@ def init_encryption():
 # Initialize on module load
 init_encryption()
 
+@instrument_encryption('encrypt')
 def encrypt_text(plaintext: str):
     """Encrypts text using the latest key. Returns (ciphertext, version)."""
     if not plaintext:
@@ -47,11 +51,13 @@ def encrypt_text(plaintext: str):
     current_fernet = _fernets.get(_current_version)
     if not current_fernet:
         logger.error("No active encryption key available!")
+        encryption_errors.inc(operation='encrypt')
         return None, None
         
     ciphertext = current_fernet.encrypt(plaintext.encode())
     return ciphertext, _current_version
 
+@instrument_encryption('decrypt')
 def decrypt_text(ciphertext, version: int) -> str:
     """Decrypts text using the specified key version."""
     if not ciphertext or not version:
@@ -60,6 +66,7 @@ def decrypt_text(ciphertext, version: int) -> str:
     fernet = _fernets.get(version)
     if not fernet:
         logger.error(f"No encryption key found for version {version}")
+        encryption_errors.inc(operation='decrypt')
         return "[Decryption Error: Missing Key]"
 
     try:
@@ -69,6 +76,7 @@ def decrypt_text(ciphertext, version: int) -> str:
         return fernet.decrypt(ciphertext).decode()
     except Exception as e:
         logger.error(f"Decryption failed for version {version}: {e}")
+        encryption_errors.inc(operation='decrypt')
         return "[Decryption Error]"
 
 def get_current_version():
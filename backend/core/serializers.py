@@ -7,19 +7,77 @@ from .models import (
     Collection, CollectionItem
 ) # Removed chat models
 from .security.encryption import encrypt_text, decrypt_text
+from .profile_summary import get_profile_summary, get_profile_summaries
+from .utils.avatar_utils import resolve_default_avatar_url, storable_default_avatar_url
+from .utils.media_urls import get_variant_urls
+from .services.relationship_service import (
+    RelationshipService, FOLLOWING, BLOCKED_BY_ME, BLOCKING_ME
+)
 
 User = get_user_model()
 
+
+def _viewer_profile(context):
+    request = context.get('request')
+    if request and request.user.is_authenticated:
+        return getattr(request.user, 'userprofile', None)
+    return None
+
+
+def prefetch_relationships(context, profile_ids):
+    """Resolve viewer relationships for many profiles at once into the serializer context"""
+    memo = context.setdefault('_relationship_masks', {})
+    missing = [pid for pid in profile_ids if pid not in memo]
+    if missing:
+        memo.update(RelationshipService.resolve(_viewer_profile(context), missing))
+    return memo
+
+
+def relationship_mask(context, profile_id):
+    """Viewer relationship bitmask for one profile, memoized per serialization"""
+    memo = context.get('_relationship_masks')
+    if memo is None or profile_id not in memo:
+        memo = prefetch_relationships(context, [profile_id])
+    return memo[profile_id]
+
+
+def _save_changed_fields(instance, validated_data):
+    """
+    ModelSerializer.update without the full-row save: counters such as
+    followers_count or views_count are incremented with F() elsewhere and a
+    stale copy must not be written back.
+    """
+    for attr, value in validated_data.items():
+        setattr(instance, attr, value)
+    if validated_data:
+        instance.save(update_fields=list(validated_data))
+    return instance
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "username", "first_name", "last_name")
 
+class RelationshipListSerializer(serializers.ListSerializer):
+    """Resolves viewer relationships for every profile in the list up front"""
+    profile_id_field = 'id'
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        prefetch_relationships(self.context, [getattr(item, self.profile_id_field) for item in items])
+        return super().to_representation(items)
+
+
+class PostListSerializer(RelationshipListSerializer):
+    profile_id_field = 'author_id'
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     avatar = serializers.SerializerMethodField()
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     is_following = serializers.SerializerMethodField()
     is_blocked = serializers.SerializerMethodField()
     is_blocked_by_me = serializers.SerializerMethodField()
@@ -31,74 +89,38 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ("id", "uuid", "user", "bio", "is_private", "interests", "avatar", "default_avatar_url", "nickname", "followers_count", "following_count", "is_following", "is_blocked", "is_blocked_by_me", "is_blocking_me")
+        list_serializer_class = RelationshipListSerializer
 
     def get_avatar(self, obj):
         """Get avatar URL using the model's get_avatar_url method for consistency"""
         request = self.context.get('request')
         return obj.get_avatar_url(request)
     
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
-
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                profile = request.user.userprofile
-                return Follow.objects.filter(follower=profile, followee=obj).exists()
-            except UserProfile.DoesNotExist:
-                return False
-        return False
+        return bool(relationship_mask(self.context, obj.id) & FOLLOWING)
 
     def get_is_blocked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                profile = request.user.userprofile
-                from chat.models import UserRestriction
-                from django.db.models import Q
-                return UserRestriction.objects.filter(
-                    (Q(user=profile, restricted_user=obj) | Q(user=obj, restricted_user=profile)),
-                    restriction_type='block'
-                ).exists()
-            except Exception:
-                return False
-        return False
+        return bool(relationship_mask(self.context, obj.id) & (BLOCKED_BY_ME | BLOCKING_ME))
 
     def get_is_blocked_by_me(self, obj):
         """Check if the current user has blocked this profile"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                profile = request.user.userprofile
-                from chat.models import UserRestriction
-                return UserRestriction.objects.filter(
-                    user=profile,
-                    restricted_user=obj,
-                    restriction_type='block'
-                ).exists()
-            except Exception:
-                return False
-        return False
+        return bool(relationship_mask(self.context, obj.id) & BLOCKED_BY_ME)
 
     def get_is_blocking_me(self, obj):
         """Check if this profile has blocked the current user"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                profile = request.user.userprofile
-                from chat.models import UserRestriction
-                return UserRestriction.objects.filter(
-                    user=obj,
-                    restricted_user=profile,
-                    restriction_type='block'
-                ).exists()
-            except Exception:
-                return False
-        return False
+        return bool(relationship_mask(self.context, obj.id) & BLOCKING_ME)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('default_avatar_url'):
+            # Stored relative for our own avatars; clients need the backend's absolute URL
+            data['default_avatar_url'] = resolve_default_avatar_url(
+                data['default_avatar_url'], instance.user.username, self.context.get('request')
+            )
+        return data
+
+    def validate_default_avatar_url(self, value):
+        return storable_default_avatar_url(value)
 
     def update(self, instance, validated_data):
         # Handle username update if provided in initial_data
@@ -108,11 +130,45 @@ class UserProfileSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({"username": "Username already exists."})
             instance.user.username = username
             instance.user.save()
-            
-        return super().update(instance, validated_data)
+
+        return _save_changed_fields(instance, validated_data)
+
+class ProfileSummaryListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = data.all() if hasattr(data, 'all') else data
+        items = list(items)
+        # Fill the summary memo for the whole list in one cache round trip
+        memo = self.context.setdefault('_profile_summaries', {})
+        memo.update(get_profile_summaries([p for p in items if p.id not in memo]))
+        prefetch_relationships(self.context, [p.id for p in items])
+        return [self.child.to_representation(item) for item in items]
+
+
+class ProfileSummarySerializer(serializers.BaseSerializer):
+    """
+    Compact read-only profile (id, uuid, username, nickname, avatar, user) for
+    nesting in messages, comments, notifications and member lists.
+    Identity fields come from the profile summary cache; viewer-relative flags
+    come from RelationshipService, resolved once per distinct profile per serialization.
+    """
+    class Meta:
+        list_serializer_class = ProfileSummaryListSerializer
+
+    def to_representation(self, instance):
+        memo = self.context.setdefault('_profile_summaries', {})
+        summary = memo.get(instance.id)
+        if summary is None:
+            summary = memo[instance.id] = get_profile_summary(instance)
+
+        data = dict(summary)
+        request = self.context.get('request')
+        if request and data['avatar'] and data['avatar'].startswith('/'):
+            data['avatar'] = request.build_absolute_uri(data['avatar'])
+        data.update(RelationshipService.flags(relationship_mask(self.context, instance.id)))
+        return data
 
 class CommentSerializer(serializers.ModelSerializer):
-    author = UserProfileSerializer(read_only=True)
+    author = ProfileSummarySerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(read_only=True)
     
     class Meta:
@@ -124,6 +180,7 @@ class PostSerializer(serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     image = serializers.ImageField(required=False, allow_null=True)
+    image_variants = serializers.SerializerMethodField()
     likes_count = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
@@ -132,11 +189,18 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = (
-            "id", "author", "content", "caption", "image", 
+            "id", "author", "content", "caption", "image", "image_variants",
             "tags", "is_public", "created_at", "comments",
-            "likes_count", "comments_count", "is_liked", "is_saved"
+            "likes_count", "comments_count", "is_liked", "is_saved", "views_count"
         )
-        read_only_fields = ("created_at",)
+        read_only_fields = ("created_at", "views_count")
+        list_serializer_class = PostListSerializer
+
+    def get_image_variants(self, obj):
+        """Thumbnail URLs generated by the background media pipeline"""
+        if not obj.image:
+            return {}
+        return get_variant_urls(obj.image, obj.image_variants, self.context.get('request'))
 
     def get_likes_count(self, obj):
         return UserEvent.objects.filter(post=obj, event_type="like").count()
@@ -167,6 +231,9 @@ class PostSerializer(serializers.ModelSerializer):
     def validate_tags(self, value):
         return value or []
 
+    def update(self, instance, validated_data):
+        return _save_changed_fields(instance, validated_data)
+
 class SimpleAuthorSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username')
     
@@ -182,8 +249,8 @@ class SimplePostSerializer(serializers.ModelSerializer):
         fields = ("id", "content", "image", "author")
 
 class NotificationSerializer(serializers.ModelSerializer):
-    user = UserProfileSerializer(read_only=True)
-    actor = UserProfileSerializer(read_only=True, allow_null=True)
+    user = ProfileSummarySerializer(read_only=True)
+    actor = ProfileSummarySerializer(read_only=True, allow_null=True)
     post = SimplePostSerializer(read_only=True, allow_null=True)
     
     class Meta:
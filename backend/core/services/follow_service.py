@@ -0,0 +1,71 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Follow, UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class FollowService:
+    """
+    All follow graph writes go through here so UserProfile.followers_count /
+    following_count stay in step with the Follow table.
+    """
+
+    @staticmethod
+    def follow(follower, followee):
+        """Create the follow edge. Returns True if it did not exist before."""
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+            if created:
+                UserProfile.objects.filter(pk=followee.pk).update(followers_count=F('followers_count') + 1)
+                UserProfile.objects.filter(pk=follower.pk).update(following_count=F('following_count') + 1)
+        return created
+
+    @staticmethod
+    def unfollow(follower, followee):
+        """Remove the follow edge. Returns True if one was removed."""
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(follower=follower, followee=followee).delete()
+            if deleted:
+                UserProfile.objects.filter(pk=followee.pk, followers_count__gt=0).update(
+                    followers_count=F('followers_count') - 1
+                )
+                UserProfile.objects.filter(pk=follower.pk, following_count__gt=0).update(
+                    following_count=F('following_count') - 1
+                )
+        return bool(deleted)
+
+    @staticmethod
+    def remove_mutual(profile_a, profile_b):
+        """Drop follows in both directions (used when blocking)"""
+        with transaction.atomic():
+            FollowService.unfollow(profile_a, profile_b)
+            FollowService.unfollow(profile_b, profile_a)
+
+    @staticmethod
+    def get_followers_count(profile):
+        """Fresh counter value (the in-memory instance may be stale after an F() update)"""
+        return UserProfile.objects.filter(pk=profile.pk).values_list('followers_count', flat=True).first() or 0
+
+    @staticmethod
+    def reconcile_counts(profile_ids=None):
+        """
+        Recompute counters from the Follow table with one UPDATE per call.
+        Pass profile_ids to limit the update to a batch.
+        """
+        followers = Follow.objects.filter(followee=OuterRef('pk')).order_by().values('followee') \
+            .annotate(c=Count('id')).values('c')
+        following = Follow.objects.filter(follower=OuterRef('pk')).order_by().values('follower') \
+            .annotate(c=Count('id')).values('c')
+
+        qs = UserProfile.objects.all()
+        if profile_ids is not None:
+            qs = qs.filter(pk__in=profile_ids)
+        return qs.update(
+            followers_count=Coalesce(Subquery(followers), Value(0)),
+            following_count=Coalesce(Subquery(following), Value(0)),
+        )
@@ -0,0 +1,178 @@
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from ..background import run_in_background, run_cpu_bound
+from ..models import Post
+from ..realtime import broadcast_to_thread
+from ..utils.media_processing import process_image, probe_duration
+from chat.activity import preview_for, record_activity
+from chat.models import ChatMessage, MessageAttachment
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _local_path(field_file):
+    """
+    Yield a filesystem path for a stored file.
+    Storages without local paths are copied to a temporary file first.
+    """
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+
+    if path:
+        yield path
+        return
+
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        with field_file.storage.open(field_file.name, 'rb') as src:
+            shutil.copyfileobj(src, tmp)
+        tmp.flush()
+        yield tmp.name
+
+
+def _save_variants(storage, base_name, directory, variants):
+    """Store generated thumbnails and return {size: {format: storage name}}"""
+    stored = {}
+    for size, encoded in variants.items():
+        stored[size] = {}
+        for fmt, data in encoded.items():
+            name = storage.save(f"{directory}{base_name}_{size}.{fmt}", ContentFile(data))
+            stored[size][fmt] = name
+    return stored
+
+
+class MediaService:
+    @staticmethod
+    def create_attachment_message(user_profile, thread, upload, file_type, content='', is_voice=False):
+        """
+        Create a chat message carrying an uploaded file.
+        The attachment starts as 'pending'; thumbnails, EXIF stripping and
+        duration probing are queued for the background pipeline on commit.
+        """
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                thread=thread,
+                sender=user_profile,
+                content=content or None,
+                is_voice_message=is_voice
+            )
+            attachment = MessageAttachment.objects.create(
+                message=message,
+                file=upload,
+                file_type=file_type,
+                file_size=upload.size,
+                file_name=os.path.basename(upload.name)[:255],
+                processing_status='pending'
+            )
+
+            # Same visibility rules as a text message: hidden from recipients who
+            # blocked the sender, and the thread resurfaces for everyone else
+            thread.surface_message(message)
+            record_activity(thread.id, message, preview=preview_for(message, content))
+
+            transaction.on_commit(lambda: MediaService.enqueue_attachment(attachment.id))
+
+        return message
+
+    @staticmethod
+    def enqueue_attachment(attachment_id):
+        """Queue an attachment for background processing"""
+        run_in_background(MediaService.process_attachment, attachment_id)
+
+    @staticmethod
+    def process_attachment(attachment_id):
+        """
+        Background job: build thumbnails / probe duration for one attachment,
+        then push an 'attachment_ready' event to the thread.
+        """
+        try:
+            attachment = MessageAttachment.objects.select_related('message').get(pk=attachment_id)
+        except MessageAttachment.DoesNotExist:
+            logger.warning(f"Attachment {attachment_id} vanished before processing")
+            return
+
+        update_fields = ['processing_status']
+        try:
+            if attachment.file_type == 'image':
+                with _local_path(attachment.file) as path:
+                    result = run_cpu_bound(process_image, path)
+
+                storage = attachment.file.storage
+                base_name = os.path.splitext(os.path.basename(attachment.file.name))[0]
+
+                if result['stripped']:
+                    old_name = attachment.file.name
+                    attachment.file.save(os.path.basename(old_name), ContentFile(result['stripped']), save=False)
+                    storage.delete(old_name)
+                    attachment.file_size = len(result['stripped'])
+                    update_fields += ['file', 'file_size']
+
+                directory = timezone.now().strftime('chat_thumbnails/%Y/%m/%d/')
+                attachment.variants = _save_variants(storage, base_name, directory, result['variants'])
+                attachment.thumbnail.name = attachment.variants['md']['webp']
+                update_fields += ['variants', 'thumbnail']
+
+            elif attachment.file_type in ('audio', 'voice', 'video'):
+                with _local_path(attachment.file) as path:
+                    attachment.duration = run_cpu_bound(probe_duration, path)
+                update_fields.append('duration')
+
+            attachment.processing_status = 'ready'
+        except ValueError as e:
+            logger.warning(f"Attachment {attachment_id} rejected by media pipeline: {e}")
+            attachment.processing_status = 'failed'
+        except Exception as e:
+            logger.error(f"Attachment {attachment_id} processing failed: {e}", exc_info=True)
+            attachment.processing_status = 'failed'
+
+        attachment.save(update_fields=update_fields)
+
+        from chat.serializers import MessageAttachmentSerializer
+        broadcast_to_thread(
+            attachment.message.thread_id,
+            'attachment_ready',
+            message_id=attachment.message_id,
+            data=MessageAttachmentSerializer(attachment).data
+        )
+
+    @staticmethod
+    def enqueue_post_image(post_id):
+        """Queue a post's image for EXIF stripping and thumbnail generation"""
+        run_in_background(MediaService.process_post_image, post_id)
+
+    @staticmethod
+    def process_post_image(post_id):
+        """Background job: strip metadata from a post image and build its thumbnails"""
+        post = Post.objects.filter(pk=post_id).only('id', 'image', 'image_variants').first()
+        if not post or not post.image:
+            return
+
+        try:
+            with _local_path(post.image) as path:
+                result = run_cpu_bound(process_image, path)
+        except ValueError as e:
+            logger.warning(f"Post {post_id} image rejected by media pipeline: {e}")
+            return
+
+        storage = post.image.storage
+        update_fields = ['image_variants']
+        if result['stripped']:
+            old_name = post.image.name
+            post.image.save(os.path.basename(old_name), ContentFile(result['stripped']), save=False)
+            storage.delete(old_name)
+            update_fields.append('image')
+
+        base_name = os.path.splitext(os.path.basename(post.image.name))[0]
+        post.image_variants = _save_variants(storage, base_name, 'posts/thumbs/', result['variants'])
+        post.save(update_fields=update_fields)
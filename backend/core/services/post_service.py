@@ -1,11 +1,13 @@
 import logging
-import re
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.db.models import Count, Q
+from django.db import transaction
 from django.utils import timezone
+from .media_service import MediaService
+from ..utils.tags import extract_hashtags, normalize_tags
 from ..models import Post, UserProfile, UserEvent, Notification, SharedPost, Follow
-from chat.models import ChatThread, ChatMessage
+from chat.models import ChatMessage, ThreadMembership
 
 logger = logging.getLogger(__name__)
 
@@ -35,14 +37,8 @@ class PostService:
             except Exception as e:
                 logger.warning(f"Error parsing tags: {e}")
 
-        # Extract tags from text if not provided
-        if text:
-            regex_tags = re.findall(r"#(\w+)", text)
-            tags.extend(regex_tags)
-
-        # Clean tags
-        tags = [tag.lstrip('#').lower().strip() for tag in tags if tag and tag.strip()]
-        tags = list(set(tags))[:15]
+        # Explicit tags plus any #hashtags in the text
+        tags = normalize_tags(list(tags) + extract_hashtags(text))
 
         post = Post.objects.create(
             author=user_profile,
@@ -52,144 +48,153 @@ class PostService:
             tags=tags,
             is_public=data.get('is_public', True)
         )
+        if post.image:
+            transaction.on_commit(lambda: MediaService.enqueue_post_image(post.id))
         return post
 
     @staticmethod
-    def share_post_with_users(user_profile, post_id, user_ids, message=''):
+    def share_post_with_users(user_profile, post_id, user_ids, message='', request=None):
         """
         Share a post with multiple users, creating chat messages.
         """
-        post = get_object_or_404(Post, pk=post_id)
-        
+        post = get_object_or_404(Post.objects.select_related('author__user'), pk=post_id)
+
         if not user_ids:
             raise ValidationError("No users selected")
 
-        shared_count = 0
-        errors = []
-        
         logger.info(f"SHARE: Starting to share post {post_id} with {len(user_ids)} users")
-        logger.info(f"   User IDs: {user_ids}")
+        result = PostService.bulk_share(user_profile, post, user_ids, message, request=request)
+
+        logger.info(f"SHARE COMPLETE: Shared with {result['shared_count']}/{len(user_ids)} users")
+        if result['errors']:
+            logger.warning(f"   Errors: {result['errors']}")
+
+        return {
+            'status': 'success',
+            'shared_count': result['shared_count'],
+            'errors': result['errors'] or None
+        }
+
+    @staticmethod
+    def bulk_share(user_profile, post, user_ids, message='', request=None, notification_type='share'):
+        """
+        Send post to every recipient's 1-on-1 thread with a fixed number of queries:
+        recipients, blocks and existing DMs are resolved with set queries, and
+        threads, messages, SharedPosts and notifications are written with bulk_create.
+        One batch of WebSocket events goes out after commit.
+
+        Recipients blocked by the sharer are reported in errors; recipients who
+        blocked the sharer are skipped without saying why, so a blocked user can
+        neither reach their inbox nor bring back a thread they hid or deleted.
 
+        Returns {'shared_count', 'errors', 'threads': {recipient_id: thread_id}}.
+        """
+        from chat.models import UserRestriction
+        from chat.direct_threads import bulk_create_direct_threads, get_direct_thread_ids
+        from chat.retention import expiries_for_threads
+        from chat.activity import PREVIEW_LENGTH, record_activity_many
+        from chat.serializers import ChatMessageSerializer
+        from ..metrics import chat_messages
+        from ..realtime import broadcast_many, thread_event
+
+        errors = []
+        recipient_ids = []
         for user_id in user_ids:
             try:
-                logger.info(f"   Processing user_id: {user_id}")
-                recipient = UserProfile.objects.get(pk=user_id)
-                logger.info(f"   Found recipient: {recipient.user.username}")
-                
-                from chat.models import UserRestriction
-                
-                # Only prevent sharing if YOU blocked THEM (not if they blocked you)
-                # If they blocked you, they can choose to ignore the shared post
-                if UserRestriction.objects.filter(
-                    user=user_profile,
-                    restricted_user=recipient,
-                    restriction_type='block'
-                ).exists():
-                    error_msg = f"Cannot share with {recipient.user.username} - you have blocked this user"
-                    logger.warning(f"   {error_msg}")
-                    errors.append(error_msg)
-                    continue
-
-
-                # Optional: Check following status (commented out to allow sharing with anyone)
-                # if not Follow.objects.filter(follower=user_profile, followee=recipient).exists():
-                #     errors.append(f"You don't follow {recipient.user.username}")
-                #     continue
-                
-                # Check duplicate share (optional - maybe we want to allow re-sharing?)
-                # Relaxed this check to allow re-sharing in chat
-                # if SharedPost.objects.filter(post=post, shared_by=user_profile, shared_with=recipient).exists():
-                #     errors.append(f"Already shared with {recipient.user.username}")
-                #     continue
-                
-                # 1. Find or Create Chat Thread (1-on-1)
-                thread = None
-                # Relaxed query to ensure we find the thread
-                threads = ChatThread.objects.filter(
-                    participants=user_profile,
-                    is_group=False
-                ).filter(
-                    participants=recipient
-                )
-                
-                if threads.exists():
-                    thread = threads.order_by('-updated_at').first()
-                    logger.info(f"   Found existing thread {thread.id}")
-                else:
-                    # Create new thread
-                    thread = ChatThread.objects.create(
-                        initiator=user_profile,
-                        is_group=False,
-                        status='active'
-                    )
-                    thread.participants.add(user_profile, recipient)
-                    logger.info(f"   Created new thread {thread.id}")
-
-                # 2. Create Chat Message
-                chat_msg = ChatMessage.objects.create(
-                    thread=thread,
-                    sender=user_profile,
-                    content=message or '',  # Main content is the optional message
-                    # We can also rely on shared_post relation for display
-                )
-                logger.info(f"   Created chat message {chat_msg.id} for share")
+                user_id = int(user_id)
+            except (TypeError, ValueError):
+                errors.append(f"User {user_id} not found")
+                continue
+            if user_id != user_profile.id and user_id not in recipient_ids:
+                recipient_ids.append(user_id)
 
-                # 3. Create SharedPost record linked to the message
-                shared_post = SharedPost.objects.create(
-                    post=post,
-                    shared_by=user_profile,
-                    shared_with=recipient,
-                    message=message,
-                    chat_message=chat_msg
+        recipients = UserProfile.objects.select_related('user').in_bulk(recipient_ids)
+        for user_id in recipient_ids:
+            if user_id not in recipients:
+                errors.append(f"User {user_id} not found")
+
+        blocked, blocked_by = set(), set()
+        for user_id, restricted_id in UserRestriction.objects.filter(
+            Q(user=user_profile, restricted_user_id__in=list(recipients))
+            | Q(user_id__in=list(recipients), restricted_user=user_profile),
+            restriction_type='block'
+        ).values_list('user_id', 'restricted_user_id'):
+            if user_id == user_profile.id:
+                blocked.add(restricted_id)
+            else:
+                blocked_by.add(user_id)
+        for user_id in recipient_ids:
+            if user_id in blocked:
+                errors.append(f"Cannot share with {recipients[user_id].user.username} - you have blocked this user")
+
+        targets = [
+            recipients[uid] for uid in recipient_ids
+            if uid in recipients and uid not in blocked and uid not in blocked_by
+        ]
+        if not targets:
+            return {'shared_count': 0, 'errors': errors, 'threads': {}}
+
+        now = timezone.now()
+        with transaction.atomic():
+            # 1. Existing DMs, from the participant-pair index
+            threads = get_direct_thread_ids(user_profile, [r.id for r in targets])
+
+            # 2. Create the missing DMs (threads, participant rows and index rows)
+            missing = [r for r in targets if r.id not in threads]
+            threads.update(bulk_create_direct_threads(user_profile, missing, status='active'))
+
+            # 3. Messages (stamped with each thread's disappearing timer), SharedPosts and notifications
+            expiries = expiries_for_threads(list(threads.values()), now)
+            messages = []
+            for recipient in targets:
+                thread_id = threads[recipient.id]
+                msg = ChatMessage(
+                    thread_id=thread_id, sender=user_profile, content=message or '',
+                    expires_at=expiries.get(thread_id)
                 )
-                logger.info(f"   SHARE: Created SharedPost {shared_post.id} linked to ChatMessage {chat_msg.id}")
-                logger.info(f"      Post ID: {post.id}, Shared by: {user_profile.user.username}, Shared with: {recipient.user.username}")
-                
-                # Clear hidden status for ALL participants (unhide logic)
-                if thread.hidden_by.exists():
-                    thread.hidden_by.clear()
-                    logger.info(f"   UNHIDE: Thread {thread.id} unhidden for all participants")
-
-                # Clear deleted status for ALL participants (undelete logic)
-                if thread.deleted_by.exists():
-                    thread.deleted_by.clear()
-                    logger.info(f"   UNDELETE: Thread {thread.id} restored for all participants")
-
-                # Update Thread Timestamp
-                thread.updated_at = timezone.now()
-                thread.save()
-
-                # Notification (keep existing notification logic?)
-                # Maybe unnecessary if chat already notifies, but let's keep it for "Activity" tab
-                Notification.objects.create(
+                msg.encrypt_content()
+                messages.append(msg)
+            messages = ChatMessage.objects.bulk_create(messages)
+            chat_messages.inc(len(messages))  # bulk_create skips the post_save that counts the rest
+
+            SharedPost.objects.bulk_create([
+                SharedPost(post=post, shared_by=user_profile, shared_with=recipient, message=message, chat_message=msg)
+                for recipient, msg in zip(targets, messages)
+            ])
+
+            Notification.objects.bulk_create([
+                Notification(
                     user=recipient,
                     actor=user_profile,
-                    notification_type='share',
+                    notification_type=notification_type,
                     post=post,
                     message=f"{user_profile.user.username} shared a post with you"
                 )
-                shared_count += 1
-                logger.info(f"   Successfully shared with {recipient.user.username} (total: {shared_count})")
-                
-            except UserProfile.DoesNotExist:
-                error_msg = f"User {user_id} not found"
-                logger.error(f"   {error_msg}")
-                errors.append(error_msg)
-                continue
-            except Exception as e:
-                error_msg = f"Failed to share with user {user_id}: {str(e)}"
-                logger.error(f"   {error_msg}", exc_info=True)
-                errors.append(error_msg)
-                continue
-        
-        logger.info(f"SHARE COMPLETE: Shared with {shared_count}/{len(user_ids)} users")
-        if errors:
-            logger.warning(f"   Errors: {errors}")
-                
+                for recipient in targets
+            ])
+
+            # 4. Unhide/undelete the threads for all participants and move them up every inbox
+            thread_ids = list(threads.values())
+            ThreadMembership.objects.filter(thread_id__in=thread_ids).filter(Q(hidden=True) | Q(deleted=True)) \
+                .update(hidden=False, deleted=False)
+            record_activity_many(
+                {msg.thread_id: msg for msg in messages},
+                preview=message[:PREVIEW_LENGTH] if message else '[Shared post]', at=now
+            )
+
+            # 5. Every message differs only by id/thread/created_at: serialize one, stamp the rest
+            template = ChatMessageSerializer(messages[0], context={'request': request}).data
+            events = []
+            for msg in messages:
+                data = dict(template, id=msg.id, thread=msg.thread_id)
+                events.append(thread_event(msg.thread_id, 'new_message', data=data, sender=user_profile.user.username))
+            transaction.on_commit(lambda: broadcast_many(events))
+
+        logger.info(f"SHARE: post {post.id} shared by {user_profile.user.username} with {len(targets)} users")
         return {
-            'status': 'success',
-            'shared_count': shared_count,
-            'errors': errors if errors else None
+            'shared_count': len(targets),
+            'errors': errors,
+            'threads': {recipient.id: threads[recipient.id] for recipient in targets},
         }
 
     @staticmethod
@@ -0,0 +1,80 @@
+import logging
+
+from django.db.models import Q
+
+from ..models import Follow
+
+logger = logging.getLogger(__name__)
+
+# Relationship bits, from the viewer's point of view
+FOLLOWING = 1        # viewer follows them
+FOLLOWED_BY = 2      # they follow viewer
+BLOCKED_BY_ME = 4    # viewer blocked them
+BLOCKING_ME = 8      # they blocked viewer
+MUTED = 16           # viewer muted them
+RESTRICTED = 32      # viewer restricted them
+
+RELATIONSHIP_BITS = {
+    'following': FOLLOWING,
+    'followed_by': FOLLOWED_BY,
+    'blocked_by_me': BLOCKED_BY_ME,
+    'blocking_me': BLOCKING_ME,
+    'muted': MUTED,
+    'restricted': RESTRICTED,
+}
+
+# Upper bound on ids resolved per call (keeps the IN (...) lists bounded)
+MAX_RELATIONSHIP_IDS = 200
+
+
+class RelationshipService:
+    @staticmethod
+    def resolve(viewer, profile_ids):
+        """
+        Return {profile_id: bitmask} describing how viewer relates to each profile.
+        Uses two queries regardless of how many ids are passed; the viewer's own
+        id (and ids with no relationship) map to 0.
+        """
+        ids = {int(pid) for pid in profile_ids if pid is not None}
+        masks = dict.fromkeys(ids, 0)
+        if viewer is None:
+            return masks
+        ids.discard(viewer.id)
+        if not ids:
+            return masks
+
+        follows = Follow.objects.filter(
+            Q(follower=viewer, followee_id__in=ids) | Q(followee=viewer, follower_id__in=ids)
+        ).values_list('follower_id', 'followee_id')
+        for follower_id, followee_id in follows:
+            if follower_id == viewer.id:
+                masks[followee_id] |= FOLLOWING
+            else:
+                masks[follower_id] |= FOLLOWED_BY
+
+        from chat.models import UserRestriction
+        restrictions = UserRestriction.objects.filter(
+            Q(user=viewer, restricted_user_id__in=ids)
+            | Q(user_id__in=ids, restricted_user=viewer, restriction_type='block')
+        ).values_list('user_id', 'restricted_user_id', 'restriction_type')
+        own_bits = {'block': BLOCKED_BY_ME, 'mute': MUTED, 'restrict': RESTRICTED}
+        for user_id, restricted_user_id, restriction_type in restrictions:
+            if user_id == viewer.id:
+                masks[restricted_user_id] |= own_bits.get(restriction_type, 0)
+            else:
+                masks[user_id] |= BLOCKING_ME
+        return masks
+
+    @staticmethod
+    def resolve_one(viewer, profile_id):
+        return RelationshipService.resolve(viewer, [profile_id]).get(profile_id, 0)
+
+    @staticmethod
+    def flags(mask):
+        """The is_* booleans serializers expose, derived from a bitmask"""
+        return {
+            'is_following': bool(mask & FOLLOWING),
+            'is_blocked': bool(mask & (BLOCKED_BY_ME | BLOCKING_ME)),
+            'is_blocked_by_me': bool(mask & BLOCKED_BY_ME),
+            'is_blocking_me': bool(mask & BLOCKING_ME),
+        }
@@ -0,0 +1,220 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from ..models import JobCheckpoint, PostCooccurrence, PostNeighbor, UserEvent
+
+logger = logging.getLogger(__name__)
+
+# How much each interaction says about taste
+EVENT_WEIGHTS = {'like': 1.0, 'save': 2.0, 'share': 3.0}
+
+CHECKPOINT_NAME = 'post_similarity'
+DEFAULT_TOP_K = 20
+# Only a user's most recent interactions count (bounds the per-user pair blow-up)
+MAX_ITEMS_PER_USER = 300
+
+
+def _change_triplets(old, new):
+    """
+    Upper-triangle (post_a, post_b, weight) of new new^T - old old^T for one
+    user, diagonal included. Only the rows and columns of posts whose weight
+    changed can be non-zero, so just those are built: |changed| x |posts|
+    rather than the whole product.
+    """
+    ids = np.fromiter(sorted(old.keys() | new.keys()), dtype=np.int64)
+    n = np.array([new.get(pid, 0.0) for pid in ids.tolist()], dtype=np.float64)
+    o = np.array([old.get(pid, 0.0) for pid in ids.tolist()], dtype=np.float64)
+    changed = np.flatnonzero(n != o)
+    block = np.outer(n[changed], n) - np.outer(o[changed], o)
+    rows, cols = np.divmod(np.arange(block.size), len(ids))
+    a, b = ids[changed][rows], ids[cols]
+    # A pair of two changed posts appears twice (row a and row b); keep one
+    keep = ~np.isin(cols, changed) | (a <= b)
+    a, b = a[keep], b[keep]
+    return np.minimum(a, b), np.maximum(a, b), block.ravel()[keep]
+
+
+def _sum_duplicates(post_a, post_b, weights):
+    """Collapse repeated (post_a, post_b) entries by summing them, like a COO matrix's sum_duplicates"""
+    if not len(post_a):
+        return post_a, post_b, weights
+    width = int(max(post_a.max(), post_b.max())) + 1
+    keys, inverse = np.unique(post_a * width + post_b, return_inverse=True)
+    summed = np.bincount(inverse, weights=weights)
+    keep = np.abs(summed) > 1e-9
+    return keys[keep] // width, keys[keep] % width, summed[keep]
+
+
+class PostSimilarityService:
+    """
+    Offline item-item collaborative filtering over like/save/share events.
+
+    The user x post matrix R holds summed event weights. PostCooccurrence
+    stores C = R^T R sparsely; PostNeighbor keeps each post's top-K posts by
+    cosine similarity C[a, b] / sqrt(C[a, a] * C[b, b]).
+
+    build() is incremental: for the users with events past the checkpoint it
+    adds the change in their outer product (the rows and columns of the posts
+    their new events touched), so each run costs in proportion to new activity. Deleted events (unlike/unsave) are only
+    picked up by a full rebuild.
+    """
+
+    @staticmethod
+    def _user_vectors(user_ids, max_event_id):
+        """{user_id: {post_id: weight}} from each user's events with id <= max_event_id"""
+        vectors = {}
+        events = UserEvent.objects.filter(
+            user_id__in=user_ids, event_type__in=EVENT_WEIGHTS, id__lte=max_event_id
+        ).order_by('-id').values_list('user_id', 'post_id', 'event_type')
+        for user_id, post_id, event_type in events.iterator(chunk_size=5000):
+            vector = vectors.setdefault(user_id, {})
+            if post_id in vector or len(vector) < MAX_ITEMS_PER_USER:
+                vector[post_id] = vector.get(post_id, 0.0) + EVENT_WEIGHTS[event_type]
+        return vectors
+
+    @staticmethod
+    def _cooccurrence_delta(user_ids, start_id, end_id):
+        """Change in C from the events in (start_id, end_id] of these users, as summed triplets"""
+        old = PostSimilarityService._user_vectors(user_ids, start_id)
+        new = PostSimilarityService._user_vectors(user_ids, end_id)
+        parts_a, parts_b, parts_w = [], [], []
+        for user_id, vector in new.items():
+            a, b, w = _change_triplets(old.get(user_id, {}), vector)
+            parts_a.append(a), parts_b.append(b), parts_w.append(w)
+        if not parts_a:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float64)
+        return _sum_duplicates(np.concatenate(parts_a), np.concatenate(parts_b), np.concatenate(parts_w))
+
+    @staticmethod
+    def _apply_delta(post_a, post_b, delta):
+        """
+        Add delta to the stored co-occurrence weights: one read, one upsert, and
+        a delete by primary key of the touched pairs that dropped to zero.
+        """
+        current = {
+            (a, b): (pk, w) for pk, a, b, w in PostCooccurrence.objects.filter(
+                post_a_id__in=set(post_a.tolist()), post_b_id__in=set(post_b.tolist())
+            ).values_list('id', 'post_a_id', 'post_b_id', 'weight')
+        }
+        rows, emptied = [], []
+        for a, b, d in zip(post_a.tolist(), post_b.tolist(), delta.tolist()):
+            pk, weight = current.get((a, b), (None, 0.0))
+            weight += d
+            if weight > 1e-9:
+                rows.append(PostCooccurrence(post_a_id=a, post_b_id=b, weight=weight))
+            elif pk is not None:
+                emptied.append(pk)
+        PostCooccurrence.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True,
+            unique_fields=['post_a', 'post_b'], update_fields=['weight']
+        )
+        for start in range(0, len(emptied), 1000):
+            PostCooccurrence.objects.filter(id__in=emptied[start:start + 1000]).delete()
+
+    @staticmethod
+    def recompute_neighbors(post_ids, top_k=DEFAULT_TOP_K):
+        """Replace the stored top-K neighbors of post_ids from the co-occurrence table"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return 0
+        pairs = np.array(list(PostCooccurrence.objects.filter(
+            Q(post_a_id__in=post_ids) | Q(post_b_id__in=post_ids)
+        ).exclude(post_a=F('post_b')).values_list('post_a_id', 'post_b_id', 'weight')), dtype=np.float64).reshape(-1, 3)
+
+        a, b, w = pairs[:, 0].astype(np.int64), pairs[:, 1].astype(np.int64), pairs[:, 2]
+        # Both directions, keeping only rows whose source is being recomputed
+        source = np.concatenate([a, b])
+        target = np.concatenate([b, a])
+        weight = np.concatenate([w, w])
+        wanted = np.isin(source, post_ids)
+        source, target, weight = source[wanted], target[wanted], weight[wanted]
+
+        norms = dict(PostCooccurrence.objects.filter(
+            post_a=F('post_b'), post_a_id__in=set(source.tolist()) | set(target.tolist())
+        ).values_list('post_a_id', 'weight'))
+        source_norm = np.array([norms.get(pid, 0.0) for pid in source.tolist()])
+        target_norm = np.array([norms.get(pid, 0.0) for pid in target.tolist()])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = np.where(source_norm * target_norm > 0, weight / np.sqrt(source_norm * target_norm), 0.0)
+
+        # Group by source, best score first, and keep the first top_k of each group
+        order = np.lexsort((-score, source))
+        source, target, score = source[order], target[order], score[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(source)) + 1]
+        rank = np.arange(len(source)) - np.repeat(group_start, np.diff(np.r_[group_start, len(source)]))
+        keep = (rank < top_k) & (score > 0)
+
+        neighbors = [
+            PostNeighbor(post_id=p, neighbor_id=q, score=s)
+            for p, q, s in zip(source[keep].tolist(), target[keep].tolist(), score[keep].tolist())
+        ]
+        with transaction.atomic():
+            PostNeighbor.objects.filter(post_id__in=post_ids).delete()
+            PostNeighbor.objects.bulk_create(neighbors, batch_size=1000)
+        return len(neighbors)
+
+    @staticmethod
+    def build(full=False, chunk_size=5000, top_k=DEFAULT_TOP_K):
+        """
+        Fold events newer than the checkpoint into the co-occurrence table,
+        chunk_size events per transaction (the checkpoint moves with each
+        chunk, so an interrupted run resumes cleanly), then refresh the
+        neighbors of every post that changed. Returns (events, posts_updated).
+        """
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        if full:
+            with transaction.atomic():
+                PostCooccurrence.objects.all().delete()
+                PostNeighbor.objects.all().delete()
+                checkpoint.position = 0
+                checkpoint.save(update_fields=['position', 'updated_at'])
+
+        pending = UserEvent.objects.filter(event_type__in=EVENT_WEIGHTS)
+        touched = set()
+        processed = 0
+        while True:
+            chunk = list(pending.filter(id__gt=checkpoint.position).order_by('id')
+                         .values_list('id', 'user_id')[:chunk_size])
+            if not chunk:
+                break
+            start_id, end_id = checkpoint.position, chunk[-1][0]
+            user_ids = {user_id for _, user_id in chunk}
+            post_a, post_b, delta = PostSimilarityService._cooccurrence_delta(user_ids, start_id, end_id)
+            with transaction.atomic():
+                PostSimilarityService._apply_delta(post_a, post_b, delta)
+                checkpoint.position = end_id
+                checkpoint.save(update_fields=['position', 'updated_at'])
+            touched.update(post_a.tolist())
+            touched.update(post_b.tolist())
+            processed += len(chunk)
+
+        touched = sorted(touched)
+        for start in range(0, len(touched), 500):
+            PostSimilarityService.recompute_neighbors(touched[start:start + 500], top_k=top_k)
+        logger.info(f"Post similarity: {processed} new events, {len(touched)} posts refreshed")
+        return processed, len(touched)
+
+    @staticmethod
+    def similar_post_ids(post_id, limit=DEFAULT_TOP_K):
+        """Neighbor ids of a post, most similar first"""
+        return list(PostNeighbor.objects.filter(post_id=post_id).order_by('-score')
+                    .values_list('neighbor_id', flat=True)[:limit])
+
+    @staticmethod
+    def recommend_for(profile, limit=100, seeds=50):
+        """
+        {post_id: score} of posts similar to what profile recently liked, saved
+        or shared, excluding those posts themselves. One query for the seeds,
+        one for the neighbors.
+        """
+        seed_ids = list(UserEvent.objects.filter(user=profile, event_type__in=EVENT_WEIGHTS)
+                        .order_by('-id').values_list('post_id', flat=True)[:seeds])
+        if not seed_ids:
+            return {}
+        rows = PostNeighbor.objects.filter(post_id__in=seed_ids).exclude(neighbor_id__in=seed_ids) \
+            .values('neighbor_id').annotate(total=Sum('score')).order_by('-total')[:limit]
+        return {row['neighbor_id']: row['total'] for row in rows}
@@ -1,8 +1,14 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .background import run_in_background
+from .models import Post, UserProfile
 from .utils.avatar_utils import generate_default_avatar_url
+from .profile_summary import invalidate_profile_summary
+from .user_embeddings import refresh_user_vectors
+from .utils.tags import sync_post_tags
+from .storage import referenced_names, sync_media_references
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,4 +62,73 @@ def save_user_profile(sender, instance, **kwargs):
                 profile.save(update_fields=['default_avatar_url'])
                 logger.info(f"Assigned default avatar to existing user {instance.username}")
             except Exception as e:
-                logger.error(f"Error assigning avatar to {instance.username}: {e}")
\ No newline at end of file
+                logger.error(f"Error assigning avatar to {instance.username}: {e}")
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_summary_on_profile_save(sender, instance, **kwargs):
+    """Nickname or avatar may have changed; drop cached summaries"""
+    invalidate_profile_summary(instance.id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_summary_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """Username is part of the summary"""
+    if update_fields is not None and 'username' not in update_fields:
+        # e.g. last_login updates on every sign-in
+        return
+    if not created:
+        profile_id = UserProfile.objects.filter(user=instance).values_list('id', flat=True).first()
+        if profile_id:
+            invalidate_profile_summary(profile_id)
+
+
+TAG_UPDATE_FIELDS = {'tags', 'is_public'}
+
+
+def _schedule_author_vector_refresh(author_id):
+    transaction.on_commit(lambda: run_in_background(refresh_user_vectors, [author_id]))
+
+
+@receiver(post_save, sender=Post)
+def refresh_author_tag_vector(sender, instance, update_fields=None, **kwargs):
+    """Tags or visibility may have changed; rebuild the author's vector for similar-user search"""
+    if update_fields is not None and not TAG_UPDATE_FIELDS & set(update_fields):
+        return
+    _schedule_author_vector_refresh(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def refresh_author_tag_vector_on_delete(sender, instance, **kwargs):
+    """The post's tags no longer count towards its author's vector"""
+    _schedule_author_vector_refresh(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_tag_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep PostTag rows in step with Post.tags in the same transaction"""
+    if raw or (update_fields is not None and not TAG_UPDATE_FIELDS & set(update_fields)):
+        return
+    sync_post_tags(instance)
+
+
+MEDIA_UPDATE_FIELDS = {'image', 'image_variants', 'file', 'thumbnail', 'variants'}
+
+
+@receiver(post_save, sender=Post)
+def sync_post_media_references(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Index the post's image and thumbnails by storage name (see MediaReference)"""
+    if raw or (update_fields is not None and not MEDIA_UPDATE_FIELDS & set(update_fields)):
+        return
+    names = referenced_names(instance.image.name, variants=instance.image_variants)
+    if names or not created:
+        sync_media_references(names, post=instance)
+
+
+@receiver(post_save, sender='chat.MessageAttachment')
+def sync_attachment_media_references(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Index the attachment's file, thumbnail and variants by storage name"""
+    if raw or (update_fields is not None and not MEDIA_UPDATE_FIELDS & set(update_fields)):
+        return
+    names = referenced_names(instance.file.name, instance.thumbnail.name, variants=instance.variants)
+    if names or not created:
+        sync_media_references(names, attachment=instance)
@@ -0,0 +1,160 @@
+# core/storage.py
+"""
+Content-addressed media storage.
+
+Uploaded files are stored once per unique content under
+    cas/<aa>/<bb>/<sha256><ext>
+so re-uploaded, forwarded or reshared media point at the same blob instead of
+writing a new copy. Every save bumps the blob's MediaBlob.ref_count and every
+delete drops it; unreferenced blobs are removed by `manage.py gc_media_blobs`,
+never inline, so a delete can't race a concurrent upload of the same content.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CAS_PREFIX = 'cas/'
+
+
+def blob_name(digest, ext):
+    return f'{CAS_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(); identical
+        # content must map to the same name rather than a '_abc123' variant.
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()[:10]
+        tmp_dir = self.path(f'{CAS_PREFIX}tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            final_name = blob_name(digest.hexdigest(), ext)
+            final_path = self.path(final_name)
+            # Reference the blob before looking at the file: once ref_count > 0
+            # gc_media_blobs no longer deletes it, and a GC that already did will
+            # have moved the file away, so it is written again below
+            self._acquire(final_name, digest.hexdigest(), size)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                # Atomic: concurrent writers of the same content just replace identical bytes
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+    def _acquire(self, name, sha256, size):
+        from .models import MediaBlob
+
+        bump = {'ref_count': F('ref_count') + 1, 'updated_at': timezone.now()}
+        if not MediaBlob.objects.filter(name=name).update(**bump):
+            blob, created = MediaBlob.objects.get_or_create(
+                name=name, defaults={'sha256': sha256, 'size': size, 'ref_count': 1}
+            )
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(**bump)
+
+    def delete(self, name):
+        """Release one reference; legacy (non-CAS) files are deleted as before"""
+        if not name:
+            return
+        if not name.startswith(CAS_PREFIX):
+            return super().delete(name)
+
+        from .models import MediaBlob
+        MediaBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated_at=timezone.now()
+        )
+
+    def delete_blob(self, name):
+        """
+        Remove a blob's file from disk after its MediaBlob row was deleted.
+        Only gc_media_blobs should call this. The file is moved aside first; if
+        an upload of the same content re-created the row meanwhile, it is put back.
+        """
+        from .models import MediaBlob
+
+        path = self.path(name)
+        tmp_dir = self.path(f'{CAS_PREFIX}tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, trash = tempfile.mkstemp(dir=tmp_dir, suffix='.gc')
+        os.close(fd)
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            os.remove(trash)
+            return False
+        if MediaBlob.objects.filter(name=name).exists():
+            if not os.path.exists(path):
+                os.replace(trash, path)
+            else:
+                os.remove(trash)
+            return False
+        os.remove(trash)
+        return True
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def referenced_names(*names, variants=None):
+    """Storage names held by a row: its file fields plus every {size: {format: name}} variant"""
+    found = {name for name in names if name}
+    for formats in (variants or {}).values():
+        found.update(name for name in formats.values() if name)
+    return found
+
+
+def sync_media_references(names, post=None, attachment=None):
+    """Make the MediaReference rows of one post or attachment match names"""
+    from .models import MediaReference
+
+    owner = {'post': post} if post is not None else {'attachment': attachment}
+    current = set(MediaReference.objects.filter(**owner).values_list('name', flat=True))
+    if current == names:
+        return
+    stale = current - names
+    if stale:
+        MediaReference.objects.filter(name__in=stale, **owner).delete()
+    MediaReference.objects.bulk_create([MediaReference(name=name, **owner) for name in names - current])
+
+
+def get_media_storage():
+    """
+    Storage for user-uploaded media fields.
+    Callable so the choice is made at runtime (MEDIA_CONTENT_ADDRESSED) rather
+    than baked into migrations.
+    """
+    if getattr(settings, 'MEDIA_CONTENT_ADDRESSED', True):
+        return content_addressed_storage
+    return default_storage
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.models import ChatThread, UploadSession
+from core.tests.test_media_service import make_wav
+
+User = get_user_model()
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            CHAT_UPLOAD_TEMP_DIR=os.path.join(self.tmp, 'partial'),
+            BACKGROUND_TASKS_EAGER=True
+        )
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='uploader', password='password123')
+        other = User.objects.create_user(username='listener', password='password123')
+        self.thread = ChatThread.objects.create()
+        self.thread.participants.add(self.user.userprofile, other.userprofile)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _init(self, name, size, **extra):
+        return self.client.post('/api/chat/uploads/', {
+            'thread': self.thread.id, 'file_name': name, 'file_size': size, **extra
+        })
+
+    def _put(self, upload_id, data, offset):
+        return self.client.generic(
+            'PUT', f'/api/chat/uploads/{upload_id}/', data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_resumable_voice_upload(self):
+        data = make_wav(seconds=3)
+        init = self._init('note.wav', len(data), voice='true')
+        self.assertEqual(init.status_code, 201)
+        upload_id = init.data['id']
+
+        half = len(data) // 2
+        first = self._put(upload_id, data[:half], 0)
+        self.assertEqual(first.data['offset'], half)
+        self.assertEqual(first['Upload-Offset'], str(half))
+
+        # A retried first chunk is rejected with the offset to resume from
+        retry = self._put(upload_id, data[:half], 0)
+        self.assertEqual(retry.status_code, 409)
+        self.assertEqual(retry.data['offset'], half)
+
+        self.assertEqual(self.client.get(f'/api/chat/uploads/{upload_id}/').data['offset'], half)
+
+        # Finalizing early is refused
+        self.assertEqual(self.client.post(f'/api/chat/uploads/{upload_id}/finalize/').status_code, 409)
+
+        self.assertEqual(self._put(upload_id, data[half:], half).data['offset'], len(data))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/chat/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 201)
+
+        session = UploadSession.objects.get(pk=upload_id)
+        self.assertEqual(session.status, 'complete')
+        self.assertEqual(session.mime_type, 'audio/wav')
+        self.assertFalse(os.path.exists(session.temp_path))
+
+        attachment = session.message.attachments.get()
+        self.assertEqual(attachment.file_type, 'voice')
+        self.assertEqual(attachment.file_size, len(data))
+        self.assertEqual(attachment.duration, 3)
+
+    def test_content_must_match_declared_type(self):
+        init = self._init('photo.png', 1024)
+        response = self._put(init.data['id'], b'%PDF-1.4' + b'\x00' * 100, 0)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(UploadSession.objects.get(pk=init.data['id']).status, 'aborted')
+
+    def test_size_limit_enforced_up_front_and_per_chunk(self):
+        self.assertEqual(self._init('clip.mp4', 500 * 1024 * 1024).status_code, 413)
+
+        init = self._init('note.wav', 10)
+        self.assertEqual(self._put(init.data['id'], b'RIFF' + b'\x00' * 20, 0).status_code, 413)
+
+    def test_finalize_rechecks_the_file(self):
+        data = make_wav(seconds=1)
+        upload_id = self._init('note.wav', len(data)).data['id']
+        self.assertEqual(self._put(upload_id, data, 0).data['offset'], len(data))
+
+        # Bytes appended behind the session's back are caught at finalize
+        session = UploadSession.objects.get(pk=upload_id)
+        with open(session.temp_path, 'ab') as f:
+            f.write(b'stray bytes from a lost race')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/chat/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 409)
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'aborted')
+        self.assertFalse(os.path.exists(session.temp_path))
+
+    def test_chunk_claim_blocks_concurrent_writers(self):
+        data = make_wav(seconds=1)
+        upload_id = self._init('note.wav', len(data)).data['id']
+
+        # Another request is mid-chunk at this offset
+        UploadSession.objects.filter(pk=upload_id).update(chunk_claimed_at=timezone.now())
+        response = self._put(upload_id, data, 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+
+        # A claim left behind by a dead worker expires
+        UploadSession.objects.filter(pk=upload_id).update(
+            chunk_claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(self._put(upload_id, data, 0).data['offset'], len(data))
+        self.assertIsNone(UploadSession.objects.get(pk=upload_id).chunk_claimed_at)
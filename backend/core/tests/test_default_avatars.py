@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.utils.avatar_renderer import render_svg, avatar_digest
+from core.utils.avatar_utils import generate_default_avatar_url
+
+User = get_user_model()
+
+
+class DefaultAvatarTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_profiles_get_local_deterministic_avatars(self):
+        profile = User.objects.create_user(username='alice', password='password123').userprofile
+        url = profile.get_avatar_url()
+
+        self.assertTrue(url.startswith('/media/avatars/default/'))
+        self.assertEqual(url, generate_default_avatar_url('alice'))
+        self.assertNotEqual(url, generate_default_avatar_url('bob'))
+        self.assertEqual(render_svg(avatar_digest('alice')), render_svg(avatar_digest('alice')))
+
+    def test_legacy_dicebear_urls_map_to_local_render(self):
+        profile = User.objects.create_user(username='carol', password='password123').userprofile
+        profile.default_avatar_url = 'https://api.dicebear.com/7.x/thumbs/svg?seed=seed_105&backgroundColor=b6e3f4'
+        profile.save()
+
+        self.assertEqual(profile.get_avatar_url(), generate_default_avatar_url('carol', seed='seed_105'))
+
+    def test_avatar_rendered_in_memory(self):
+        url = generate_default_avatar_url('dave')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response.content.startswith(b'<svg'))
+        self.assertEqual(os.listdir(self.media_root), [])
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        png = self.client.get(url.replace('.svg', '.png'))
+        self.assertEqual(png.status_code, 200)
+        self.assertEqual(png['Content-Type'], 'image/png')
+
+    def test_default_avatar_urls_are_absolute_per_request(self):
+        profile = User.objects.create_user(username='erin', password='password123').userprofile
+        self.assertTrue(profile.default_avatar_url.startswith('/media/avatars/default/'))
+        client = APIClient()
+        client.force_authenticate(profile.user)
+
+        picked = client.get('/api/profiles/default-avatars/').data['avatars'][3]['url']
+        self.assertTrue(picked.startswith('http://testserver/media/avatars/default/'))
+
+        response = client.put('/api/profiles/me/', {'default_avatar_url': picked}, format='json')
+        self.assertEqual(response.data['default_avatar_url'], picked)
+        profile.refresh_from_db()
+        self.assertEqual(profile.default_avatar_url, picked.replace('http://testserver', ''))
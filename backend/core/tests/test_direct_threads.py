@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_direct_thread, get_direct_thread_ids, get_or_create_direct_thread
+from chat.models import ChatThread, DirectThreadIndex
+
+User = get_user_model()
+
+
+class DirectThreadIndexTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('alice', 'bob', 'carol')
+        ]
+
+    def test_get_or_create_is_symmetric_and_unique(self):
+        thread, created = get_or_create_direct_thread(self.alice, self.bob, status='active')
+        self.assertTrue(created)
+        again, created = get_or_create_direct_thread(self.bob, self.alice)
+        self.assertFalse(created)
+        self.assertEqual(again, thread)
+        self.assertEqual(set(thread.participants.all()), {self.alice, self.bob})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_direct_thread(self.bob, self.alice), thread)
+        self.assertEqual(get_direct_thread_ids(self.bob, [self.alice.id, self.carol.id]), {self.alice.id: thread.id})
+
+        low, high = sorted([self.alice.id, self.bob.id])
+        other = ChatThread.objects.create(is_group=False)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DirectThreadIndex.objects.create(min_profile_id=low, max_profile_id=high, thread=other)
+
+    def test_create_thread_endpoint_reuses_dm(self):
+        client = APIClient()
+        client.force_authenticate(self.alice.user)
+        first = client.post('/api/chat/threads/', {'participants': [self.bob.id]}, format='json')
+        self.assertEqual(first.status_code, 201)
+        second = client.post('/api/chat/threads/', {'participants': [self.bob.id]}, format='json')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(DirectThreadIndex.objects.count(), 1)
+
+    def test_backfill_indexes_legacy_threads(self):
+        older = ChatThread.objects.create(is_group=False)
+        older.participants.add(self.alice, self.bob)
+        newer = ChatThread.objects.create(is_group=False)
+        newer.participants.add(self.alice, self.bob)
+        group = ChatThread.objects.create(is_group=True, group_name='trio')
+        group.participants.add(self.alice, self.bob, self.carol)
+
+        call_command('backfill_direct_threads', stdout=StringIO())
+
+        self.assertEqual(DirectThreadIndex.objects.count(), 1)
+        self.assertEqual(get_direct_thread(self.alice, self.bob), newer)
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.events import event_buffer
+from core.models import Post, PostImpression, UserEvent
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, IMPRESSION_DEDUP_WINDOW=1800, EVENT_BUFFER_MAX=5000)
+class ImpressionBufferTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='password123').userprofile
+        self.author = User.objects.create_user(username='author', password='password123').userprofile
+        self.posts = [Post.objects.create(author=self.author, caption=f'post {i}') for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer.user)
+        event_buffer.flush()
+
+    def tearDown(self):
+        event_buffer.flush()
+
+    def test_impressions_are_buffered_then_flushed_in_bulk(self):
+        ids = [p.id for p in self.posts]
+        # Only the profile lookup; nothing is written during the request
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/impressions/', {'source': 'feed', 'post_ids': ids}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['accepted'], 3)
+        # Scrolling past the same posts again in the window adds nothing
+        self.client.post('/api/impressions/', {'source': 'feed', 'post_ids': ids}, format='json')
+        self.assertFalse(PostImpression.objects.exists())
+
+        self.assertEqual(event_buffer.flush(), 3)
+        self.assertEqual(PostImpression.objects.filter(source='feed').count(), 3)
+        self.assertEqual(
+            set(Post.objects.values_list('impressions_count', flat=True)), {1}
+        )
+
+    def test_repeat_after_flush_does_not_double_count(self):
+        post = self.posts[0]
+        event_buffer.add(self.viewer.id, post.id, 'view', now=1000)
+        event_buffer.flush()
+        event_buffer.add(self.viewer.id, post.id, 'view', now=1001)
+        self.assertEqual(event_buffer.flush(), 0)
+        # Next window counts again
+        event_buffer.add(self.viewer.id, post.id, 'view', now=1000 + 1800)
+        self.assertEqual(event_buffer.flush(), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.views_count, 2)
+
+    def test_view_event_skips_user_event_table(self):
+        post = self.posts[0]
+        response = self.client.post('/api/events/', {'post': post.id, 'event_type': 'view'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(UserEvent.objects.exists())
+        event_buffer.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.views_count, 1)
+
+        response = self.client.post('/api/events/', {'post': post.id, 'event_type': 'like'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(UserEvent.objects.filter(event_type='like').exists())
+
+    def test_deleted_post_is_dropped(self):
+        doomed = self.posts[0]
+        event_buffer.add(self.viewer.id, doomed.id)
+        event_buffer.add(self.viewer.id, self.posts[1].id)
+        doomed.delete()
+        self.assertEqual(event_buffer.flush(), 1)
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Follow, UserProfile
+from core.serializers import UserProfileSerializer
+from core.services.follow_service import FollowService
+
+User = get_user_model()
+
+
+class FollowCountTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='password123').userprofile
+        self.bob = User.objects.create_user(username='bob', password='password123').userprofile
+
+    def counts(self, profile):
+        profile.refresh_from_db()
+        return profile.followers_count, profile.following_count
+
+    def test_follow_and_unfollow_update_counters(self):
+        self.assertTrue(FollowService.follow(self.alice, self.bob))
+        self.assertFalse(FollowService.follow(self.alice, self.bob))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+        self.assertTrue(FollowService.unfollow(self.alice, self.bob))
+        self.assertFalse(FollowService.unfollow(self.alice, self.bob))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_follow_endpoint_and_block_keep_counters(self):
+        client = APIClient()
+        client.force_authenticate(self.alice.user)
+        response = client.post(f'/api/follow/{self.bob.id}/')
+        self.assertEqual(response.data['followers_count'], 1)
+
+        FollowService.follow(self.bob, self.alice)
+        client.post(f'/api/chat/block/{self.bob.user_id}/')
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_reconcile_command_fixes_drift(self):
+        Follow.objects.create(follower=self.alice, followee=self.bob)
+        UserProfile.objects.filter(pk=self.alice.pk).update(followers_count=7)
+
+        call_command('reconcile_follow_counts', stdout=StringIO())
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+    def test_profile_edits_do_not_write_back_stale_counters(self):
+        stale = UserProfile.objects.get(pk=self.bob.pk)
+        FollowService.follow(self.alice, self.bob)
+
+        serializer = UserProfileSerializer(stale, data={'bio': 'hello'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        client = APIClient()
+        client.force_authenticate(self.bob.user)
+        response = client.put('/api/profiles/me/', {'nickname': 'Bobby'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual((self.bob.bio, self.bob.nickname), ('hello', 'Bobby'))
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_or_create_direct_thread
+from chat.models import ChatThread, UserRestriction
+
+User = get_user_model()
+
+
+class InboxActivityTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('alice', 'bob', 'carol')
+        ]
+        self.with_bob, _ = get_or_create_direct_thread(self.alice, self.bob, status='active')
+        self.with_carol, _ = get_or_create_direct_thread(self.alice, self.carol, status='active')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+
+    def _send(self, thread, content):
+        return self.client.post('/api/chat/messages/', {'thread': thread.id, 'content': content}, format='json')
+
+    def test_message_moves_thread_up_without_touching_thread_row(self):
+        self._send(self.with_carol, 'first')
+        thread_updated_at = ChatThread.objects.values_list('updated_at', flat=True).get(pk=self.with_bob.pk)
+
+        with mock.patch('chat.activity.broadcast_many') as broadcast, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self._send(self.with_bob, 'hello bob')
+
+        self.assertEqual(
+            ChatThread.objects.values_list('updated_at', flat=True).get(pk=self.with_bob.pk), thread_updated_at
+        )
+        membership = self.with_bob.membership(self.bob)
+        self.assertEqual(membership.last_message_id, response.data['id'])
+
+        events = broadcast.call_args.args[0]
+        self.assertEqual({group for group, _ in events}, {f'inbox_{self.alice.id}', f'inbox_{self.bob.id}'})
+        payload = events[0][1]
+        self.assertEqual(payload['action'], 'thread_activity')
+        self.assertEqual(payload['thread_id'], self.with_bob.id)
+        self.assertEqual(payload['preview'], 'hello bob')
+
+        inbox = self.client.get('/api/chat/threads/').data
+        self.assertEqual([t['id'] for t in inbox], [self.with_bob.id, self.with_carol.id])
+        self.assertEqual(inbox[0]['updated_at'], payload['last_activity'].replace('+00:00', 'Z'))
+
+    def test_bulk_share_records_activity_per_thread(self):
+        from core.models import Post
+        from core.services.post_service import PostService
+
+        post = Post.objects.create(author=self.alice, caption='look')
+        self._send(self.with_bob, 'older')
+        result = PostService.bulk_share(self.alice, post, [self.bob.id, self.carol.id])
+
+        for recipient, thread_id in result['threads'].items():
+            thread = ChatThread.objects.get(pk=thread_id)
+            newest = thread.messages.order_by('-created_at', '-id').first()
+            self.assertEqual(thread.membership(self.alice).last_message_id, newest.id)
+
+    def test_members_who_blocked_the_sender_get_no_activity(self):
+        UserRestriction.objects.create(user=self.bob, restricted_user=self.alice, restriction_type='block')
+        self.bob.blocked_users.add(self.alice)
+        before = self.with_bob.membership(self.bob)
+
+        with mock.patch('chat.activity.broadcast_many') as broadcast, \
+                self.captureOnCommitCallbacks(execute=True):
+            self._send(self.with_bob, 'secret')
+
+        events = broadcast.call_args.args[0]
+        self.assertEqual([group for group, _ in events], [f'inbox_{self.alice.id}'])
+        after = self.with_bob.membership(self.bob)
+        self.assertEqual((after.last_activity, after.last_message_id), (before.last_activity, before.last_message_id))
@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+import wave
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from chat.models import ChatThread, MessageAttachment
+from core.models import Post
+from core.services.media_service import MediaService
+
+User = get_user_model()
+
+
+def make_png(size=(640, 480)):
+    out = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(out, format='PNG')
+    return out.getvalue()
+
+
+def make_wav(seconds=2, rate=8000):
+    out = BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b'\x00\x00' * rate * seconds)
+    return out.getvalue()
+
+
+class MediaPipelineTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, BACKGROUND_TASKS_EAGER=True)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='sender', password='password123')
+        self.profile = self.user.userprofile
+        other = User.objects.create_user(username='receiver', password='password123')
+        self.thread = ChatThread.objects.create()
+        self.thread.participants.add(self.profile, other.userprofile)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_image_upload_generates_variants(self):
+        upload = SimpleUploadedFile('photo.png', make_png(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/chat/messages/media/', {'thread': self.thread.id, 'file': upload})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['attachments'][0]['processing_status'], 'pending')
+
+        attachment = MessageAttachment.objects.get(message_id=response.data['id'])
+        self.assertEqual(attachment.processing_status, 'ready')
+        self.assertEqual(set(attachment.variants), {'sm', 'md', 'lg'})
+        self.assertIn('webp', attachment.variants['md'])
+        self.assertEqual(attachment.thumbnail.name, attachment.variants['md']['webp'])
+        with Image.open(attachment.thumbnail.path) as thumb:
+            self.assertLessEqual(max(thumb.size), 300)
+
+    def test_voice_upload_probes_duration(self):
+        upload = SimpleUploadedFile('note.wav', make_wav(seconds=2), content_type='audio/wav')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/chat/messages/voice/', {'thread': self.thread.id, 'file': upload})
+
+        self.assertEqual(response.status_code, 201)
+        attachment = MessageAttachment.objects.get(message_id=response.data['id'])
+        self.assertEqual(attachment.file_type, 'voice')
+        self.assertTrue(attachment.message.is_voice_message)
+        self.assertEqual(attachment.duration, 2)
+        self.assertEqual(attachment.processing_status, 'ready')
+
+    def test_voice_upload_rejects_non_audio(self):
+        upload = SimpleUploadedFile('photo.png', make_png(), content_type='image/png')
+        response = self.client.post('/api/chat/messages/voice/', {'thread': self.thread.id, 'file': upload})
+        self.assertEqual(response.status_code, 400)
+
+    def test_corrupt_image_marked_failed(self):
+        upload = SimpleUploadedFile('broken.png', b'\x89PNG\r\n\x1a\n' + b'\x00' * 64, content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            message = MediaService.create_attachment_message(self.profile, self.thread, upload, 'image')
+
+        self.assertEqual(message.attachments.get().processing_status, 'failed')
+
+    def test_post_image_variants(self):
+        upload = SimpleUploadedFile('post.png', make_png((1200, 900)), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.profile, content='pic', image=upload)
+            MediaService.enqueue_post_image(post.id)
+
+        post.refresh_from_db()
+        self.assertEqual(set(post.image_variants), {'sm', 'md', 'lg'})
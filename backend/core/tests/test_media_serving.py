@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from chat.models import ChatThread
+from core.models import MediaReference
+from core.services.media_service import MediaService
+
+User = get_user_model()
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.member = User.objects.create_user(username='member', password='password123')
+        other = User.objects.create_user(username='other', password='password123')
+        self.outsider = User.objects.create_user(username='outsider', password='password123')
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.member.userprofile, other.userprofile)
+
+        self.data = bytes(range(256)) * 40
+        upload = SimpleUploadedFile('clip.mp3', self.data, content_type='audio/mpeg')
+        message = MediaService.create_attachment_message(self.member.userprofile, thread, upload, 'audio')
+        self.attachment = message.attachments.get()
+        self.url = self.attachment.file.url
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_participant_gets_file_with_etag(self):
+        self.client.force_login(self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_byte_ranges(self):
+        self.client.force_login(self.member)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(suffix.streaming_content), self.data[-10:])
+
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(stale.status_code, 200)
+
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+
+    def test_non_participants_cannot_fetch_attachments(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_attachment_names_are_indexed(self):
+        names = lambda: set(MediaReference.objects.filter(attachment=self.attachment).values_list('name', flat=True))
+        self.assertEqual(names(), {self.attachment.file.name})
+
+        self.attachment.variants = {'md': {'webp': 'cas/ab/cd/thumb.webp'}}
+        self.attachment.save(update_fields=['variants'])
+        self.assertEqual(names(), {self.attachment.file.name, 'cas/ab/cd/thumb.webp'})
+
+        self.attachment.variants = {}
+        self.attachment.save(update_fields=['variants'])
+        self.assertEqual(names(), {self.attachment.file.name})
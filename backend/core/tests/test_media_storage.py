@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Post, MediaBlob
+from core.tests.test_media_service import make_png
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.profile = User.objects.create_user(username='poster', password='password123').userprofile
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _post(self, data, name='photo.png'):
+        return Post.objects.create(author=self.profile, content='pic',
+                                   image=SimpleUploadedFile(name, data, content_type='image/png'))
+
+    def test_identical_uploads_share_one_blob(self):
+        data = make_png()
+        first = self._post(data, 'a.png')
+        second = self._post(data, 'b.png')
+        other = self._post(make_png((10, 10)))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('cas/'))
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+
+    def test_gc_reconciles_counts_and_removes_orphans(self):
+        data = make_png()
+        first = self._post(data)
+        second = self._post(data)
+        name = first.image.name
+        storage = first.image.storage
+
+        first.delete()
+        call_command('gc_media_blobs', stdout=StringIO())
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+        second.delete()
+        call_command('gc_media_blobs', stdout=StringIO())
+        # Still inside the grace period
+        self.assertTrue(storage.exists(name))
+
+        MediaBlob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(hours=2))
+        call_command('gc_media_blobs', stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_gc_keeps_files_of_blobs_referenced_again(self):
+        from core.storage import content_addressed_storage as storage
+
+        post = self._post(make_png())
+        name = post.image.name
+        # A blob whose row is (again) present keeps its file
+        self.assertFalse(storage.delete_blob(name))
+        self.assertTrue(storage.exists(name))
+
+        # Once the row is gone the file goes, and re-uploading the same content restores both
+        MediaBlob.objects.filter(name=name).delete()
+        self.assertTrue(storage.delete_blob(name))
+        self.assertFalse(storage.exists(name))
+        again = self._post(make_png())
+        self.assertEqual(again.image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
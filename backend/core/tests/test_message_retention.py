@@ -0,0 +1,143 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_or_create_direct_thread
+from chat.models import ChatMessage, ChatThread, MessageReaction
+from chat.retention import purge_thread, retire_thread, sweep_expired_messages
+
+User = get_user_model()
+
+
+class MessageRetentionTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('alice', 'bob')
+        ]
+        self.thread, _ = get_or_create_direct_thread(self.alice, self.bob, status='active')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+
+    def _expired_message(self, content='old', seconds_ago=60):
+        message = ChatMessage.objects.create(thread=self.thread, sender=self.alice, content=content)
+        ChatMessage.objects.filter(pk=message.pk).update(expires_at=timezone.now() - timedelta(seconds=seconds_ago))
+        return message
+
+    def test_set_timer_stamps_new_messages(self):
+        url = f'/api/chat/threads/{self.thread.id}/disappearing/'
+        response = self.client.post(url, {'duration': 3600}, format='json')
+        self.assertEqual(response.data['duration'], 3600)
+
+        self.client.post('/api/chat/messages/', {'thread': self.thread.id, 'content': 'poof'}, format='json')
+        message = ChatMessage.objects.get(thread=self.thread)
+        self.assertAlmostEqual(
+            (message.expires_at - message.created_at).total_seconds(), 3600, delta=5
+        )
+
+        self.client.post(url, {'duration': None}, format='json')
+        self.thread.refresh_from_db()
+        self.assertIsNone(self.thread.disappearing_messages_duration)
+        self.assertEqual(self.client.post(url, {'duration': -1}, format='json').status_code, 400)
+
+    def test_expired_messages_hidden_before_sweep(self):
+        self._expired_message()
+        live = ChatMessage.objects.create(thread=self.thread, sender=self.bob, content='new')
+
+        data = self.client.get(f'/api/chat/threads/{self.thread.id}/').data
+        self.assertEqual([m['id'] for m in data['messages']], [live.id])
+        inbox = self.client.get('/api/chat/threads/').data
+        self.assertEqual(inbox[0]['last_message']['id'], live.id)
+
+    def test_sweep_deletes_in_batches_and_broadcasts(self):
+        expired = [self._expired_message(f'm{i}', seconds_ago=60 + i) for i in range(5)]
+        MessageReaction.objects.create(message=expired[0], user=self.bob, emoji='x')
+        live = ChatMessage.objects.create(thread=self.thread, sender=self.bob, content='stay')
+
+        with mock.patch('chat.retention.broadcast_many') as broadcast:
+            self.assertEqual(sweep_expired_messages(batch_size=2, max_batches=1), 2)
+            self.assertEqual(sweep_expired_messages(batch_size=2), 3)
+        self.assertEqual(broadcast.call_count, 3)
+        group, payload = broadcast.call_args_list[0].args[0][0]
+        self.assertEqual(group, f'thread_{self.thread.id}')
+        self.assertEqual(payload['action'], 'message_deleted')
+        # Oldest expiry first
+        self.assertEqual(payload['message_id'], expired[-1].id)
+
+        self.assertEqual(list(ChatMessage.objects.values_list('id', flat=True)), [live.id])
+        self.assertFalse(MessageReaction.objects.exists())
+
+    def test_command_sweeps(self):
+        self._expired_message()
+        call_command('sweep_expired_messages', '--batch-size', '10', stdout=mock.MagicMock())
+        self.assertFalse(ChatMessage.objects.exists())
+
+
+class HistoryClearTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('alice', 'bob', 'carol')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+        response = self.client.post(
+            '/api/chat/threads/',
+            {'participants': [self.bob.id, self.carol.id], 'group_name': 'club'},
+            format='json'
+        )
+        self.group = ChatThread.objects.get(pk=response.data['id'])
+        self.bob_client = APIClient()
+        self.bob_client.force_authenticate(self.bob.user)
+        for i in range(3):
+            ChatMessage.objects.create(thread=self.group, sender=self.carol, content=f'old {i}')
+
+    def test_clear_sets_watermark_without_per_message_rows(self):
+        self.bob_client.delete(f'/api/chat/threads/{self.group.id}/delete/')
+        self.assertIsNotNone(self.group.membership(self.bob).history_cleared_before)
+        self.assertFalse(ChatMessage.deleted_by.through.objects.exists())
+
+        new = ChatMessage.objects.create(thread=self.group, sender=self.carol, content='new')
+        self.group.restore_for_all()
+        inbox = self.bob_client.get('/api/chat/threads/').data
+        self.assertEqual(inbox[0]['last_message']['id'], new.id)
+        self.assertEqual(inbox[0]['unread_count'], 1)
+        data = self.bob_client.get(f'/api/chat/threads/{self.group.id}/').data
+        self.assertEqual([m['id'] for m in data['messages']], [new.id])
+
+        # Other members keep the full history
+        alice_data = self.client.get(f'/api/chat/threads/{self.group.id}/').data
+        self.assertEqual(len(alice_data['messages']), 4)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_admin_delete_retires_then_purges(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.delete(f'/api/chat/threads/{self.group.id}/delete/')
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(ChatThread.objects.filter(pk=self.group.id).exists())
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_purge_leaves_live_threads_alone(self):
+        # e.g. the request that retired it rolled back
+        self.assertEqual(purge_thread(self.group.id), 0)
+        self.assertEqual(ChatMessage.objects.filter(thread=self.group).count(), 3)
+
+    def test_purge_runs_in_chunks(self):
+        retire_thread(self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.status, 'deleted')
+        self.assertEqual(self.bob_client.get('/api/chat/threads/').data, [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_thread(self.group.id, batch_size=2), 3)
+        # Three messages in chunks of two
+        message_deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "chat_chatmessage"')]
+        self.assertEqual(len(message_deletes), 2)
+        self.assertFalse(ChatThread.objects.filter(pk=self.group.id).exists())
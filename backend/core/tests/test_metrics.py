@@ -0,0 +1,89 @@
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_or_create_direct_thread
+from core import metrics, profiling
+from core.metrics import WebSocketMetricsMiddleware, websocket_route
+from core.routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='password123').userprofile
+        self.bob = User.objects.create_user(username='bob', password='password123').userprofile
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+        metrics.reset()
+
+    def test_http_requests_are_counted_per_url_name(self):
+        self.assertEqual(self.client.get('/api/posts/').status_code, 200)
+        self.client.get('/api/posts/')
+
+        self.assertEqual(metrics.http_requests.value(view='post-list', method='GET', status=200), 2)
+        self.assertEqual(metrics.http_latency.value(view='post-list', method='GET'), 2)
+        self.assertGreater(metrics.db_queries.value(alias='default'), 0)
+        self.assertEqual(metrics.http_in_progress.value(), 0)
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_one_sql_hook_feeds_metrics_and_profile(self):
+        profiling.profile_buffer.clear()
+        self.client.get('/api/posts/')
+
+        self.assertEqual(connection.execute_wrappers.count(profiling._sql_wrapper), 1)
+        entry = profiling.profile_buffer.entries(limit=1)[0]
+        self.assertEqual(metrics.db_queries.value(alias='default'), entry['sql_count'])
+
+    def test_chat_message_counts_send_and_fanout(self):
+        thread, _ = get_or_create_direct_thread(self.alice, self.bob, status='active')
+        response = self.client.post('/api/chat/messages/', {'thread': thread.id, 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(metrics.chat_messages.value(), 1)
+        self.assertGreaterEqual(metrics.group_send_latency.value(), 1)
+        self.assertEqual(metrics.encryption_ops.value(operation='encrypt'), 1)
+
+    def test_websocket_connections_and_frames(self):
+        application = WebSocketMetricsMiddleware(URLRouter(websocket_urlpatterns))
+
+        async def session():
+            communicator = WebsocketCommunicator(application, '/ws/chat/42/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual(metrics.ws_active.value(route='chat'), 1)
+            await communicator.send_json_to({'message': 'ping'})
+            self.assertEqual((await communicator.receive_json_from())['message'], 'ping')
+            await communicator.disconnect()
+
+        async_to_sync(session)()
+        self.assertEqual(metrics.ws_active.value(route='chat'), 0)
+        self.assertEqual(metrics.ws_connections.value(route='chat'), 1)
+        self.assertEqual(metrics.ws_frames.value(route='chat', direction='in'), 1)
+        self.assertEqual(metrics.ws_frames.value(route='chat', direction='out'), 1)
+        self.assertEqual(metrics.group_send_fanout.value(), 1)
+        self.assertEqual(websocket_route('/ws/inbox/'), 'inbox')
+
+    def test_endpoint_renders_text_format_for_staff_or_token(self):
+        self.client.get('/api/posts/')
+        self.assertEqual(self.client.get('/api/internal/metrics/').status_code, 403)
+
+        scraper = APIClient()
+        response = scraper.get('/api/internal/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="post-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('http_requests_total{view="post-list",method="GET",status="200"} 1', body)
+        self.assertEqual(scraper.get('/api/internal/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        scraper.force_login(staff)
+        self.assertEqual(scraper.get('/api/internal/metrics/').status_code, 200)
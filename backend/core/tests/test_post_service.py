@@ -1,6 +1,10 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from core.models import UserProfile, Post, UserEvent
+from django.db import connection
+from chat.direct_threads import get_or_create_direct_thread
+from chat.models import ChatThread, ChatMessage, UserRestriction
+from core.models import UserProfile, Post, UserEvent, SharedPost, Notification
 from core.services.post_service import PostService
 
 User = get_user_model()
@@ -39,3 +43,52 @@ class PostServiceTests(TestCase):
         self.assertFalse(result['liked'])
         self.assertEqual(result['likes_count'], 0)
         self.assertFalse(UserEvent.objects.filter(user=self.profile, post=post, event_type='like').exists())
+
+
+class BulkShareTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user(username='sharer', password='password123').userprofile
+        self.post = PostService.create_post(self.profile, {'content': 'Share me'})
+        self.recipients = [
+            User.objects.create_user(username=f'friend{i}', password='password123').userprofile
+            for i in range(30)
+        ]
+
+    def share(self, recipients):
+        with CaptureQueriesContext(connection) as ctx:
+            result = PostService.share_post_with_users(self.profile, self.post.id, [r.id for r in recipients], 'look')
+        return result, len(ctx.captured_queries)
+
+    def test_share_creates_threads_messages_and_notifications(self):
+        existing, _ = get_or_create_direct_thread(self.profile, self.recipients[0], status='active')
+        existing.set_member_state(self.profile, hidden=True)
+        UserRestriction.objects.create(user=self.profile, restricted_user=self.recipients[1], restriction_type='block')
+        blocker = self.recipients[3]
+        blocker_thread, _ = get_or_create_direct_thread(self.profile, blocker, status='active')
+        blocker_thread.set_member_state(blocker, deleted=True)
+        UserRestriction.objects.create(user=blocker, restricted_user=self.profile, restriction_type='block')
+
+        result = PostService.share_post_with_users(
+            self.profile, self.post.id, [r.id for r in self.recipients[:4]] + [999999], 'look'
+        )
+
+        self.assertEqual(result['shared_count'], 2)
+        self.assertEqual(len(result['errors']), 2)
+        # Skipped silently: nothing reaches the blocker and their thread stays deleted
+        self.assertFalse(ChatMessage.objects.filter(thread=blocker_thread).exists())
+        self.assertFalse(Notification.objects.filter(user=blocker).exists())
+        self.assertTrue(blocker_thread.memberships.get(profile=blocker).deleted)
+        self.assertEqual(ChatMessage.objects.filter(thread=existing).count(), 1)
+        self.assertFalse(existing.memberships.filter(hidden=True).exists())
+        new_thread = ChatThread.objects.get(participants=self.recipients[2])
+        self.assertEqual(set(new_thread.participants.all()), {self.profile, self.recipients[2]})
+        self.assertEqual(SharedPost.objects.filter(post=self.post).count(), 2)
+        self.assertEqual(Notification.objects.filter(notification_type='share', post=self.post).count(), 2)
+        message = ChatMessage.objects.get(thread=new_thread)
+        self.assertIsNone(message.content)
+
+    def test_round_trips_do_not_grow_with_recipients(self):
+        _, few = self.share(self.recipients[:3])
+        result, many = self.share(self.recipients[3:])
+        self.assertEqual(result['shared_count'], 27)
+        self.assertEqual(few, many)
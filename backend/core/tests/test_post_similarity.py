@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import JobCheckpoint, Post, PostCooccurrence, PostNeighbor, UserEvent
+from core.services.similarity_service import CHECKPOINT_NAME, PostSimilarityService
+
+User = get_user_model()
+
+
+class PostSimilarityTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123').userprofile
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password123').userprofile
+            for i in range(3)
+        ]
+        self.a, self.b, self.c, self.d = [
+            Post.objects.create(author=self.author, caption=name) for name in 'abcd'
+        ]
+
+    def _like(self, user, *posts, event_type='like'):
+        for post in posts:
+            UserEvent.objects.create(user=user, post=post, event_type=event_type)
+
+    def _weights(self):
+        return {(r.post_a_id, r.post_b_id): r.weight for r in PostCooccurrence.objects.all()}
+
+    def test_incremental_build_matches_full_rebuild(self):
+        u0, u1, u2 = self.users
+        self._like(u0, self.a, self.b)
+        self._like(u1, self.a, self.b, self.c)
+        PostSimilarityService.build()
+        self.assertEqual(JobCheckpoint.objects.get(name=CHECKPOINT_NAME).position, UserEvent.objects.latest('id').id)
+
+        # New activity, including a user who already contributed
+        self._like(u0, self.c, event_type='save')
+        self._like(u2, self.c, self.d)
+        events, _ = PostSimilarityService.build()
+        self.assertEqual(events, 3)
+        incremental = self._weights()
+
+        PostSimilarityService.build(full=True)
+        self.assertEqual(incremental.keys(), self._weights().keys())
+        for key, weight in self._weights().items():
+            self.assertAlmostEqual(incremental[key], weight)
+        # Diagonal is the squared norm: u0 saved c (2), u1 liked it (1), u2 liked it (1)
+        self.assertAlmostEqual(incremental[(self.c.id, self.c.id)], 4 + 1 + 1)
+
+    def test_posts_leaving_the_window_drop_their_pairs(self):
+        u0, u1, _ = self.users
+        with mock.patch('core.services.similarity_service.MAX_ITEMS_PER_USER', 2):
+            self._like(u0, self.a, self.b)
+            self._like(u1, self.a, self.c)
+            PostSimilarityService.build()
+            self.assertIn((self.a.id, self.b.id), self._weights())
+
+            # u0's two newest posts are now c and d: a and b fall out of the window
+            self._like(u0, self.c, self.d)
+            PostSimilarityService.build()
+            incremental = self._weights()
+            self.assertNotIn((self.a.id, self.b.id), incremental)
+            self.assertNotIn((self.b.id, self.b.id), incremental)
+
+            PostSimilarityService.build(full=True)
+        self.assertEqual(incremental.keys(), self._weights().keys())
+        for key, weight in self._weights().items():
+            self.assertAlmostEqual(incremental[key], weight)
+
+    def test_nothing_new_is_a_no_op(self):
+        self._like(self.users[0], self.a, self.b)
+        PostSimilarityService.build()
+        self.assertEqual(PostSimilarityService.build(), (0, 0))
+
+    def test_neighbors_and_more_like_this_endpoint(self):
+        u0, u1, u2 = self.users
+        self._like(u0, self.a, self.b)
+        self._like(u1, self.a, self.b, self.c)
+        self._like(u2, self.c, self.d)
+        PostSimilarityService.build()
+
+        self.assertEqual(PostSimilarityService.similar_post_ids(self.a.id), [self.b.id, self.c.id])
+        self.assertFalse(PostNeighbor.objects.filter(post=self.a, neighbor=self.d).exists())
+
+        self.c.is_public = False
+        self.c.save()
+        response = APIClient().get(f'/api/posts/{self.a.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data], [self.b.id])
+
+    def test_recommendations_exclude_seen_posts_and_boost_explore(self):
+        u0, u1, u2 = self.users
+        self._like(u1, self.a, self.b)
+        self._like(u2, self.a, self.c)
+        self._like(u0, self.a)
+        PostSimilarityService.build()
+
+        recommended = PostSimilarityService.recommend_for(u0)
+        self.assertEqual(set(recommended), {self.b.id, self.c.id})
+
+        client = APIClient()
+        client.force_authenticate(u0.user)
+        scores = {p['id']: p['explore_score'] for p in client.get('/api/posts/explore/').data}
+        self.assertGreater(scores[self.b.id], scores[self.d.id])
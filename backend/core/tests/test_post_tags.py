@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Post, PostTag, Tag
+from core.services.post_service import PostService
+from core.utils.tags import backfill_post_tags, normalize_tags
+
+User = get_user_model()
+
+
+class PostTagTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password123').userprofile
+        self.viewer = User.objects.create_user(username='viewer', password='password123').userprofile
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer.user)
+
+    def _tag_names(self, post):
+        return set(PostTag.objects.filter(post=post).values_list('tag__name', flat=True))
+
+    def test_normalize_tags(self):
+        self.assertEqual(normalize_tags(['#Django', 'django ', 'Web Dev', '', '#', None]), ['django', 'webdev'])
+        self.assertEqual(len(normalize_tags([f't{i}' for i in range(40)])), 15)
+
+    def test_index_follows_post_saves(self):
+        post = PostService.create_post(self.author, {'content': 'Hello #Django #Testing'})
+        self.assertEqual(self._tag_names(post), {'django', 'testing'})
+
+        post.tags = ['django', 'python']
+        post.is_public = False
+        post.save()
+        self.assertEqual(self._tag_names(post), {'django', 'python'})
+        self.assertFalse(PostTag.objects.filter(post=post, is_public=True).exists())
+        # Tags are shared between posts, never duplicated
+        PostService.create_post(self.author, {'content': '#python again'})
+        self.assertEqual(Tag.objects.filter(name='python').count(), 1)
+
+    def test_unrelated_update_fields_skip_the_index(self):
+        post = Post.objects.create(author=self.author, caption='#cats', tags=['cats'])
+        with self.assertNumQueries(1):
+            post.caption = 'edited'
+            post.save(update_fields=['caption'])
+
+        post.tags = ['dogs']
+        post.save(update_fields=['tags'])
+        self.assertEqual(self._tag_names(post), {'dogs'})
+
+    def test_explore_and_trending_use_the_index(self):
+        tagged = Post.objects.create(author=self.author, caption='#cats', tags=['cats'])
+        Post.objects.create(author=self.author, caption='#dogs', tags=['dogs'])
+        Post.objects.create(author=self.author, caption='#dogs again', tags=['dogs'])
+
+        explore = self.client.get('/api/posts/explore/', {'tag': '#Cats'}).data
+        self.assertEqual([p['id'] for p in explore], [tagged.id])
+
+        trending = self.client.get('/api/trending-tags/').data['tags']
+        self.assertEqual(trending, ['dogs', 'cats'])
+
+    def test_backfill_indexes_posts_written_without_save(self):
+        post = Post.objects.create(author=self.author, caption='old')
+        Post.objects.filter(pk=post.pk).update(tags=['Legacy', 'legacy', 'old'])
+        self.assertEqual(self._tag_names(post), set())
+
+        self.assertEqual(backfill_post_tags(batch_size=1), 2)
+        self.assertEqual(self._tag_names(post), {'legacy', 'old'})
+        # Re-running is harmless
+        self.assertEqual(backfill_post_tags(), 2)
+        self.assertEqual(PostTag.objects.filter(post=post).count(), 2)
+
+    def test_tag_pages_walk_every_match_by_cursor(self):
+        niche = [Post.objects.create(author=self.author, caption='#rare', tags=['rare']) for _ in range(5)]
+        for i in range(3):
+            Post.objects.create(author=self.author, caption=f'noise {i}', tags=['common'])
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'tag': 'rare', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/posts/explore/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [p['id'] for p in response.data]
+            pages += 1
+            cursor = response.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), sorted(p.id for p in niche))
+
+        for cursor in ('not-a-cursor', 'OTk5OTk5OTk5OTk5OTk5OTk5OTk6MQ', 'MTo5OTk5OTk5OTk5OTk5OTk5OTk5OTk5'):
+            bad = self.client.get('/api/posts/explore/', {'tag': 'rare', 'cursor': cursor})
+            self.assertEqual(bad.status_code, 400, cursor)
+
+    def test_extract_hashtags_command_is_chunked_and_resumable(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from core.models import JobCheckpoint
+
+        posts = [Post.objects.create(author=self.author, caption=f'#Topic{i} #shared') for i in range(5)]
+        plain = Post.objects.create(author=self.author, caption='no hashtags', tags=['kept'])
+        Post.objects.filter(id__in=[p.id for p in posts]).update(tags=[])
+        # Pretend an earlier run finished the first two posts
+        JobCheckpoint.objects.create(name='extract_hashtags', position=posts[1].id)
+
+        out = StringIO()
+        call_command('extract_hashtags', chunk_size=2, workers=1, stdout=out)
+        self.assertIn('Scanned 4 posts, updated tags on 3', out.getvalue())
+        self.assertEqual(Post.objects.get(pk=posts[1].pk).tags, [])
+        self.assertEqual(Post.objects.get(pk=posts[4].pk).tags, ['topic4', 'shared'])
+        self.assertEqual(self._tag_names(posts[4]), {'topic4', 'shared'})
+        self.assertEqual(Post.objects.get(pk=plain.pk).tags, ['kept'])
+
+        call_command('extract_hashtags', workers=1, restart=True, stdout=out)
+        self.assertEqual(Post.objects.get(pk=posts[0].pk).tags, ['topic0', 'shared'])
+        self.assertEqual(JobCheckpoint.objects.get(name='extract_hashtags').position, plain.id)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from chat.models import ChatThread, ChatMessage
+from chat.serializers import ChatMessageSerializer
+from core.models import UserProfile
+from core.profile_summary import get_profile_summary
+
+User = get_user_model()
+
+
+class ProfileSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='password123').userprofile
+        self.bob = User.objects.create_user(username='bob', password='password123').userprofile
+
+    def test_summary_is_invalidated_on_profile_and_user_save(self):
+        self.assertEqual(get_profile_summary(self.alice)['nickname'], '')
+
+        self.alice.nickname = 'Al'
+        self.alice.save()
+        self.assertEqual(get_profile_summary(self.alice)['nickname'], 'Al')
+
+        self.alice.user.username = 'alice2'
+        self.alice.user.save()
+        summary = get_profile_summary(self.alice)
+        self.assertEqual(summary['username'], 'alice2')
+        self.assertEqual(summary['user'], {'id': self.alice.user_id, 'username': 'alice2'})
+
+    def test_evicted_version_is_a_miss(self):
+        get_profile_summary(self.alice)
+        # Profile changes while the version key is evicted but the data survives
+        cache.delete(f'profile_summary:v:{self.alice.id}')
+        UserProfile.objects.filter(pk=self.alice.pk).update(nickname='Al')
+        self.alice.refresh_from_db()
+        self.assertEqual(get_profile_summary(self.alice)['nickname'], 'Al')
+
+    def test_message_page_serializes_each_sender_once(self):
+        thread = ChatThread.objects.create()
+        thread.participants.add(self.alice, self.bob)
+        for i in range(20):
+            ChatMessage.objects.create(thread=thread, sender=self.alice if i % 2 else self.bob, content=f'm{i}')
+
+        request = APIRequestFactory().get('/')
+        request.user = self.alice.user
+        messages = ChatMessage.objects.filter(thread=thread).select_related('sender__user')
+
+        def sender_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                data = ChatMessageSerializer(messages, many=True, context={'request': request}).data
+            self.assertEqual(data[0]['sender']['user']['id'], self.bob.user_id)
+            return [q['sql'] for q in ctx.captured_queries
+                    if 'core_follow' in q['sql'] or 'chat_userrestriction' in q['sql']]
+
+        # Relationship lookups happen once per distinct sender, not per message
+        self.assertEqual(len(sender_queries()), 2)
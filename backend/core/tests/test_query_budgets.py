@@ -0,0 +1,193 @@
+"""
+Query-count and latency budgets for the main API endpoints.
+
+Each test seeds the same fixed-size dataset, warms the endpoint up once,
+then calls it RUNS times under CaptureQueriesContext and compares with
+query_baselines.json:
+- queries may exceed the baseline by QUERY_TOLERANCE (at least
+  MIN_QUERY_SLACK queries); an N+1 in a serializer shows up as one query
+  per seeded row and fails
+- with CHECK_LATENCY_BUDGETS=1 only, the median may also exceed the
+  baseline by LATENCY_FACTOR (ignoring anything under LATENCY_FLOOR_MS).
+  median_ms is an absolute timing from the machine that last refreshed the
+  baselines, so this check is off by default and only meaningful there;
+  query counts are the gate everywhere else.
+
+After an intentional change, refresh the baselines with
+UPDATE_QUERY_BASELINES=1 python manage.py test core.tests.test_query_budgets
+and commit the JSON.
+"""
+import json
+import math
+import os
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_or_create_direct_thread
+from core.events import event_buffer
+from core.models import Comment, Notification
+from core.services.follow_service import FollowService
+from core.services.post_service import PostService
+from core.user_embeddings import refresh_all_user_vectors, reset_user_index
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).with_name('query_baselines.json')
+UPDATE_BASELINES = os.environ.get('UPDATE_QUERY_BASELINES', '').lower() in ('1', 'true', 'yes')
+RUNS = 5
+QUERY_TOLERANCE = float(os.environ.get('QUERY_BUDGET_TOLERANCE', '0.1'))
+MIN_QUERY_SLACK = 2
+CHECK_LATENCY = os.environ.get('CHECK_LATENCY_BUDGETS', '').lower() in ('1', 'true', 'yes')
+LATENCY_FACTOR = float(os.environ.get('LATENCY_BUDGET_FACTOR', '3.0'))
+LATENCY_FLOOR_MS = 50
+
+# Dataset size: kept small so the suite is quick, but every list has several rows
+USERS = 8
+POSTS_PER_USER = 4
+COMMENTS_PER_POST = 2
+MESSAGES_PER_THREAD = 5
+TAGS = ['django', 'python', 'travel', 'food']
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class QueryBudgetTests(TestCase):
+    measured = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, *cls.others = [
+            User.objects.create_user(username=f'bench{i}', password='password123').userprofile
+            for i in range(USERS)
+        ]
+        profiles = [cls.viewer, *cls.others]
+        cls.posts = []
+        for i, author in enumerate(profiles):
+            for j in range(POSTS_PER_USER):
+                tags = ' '.join(f'#{t}' for t in TAGS[(i + j) % len(TAGS):][:2])
+                cls.posts.append(PostService.create_post(author, {'content': f'post {j} by {i} {tags}'}))
+        for follower in profiles:
+            for followee in profiles:
+                if follower != followee and (follower.id + followee.id) % 3:
+                    FollowService.follow(follower, followee)
+        for post in cls.posts:
+            for k in range(COMMENTS_PER_POST):
+                Comment.objects.create(post=post, author=profiles[(post.id + k) % USERS], content=f'comment {k}')
+        for other in cls.others:
+            PostService.toggle_like(other, cls.posts[0].id)
+            Notification.objects.create(
+                user=cls.viewer, actor=other, notification_type='like', post=cls.posts[0], message='liked your post'
+            )
+
+        cls.threads = []
+        for other in cls.others:
+            thread, _ = get_or_create_direct_thread(cls.viewer, other, status='active')
+            cls.threads.append(thread)
+            client = APIClient()
+            for k in range(MESSAGES_PER_THREAD):
+                sender = cls.viewer if k % 2 else other
+                client.force_authenticate(sender.user)
+                client.post('/api/chat/messages/', {'thread': thread.id, 'content': f'message {k}'}, format='json')
+        for other in cls.others[:3]:
+            PostService.share_post_with_users(other, cls.posts[-1].id, [cls.viewer.id])
+        event_buffer.flush()
+        refresh_all_user_vectors()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if UPDATE_BASELINES and cls.measured:
+            baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+            baselines.update(cls.measured)
+            BASELINE_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + '\n')
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer.user)
+        self.baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+    def tearDown(self):
+        event_buffer.flush()
+
+    def _measure(self, name, call):
+        response = call()
+        self.assertLess(response.status_code, 400, f'{name}: {response.status_code} {getattr(response, "data", "")}')
+
+        counts, timings = [], []
+        for _ in range(RUNS):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = call()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.assertLess(response.status_code, 400, name)
+            counts.append(len(ctx.captured_queries))
+        queries, median_ms = max(counts), statistics.median(timings)
+
+        if UPDATE_BASELINES:
+            type(self).measured[name] = {'queries': queries, 'median_ms': round(median_ms, 2)}
+            return
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            self.fail(f'No baseline for {name}; run with UPDATE_QUERY_BASELINES=1')
+
+        query_budget = baseline['queries'] + max(MIN_QUERY_SLACK, math.ceil(baseline['queries'] * QUERY_TOLERANCE))
+        self.assertLessEqual(
+            queries, query_budget,
+            f"{name}: {queries} queries, baseline {baseline['queries']} (budget {query_budget})",
+        )
+        if not CHECK_LATENCY:
+            return
+        latency_budget = max(baseline['median_ms'] * LATENCY_FACTOR, LATENCY_FLOOR_MS)
+        self.assertLessEqual(
+            median_ms, latency_budget,
+            f"{name}: median {median_ms:.1f}ms, baseline {baseline['median_ms']}ms (budget {latency_budget:.1f}ms)",
+        )
+
+    def _get(self, name, url, params=None):
+        self._measure(name, lambda: self.client.get(url, params or {}))
+
+    def test_feed(self):
+        self._get('posts', '/api/posts/')
+        self._get('posts_feed', '/api/posts/feed/')
+        self._get('posts_following', '/api/posts/following/')
+
+    def test_explore(self):
+        self._get('explore', '/api/posts/explore/')
+        self._get('explore_tag', '/api/posts/explore/', {'tag': 'django'})
+
+    def test_discover_and_recommendations(self):
+        self._get('discover', '/api/discover/')
+        self._get('suggested_users', '/api/recommendations/users/')
+
+    def test_trending_tags(self):
+        self._get('trending_tags', '/api/trending-tags/')
+
+    def test_post_detail_and_comments(self):
+        self._get('post_detail', f'/api/posts/{self.posts[0].id}/')
+        self._get('post_comments', f'/api/posts/{self.posts[0].id}/comments/')
+
+    def test_inbox(self):
+        self._get('inbox', '/api/chat/threads/')
+
+    def test_thread_detail(self):
+        self._get('thread_detail', f'/api/chat/threads/{self.threads[0].id}/')
+
+    def test_notifications(self):
+        self._get('notifications', '/api/notifications/')
+        self._get('notifications_unread_count', '/api/notifications/unread-count/')
+
+    def test_share(self):
+        recipients = [p.id for p in self.others]
+        self._measure('share_post', lambda: self.client.post(
+            f'/api/posts/{self.posts[1].id}/share-with-users/', {'user_ids': recipients}, format='json'
+        ))
+        self._get('shared_with_me', '/api/posts/shared-with-me/')
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Follow, Post, RecommendationSnapshot
+from core.recommendation_snapshots import refresh_stale_snapshots, stale_profile_ids
+from core.user_embeddings import refresh_all_user_vectors, reset_user_index
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, USER_INDEX_REFRESH_SECONDS=0,
+                   RECOMMENDATION_SNAPSHOT_TTL=3600, RECOMMENDATION_ACTIVE_DAYS=14)
+class RecommendationSnapshotTests(TestCase):
+    def setUp(self):
+        reset_user_index()
+        self.me, self.alike, self.other = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('me', 'alike', 'other')
+        ]
+        Post.objects.create(author=self.me, caption='#python', tags=['python', 'django'])
+        Post.objects.create(author=self.alike, caption='#python', tags=['python', 'django'])
+        Post.objects.create(author=self.other, caption='#python', tags=['python', 'cooking'])
+        refresh_all_user_vectors()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def tearDown(self):
+        reset_user_index()
+
+    def _get(self):
+        return self.client.get('/api/recommendations/users/')
+
+    def test_first_read_schedules_snapshot(self):
+        first = self._get()
+        self.assertEqual(first.data['results'], [])
+        self.assertTrue(first.data['stale'])
+
+        second = self._get()
+        self.assertFalse(second.data['stale'])
+        self.assertEqual([r['id'] for r in second.data['results']], [self.alike.id, self.other.id])
+
+    def test_fresh_snapshot_is_served_without_recomputing(self):
+        self._get()
+        with mock.patch('core.recommendation_snapshots.compute_snapshot') as compute:
+            response = self._get()
+        compute.assert_not_called()
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_stale_snapshot_is_served_then_revalidated(self):
+        old = timezone.now() - timedelta(hours=2)
+        RecommendationSnapshot.objects.create(
+            profile=self.me, computed_at=old,
+            items=[{'profile_id': self.other.id, 'score': 0.5, 'reason': 'old',
+                    'matched_tags': [], 'is_active': True, 'activity_badge': ''}]
+        )
+        response = self._get()
+        self.assertTrue(response.data['stale'])
+        self.assertEqual([r['reason'] for r in response.data['results']], ['old'])
+        self.assertGreater(RecommendationSnapshot.objects.get(profile=self.me).computed_at, old)
+
+    def test_follows_made_after_the_snapshot_are_hidden(self):
+        self._get()
+        Follow.objects.create(follower=self.me, followee=self.alike)
+        self.assertEqual([r['id'] for r in self._get().data['results']], [self.other.id])
+
+    def test_scheduler_skips_inactive_users_and_orders_by_activity(self):
+        now = timezone.now()
+        User.objects.filter(pk=self.me.user.pk).update(last_login=now - timedelta(hours=1))
+        User.objects.filter(pk=self.alike.user.pk).update(last_login=now - timedelta(minutes=1))
+        User.objects.filter(pk=self.other.user.pk).update(last_login=now - timedelta(days=60))
+
+        self.assertEqual(stale_profile_ids(), [self.alike.id, self.me.id])
+        self.assertEqual(refresh_stale_snapshots(workers=2), (2, 0))
+        self.assertEqual(stale_profile_ids(), [])
+        self.assertFalse(RecommendationSnapshot.objects.filter(profile=self.other).exists())
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from chat.models import UserRestriction
+from core.models import Follow
+from core.serializers import UserProfileSerializer
+from core.services.relationship_service import (
+    RelationshipService, FOLLOWING, FOLLOWED_BY, BLOCKED_BY_ME, BLOCKING_ME, MUTED, MAX_RELATIONSHIP_IDS
+)
+
+User = get_user_model()
+
+
+class RelationshipServiceTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username='me', password='password123').userprofile
+        self.others = [
+            User.objects.create_user(username=f'user{i}', password='password123').userprofile
+            for i in range(4)
+        ]
+        a, b, c, d = self.others
+        Follow.objects.create(follower=self.me, followee=a)
+        Follow.objects.create(follower=a, followee=self.me)
+        Follow.objects.create(follower=b, followee=self.me)
+        UserRestriction.objects.create(user=self.me, restricted_user=c, restriction_type='block')
+        UserRestriction.objects.create(user=self.me, restricted_user=c, restriction_type='mute')
+        UserRestriction.objects.create(user=d, restricted_user=self.me, restriction_type='block')
+        # Someone else muting me is not visible to me
+        UserRestriction.objects.create(user=b, restricted_user=self.me, restriction_type='mute')
+
+    def test_resolve_uses_two_queries(self):
+        a, b, c, d = self.others
+        with self.assertNumQueries(2):
+            masks = RelationshipService.resolve(self.me, [a.id, b.id, c.id, d.id, self.me.id])
+        self.assertEqual(masks[a.id], FOLLOWING | FOLLOWED_BY)
+        self.assertEqual(masks[b.id], FOLLOWED_BY)
+        self.assertEqual(masks[c.id], BLOCKED_BY_ME | MUTED)
+        self.assertEqual(masks[d.id], BLOCKING_ME)
+        self.assertEqual(masks[self.me.id], 0)
+
+    def test_endpoint(self):
+        a, b, c, d = self.others
+        client = APIClient()
+        client.force_authenticate(self.me.user)
+
+        response = client.get('/api/relationships/', {'ids': f'{a.id},{d.id}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['relationships'], {str(a.id): FOLLOWING | FOLLOWED_BY, str(d.id): BLOCKING_ME})
+
+        response = client.post('/api/relationships/', {'ids': [c.id]}, format='json')
+        self.assertEqual(response.data['relationships'], {str(c.id): BLOCKED_BY_ME | MUTED})
+
+        response = client.post('/api/relationships/', {'ids': list(range(MAX_RELATIONSHIP_IDS + 1))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_list_serialization_resolves_in_bulk(self):
+        request = RequestFactory().get('/')
+        request.user = self.me.user
+        profiles = list(type(self.me).objects.select_related('user').filter(id__in=[p.id for p in self.others]))
+        with self.assertNumQueries(2):
+            data = UserProfileSerializer(profiles, many=True, context={'request': request}).data
+        flags = {row['id']: row for row in data}
+        a, b, c, d = self.others
+        self.assertTrue(flags[a.id]['is_following'])
+        self.assertTrue(flags[c.id]['is_blocked_by_me'])
+        self.assertTrue(flags[d.id]['is_blocking_me'])
+        self.assertTrue(flags[d.id]['is_blocked'])
+        self.assertFalse(flags[b.id]['is_blocked'])
@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat.direct_threads import get_or_create_direct_thread
+from core.models import Post
+from core.profiling import RequestProfile, fingerprint, profile_buffer
+
+User = get_user_model()
+
+
+@override_settings(
+    REQUEST_PROFILING=True, REQUEST_PROFILING_SERVER_TIMING=True,
+    REQUEST_PROFILING_SAMPLE_RATE=1.0, REQUEST_PROFILING_SLOW_MS=0,
+)
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='password123').userprofile
+        self.bob = User.objects.create_user(username='bob', password='password123').userprofile
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        for i in range(3):
+            Post.objects.create(author=self.bob, caption=f'post {i}')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+        profile_buffer.clear()
+
+    def _timing(self, response):
+        return dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = 12 AND name = \'x\' AND pk IN (1, 2, 3)'),
+            fingerprint('SELECT *  FROM t WHERE id = 7 AND name = \'it\'\'s\' AND pk IN (4)'),
+        )
+
+    def test_raw_queries_are_fingerprinted_on_read(self):
+        profile = RequestProfile('GET', '/')
+        profile.queries.update({
+            'SELECT * FROM t WHERE pk IN (1, 2)': 2,
+            'SELECT * FROM t WHERE pk IN (3)': 1,
+            'SELECT 1': 1,
+        })
+        self.assertEqual(profile.duplicate_queries(), [('SELECT * FROM t WHERE pk IN (...)', 3)])
+
+    def test_server_timing_and_ring_buffer(self):
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.status_code, 200)
+        timing = self._timing(response)
+        self.assertEqual(set(timing), {'sql', 'serializer', 'decrypt', 'channels', 'total'})
+
+        entry = profile_buffer.entries(limit=1)[0]
+        self.assertEqual((entry['method'], entry['path'], entry['status']), ('GET', '/api/posts/', 200))
+        self.assertGreater(entry['sql_count'], 0)
+        self.assertIn(f"{entry['sql_count']} queries", timing['sql'])
+        self.assertGreater(entry['serializer_ms'], 0)
+
+    def test_channel_sends_are_counted(self):
+        thread, _ = get_or_create_direct_thread(self.alice, self.bob, status='active')
+        response = self.client.post('/api/chat/messages/', {'thread': thread.id, 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('desc="1 sends"', self._timing(response)['channels'])
+        self.assertEqual(profile_buffer.entries(limit=1)[0]['channel_sends'], 1)
+
+    def test_endpoint_is_staff_only(self):
+        self.client.get('/api/posts/')
+        self.assertEqual(self.client.get('/api/internal/profiles/').status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/internal/profiles/', {'path': '/api/posts/'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'])
+        self.assertTrue(all(e['path'].startswith('/api/posts/') for e in response.data['results']))
+
+    @override_settings(REQUEST_PROFILING_SERVER_TIMING=False)
+    def test_server_timing_only_for_staff_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/posts/'))
+        self.assertNotIn('Server-Timing', APIClient().get('/api/posts/'))
+        self.assertEqual(len(profile_buffer.entries()), 2)
+
+        self.client.force_authenticate(self.staff)
+        self.assertIn('sql', self._timing(self.client.get('/api/posts/')))
+
+    def test_slow_requests_are_dumped(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                self.settings(REQUEST_PROFILING_DUMP_DIR=tmp, REQUEST_PROFILING_SLOW_MS=1):
+            self.client.get('/api/posts/')
+            dumps = os.listdir(tmp)
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith('.prof') and '_GET_api_posts_' in dumps[0])
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/posts/'))
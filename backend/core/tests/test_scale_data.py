@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from chat.models import ChatMessage, DirectThreadIndex, ThreadMembership
+from core.events import event_buffer
+from core.models import Follow, Post, PostTag, UserProfile
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ScaleDataTests(TestCase):
+    def tearDown(self):
+        event_buffer.flush()
+
+    def _generate(self, **options):
+        call_command(
+            'generate_scale_data', users=40, posts_per_user=3, follows_per_user=5, events_per_user=5,
+            threads_per_user=1, messages_per_thread=3, batch_size=16, stdout=StringIO(), **options,
+        )
+
+    def test_generate_scale_data(self):
+        self._generate()
+        profiles = UserProfile.objects.filter(user__username__startswith='scale_')
+        self.assertEqual(profiles.count(), 40)
+        self.assertTrue(Post.objects.filter(author__in=profiles).exists())
+        self.assertEqual(
+            PostTag.objects.count(),
+            sum(len(tags) for tags in Post.objects.values_list('tags', flat=True)),
+        )
+
+        # Denormalised counters match the generated follow rows
+        for profile in profiles.filter(followers_count__gt=0)[:5]:
+            self.assertEqual(profile.followers_count, Follow.objects.filter(followee=profile).count())
+
+        # Every DM thread is indexed, has both members and points them at its newest message
+        self.assertTrue(DirectThreadIndex.objects.exists())
+        for index in DirectThreadIndex.objects.all()[:5]:
+            memberships = ThreadMembership.objects.filter(thread=index.thread)
+            self.assertEqual(
+                set(memberships.values_list('profile_id', flat=True)),
+                {index.min_profile_id, index.max_profile_id},
+            )
+            newest = ChatMessage.objects.filter(thread=index.thread).order_by('-created_at', '-id').first()
+            self.assertTrue(all(m.last_message_id == newest.id for m in memberships))
+
+        # --clear removes a previous run with the same prefix
+        self._generate(clear=True)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='scale_').count(), 40)
+
+    def test_load_test_report(self):
+        self._generate()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            call_command('load_test', requests=40, concurrency=1, sessions=10, ws_clients=0,
+                         json_path=path, stdout=StringIO())
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(report['requests'], 40)
+        self.assertTrue(report['endpoints'])
+        for stats in report['endpoints'].values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from chat.models import ChatMessage, ChatThread, ThreadMembership
+
+User = get_user_model()
+
+
+class ThreadMembershipTests(TestCase):
+    def setUp(self):
+        self.owner, self.member, self.other = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('owner', 'member', 'other')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner.user)
+        response = self.client.post(
+            '/api/chat/threads/',
+            {'participants': [self.member.id, self.other.id], 'group_name': 'crew'},
+            format='json'
+        )
+        self.group = ChatThread.objects.get(pk=response.data['id'])
+
+    def test_creator_is_admin_member(self):
+        self.assertEqual(self.group.membership(self.owner).role, ThreadMembership.ROLE_ADMIN)
+        self.assertEqual(self.group.membership(self.member).role, ThreadMembership.ROLE_MEMBER)
+        self.assertEqual(set(self.group.participants.all()), {self.owner, self.member, self.other})
+
+    def test_promote_and_demote_update_role(self):
+        url = f'/api/chat/threads/{self.group.id}/'
+        self.client.post(url + 'promote-admin/', {'participant_id': self.member.id}, format='json')
+        self.assertTrue(self.group.is_admin(self.member))
+        admins = self.client.get(url).data['thread']['admins']
+        self.assertEqual({a['id'] for a in admins}, {self.owner.id, self.member.id})
+
+        self.client.post(url + 'demote-admin/', {'participant_id': self.member.id}, format='json')
+        self.assertFalse(self.group.is_admin(self.member))
+        response = self.client.post(url + 'demote-admin/', {'participant_id': self.member.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_hides_until_next_message(self):
+        member_client = APIClient()
+        member_client.force_authenticate(self.member.user)
+        self.client.post('/api/chat/messages/', {'thread': self.group.id, 'content': 'hi'}, format='json')
+
+        member_client.delete(f'/api/chat/threads/{self.group.id}/delete/')
+        self.assertTrue(self.group.membership(self.member).deleted)
+        inbox = member_client.get('/api/chat/threads/').data
+        self.assertNotIn(self.group.id, [t['id'] for t in inbox])
+
+        self.client.post('/api/chat/messages/', {'thread': self.group.id, 'content': 'come back'}, format='json')
+        membership = self.group.membership(self.member)
+        self.assertFalse(membership.deleted or membership.hidden)
+        inbox = member_client.get('/api/chat/threads/').data
+        self.assertIn(self.group.id, [t['id'] for t in inbox])
+
+    def test_inbox_reports_viewer_flags(self):
+        self.group.set_member_state(self.owner, muted=True)
+        inbox = self.client.get('/api/chat/threads/').data
+        row = next(t for t in inbox if t['id'] == self.group.id)
+        self.assertTrue(row['is_muted'])
+        self.assertFalse(row['is_pinned'])
+
+    def test_search_skips_deleted_threads(self):
+        response = self.client.get('/api/chat/search/', {'q': 'crew'})
+        self.assertEqual([t['id'] for t in response.data], [self.group.id])
+        self.group.set_member_state(self.owner, deleted=True)
+        response = self.client.get('/api/chat/search/', {'q': 'crew'})
+        self.assertEqual(response.data, [])
+
+    def test_re_added_member_does_not_see_history_from_before(self):
+        ChatMessage.objects.create(thread=self.group, sender=self.owner, content='before')
+        member_client = APIClient()
+        member_client.force_authenticate(self.member.user)
+        member_client.post(f'/api/chat/threads/{self.group.id}/leave/')
+        self.assertIsNone(self.group.membership(self.member))
+
+        self.client.post(f'/api/chat/threads/{self.group.id}/add-members/', {'participants': [self.member.id]}, format='json')
+        after = ChatMessage.objects.create(thread=self.group, sender=self.owner, content='after')
+        data = member_client.get(f'/api/chat/threads/{self.group.id}/').data
+        self.assertEqual([m['id'] for m in data['messages']], [after.id])
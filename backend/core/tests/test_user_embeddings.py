@@ -0,0 +1,92 @@
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import Post, UserTagVector
+from core.recommendations import get_hashtag_recommendations
+from core.user_embeddings import (
+    EMBEDDING_DIM, UserIndex, get_user_index, refresh_all_user_vectors, reset_user_index
+)
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, USER_INDEX_REFRESH_SECONDS=0)
+class UserEmbeddingTests(TestCase):
+    def setUp(self):
+        reset_user_index()
+        self.me, self.close, self.partial, self.stranger = [
+            User.objects.create_user(username=name, password='password123').userprofile
+            for name in ('me', 'close', 'partial', 'stranger')
+        ]
+        self._post(self.me, ['python', 'django', 'hiking'])
+        self._post(self.close, ['python', 'django'])
+        self._post(self.close, ['hiking'])
+        self._post(self.partial, ['python', 'cooking', 'baking', 'travel'])
+        self._post(self.stranger, ['football'])
+        refresh_all_user_vectors()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def tearDown(self):
+        reset_user_index()
+
+    def _post(self, author, tags):
+        return Post.objects.create(author=author, caption=' '.join(f'#{t}' for t in tags), tags=tags)
+
+    def test_vectors_are_compact_float32(self):
+        stored = UserTagVector.objects.get(profile=self.close)
+        self.assertEqual(len(bytes(stored.vector)), EMBEDDING_DIM * 4)
+
+    def test_discover_ranks_by_similarity(self):
+        response = self.client.get('/api/discover/')
+        self.assertEqual(response.status_code, 200)
+        ids = [r['id'] for r in response.data['results']]
+        # Nothing in common with the stranger, so they are not a match at all
+        self.assertEqual(ids, [self.close.id, self.partial.id])
+
+    def test_post_changes_refresh_the_index_incrementally(self):
+        index = get_user_index()
+        self.assertEqual(index.query(index_vector(self.stranger), k=1)[0][0], self.stranger.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(self.stranger, ['python', 'django', 'hiking'])
+        index = get_user_index()
+        scores = index.score(index_vector(self.me), [self.stranger.id])
+        self.assertGreater(scores[self.stranger.id], 0)
+
+    def test_only_tag_and_visibility_saves_refresh_the_author(self):
+        post = self._post(self.stranger, ['football'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.caption = 'edited'
+            post.save(update_fields=['caption'])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.is_public = False
+            post.save(update_fields=['is_public'])
+        self.assertEqual(len(callbacks), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.delete()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_hashtag_recommendations(self):
+        recommendations = get_hashtag_recommendations(self.me, k=5)
+        self.assertEqual(recommendations[0]['profile'], self.close)
+        self.assertNotIn(self.stranger, [r['profile'] for r in recommendations])
+
+    def test_lsh_finds_planted_neighbours(self):
+        rng = np.random.default_rng(0)
+        base = rng.standard_normal((3000, EMBEDDING_DIM)).astype(np.float32)
+        index = UserIndex()
+        index.load({pid: base[pid] for pid in range(len(base))})
+        query = base[1234] + rng.normal(0, 0.01, EMBEDDING_DIM).astype(np.float32)
+        results = index.query(query, k=5)
+        self.assertEqual(results[0][0], 1234)
+        # LSH narrowed the scan to a fraction of the users
+        self.assertLess(len(index._candidates(index._weigh(query))), len(base))
+
+
+def index_vector(profile):
+    return np.frombuffer(bytes(UserTagVector.objects.get(profile=profile).vector), dtype=np.float32)
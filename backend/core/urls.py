@@ -32,6 +32,7 @@ urlpatterns = [
     path('api/posts/<int:pk>/save/', views.PostSaveView.as_view(), name='post-save'),
     path('api/posts/saved/', views.SavedPostsView.as_view(), name='posts-saved'),
     path('api/posts/explore/', views.PostExploreView.as_view(), name='post-explore'),
+    path('api/posts/<int:pk>/similar/', views.SimilarPostsView.as_view(), name='post-similar'),
     path('api/posts/feed/', views.PostsFeedView.as_view(), name='posts-feed'),
     path('api/posts/following/', views.FollowingPostsView.as_view(), name='posts-following'),
     path('api/posts/user/', views.PostsFromUserView.as_view(), name='posts-from-user'),
@@ -47,17 +48,22 @@ urlpatterns = [
     
     # Events
     path('api/events/', views.EventCreate.as_view(), name='event-create'),
+    path('api/impressions/', views.ImpressionBatchView.as_view(), name='impressions'),
     
     # Recommendations
     path('api/recommendations/', views.RecommendationView.as_view(), name='recommendations'),
+    path('api/recommendations/users/', views.SuggestedUsersView.as_view(), name='recommendations-users'),
     path('api/discover/', views.DiscoverView.as_view(), name='discover'),
     path('api/trending-tags/', views.TrendingTagsView.as_view(), name='trending-tags'),
     path('api/debug/my-posts/', views.DebugMyPostsView.as_view(), name='debug-my-posts'),
+    path('api/internal/profiles/', views.RequestProfileListView.as_view(), name='internal-profiles'),
+    path('api/internal/metrics/', views.metrics_view, name='internal-metrics'),
     
     
     # Follow
     path('api/follow/<int:pk>/', views.FollowUser.as_view(), name='follow-user'),
     path('api/unfollow/<int:pk>/', views.UnfollowUser.as_view(), name='unfollow-user'),
+    path('api/relationships/', views.RelationshipStatusView.as_view(), name='relationships'),
     path('api/profiles/me/following/', views.GetFollowingUsersView.as_view(), name='me-following'),
     path('api/profiles/me/followers/', views.MeFollowersView.as_view(), name='me-followers'),
     path('api/following/users/', views.GetFollowingUsersView.as_view(), name='following-users'),
@@ -0,0 +1,263 @@
+# core/user_embeddings.py
+"""
+Similar-user search over hashtag vectors.
+
+Each user with public posts gets a UserTagVector row: their tags hashed into
+EMBEDDING_DIM buckets (feature hashing, so there is no vocabulary table),
+with sublinear term frequency, stored as float32 bytes. Rows are refreshed
+per author when their posts change (see core/signals.py).
+
+Every process keeps a UserIndex in memory:
+- vectors are IDF-weighted and L2-normalised, so a dot product is cosine similarity
+- random-projection LSH (LSH_TABLES tables of LSH_BITS bits, probing codes at
+  Hamming distance <= 1) picks candidates; they are re-ranked exactly
+- refresh() only loads rows updated since the last refresh; IDF is frozen at
+  the last full rebuild and recomputed once the population grows by a quarter
+- below BRUTE_FORCE_MAX users the index simply scans everything
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from .utils.tags import normalize_tag
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 256
+LSH_TABLES = 8
+LSH_BITS = 10
+BRUTE_FORCE_MAX = 2000
+# Rebuild IDF and every code once the index has grown by this factor
+IDF_REBUILD_GROWTH = 1.25
+
+
+def _bucket(tag):
+    """(index, sign) of a tag; stable across processes, unlike hash()"""
+    digest = int.from_bytes(hashlib.blake2b(tag.encode('utf-8'), digest_size=8).digest(), 'little')
+    return digest % EMBEDDING_DIM, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+def tag_vector(tag_counts):
+    """Raw (un-weighted) float32 vector for a Counter of normalised tags"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for tag, count in tag_counts.items():
+        if tag:
+            index, sign = _bucket(tag)
+            vector[index] += sign * (1.0 + math.log(count))
+    return vector
+
+
+def tag_counts(tag_lists):
+    """Counter of normalised tags over an iterable of Post.tags lists"""
+    counts = Counter()
+    for tags in tag_lists:
+        counts.update(t for t in (normalize_tag(t) for t in (tags or [])) if t)
+    return counts
+
+
+def refresh_user_vectors(profile_ids):
+    """Recompute the stored vectors of these profiles from their public posts (one read, one upsert)"""
+    from .models import Post, UserProfile, UserTagVector
+
+    # Authors deleted since the refresh was scheduled have nothing to store
+    profile_ids = list(UserProfile.objects.filter(id__in=list(profile_ids)).values_list('id', flat=True))
+    if not profile_ids:
+        return 0
+    tag_lists = {pid: [] for pid in profile_ids}
+    latest = {pid: None for pid in profile_ids}
+    rows = Post.objects.filter(author_id__in=profile_ids, is_public=True) \
+        .values_list('author_id', 'tags', 'created_at')
+    for author_id, tags, created_at in rows.iterator(chunk_size=2000):
+        tag_lists[author_id].append(tags)
+        if latest[author_id] is None or created_at > latest[author_id]:
+            latest[author_id] = created_at
+
+    # Users with no tagged posts keep a zero row, so indexes drop them on refresh
+    vectors = [
+        UserTagVector(
+            profile_id=pid, vector=tag_vector(tag_counts(tag_lists[pid])).tobytes(),
+            latest_post_at=latest[pid]
+        )
+        for pid in profile_ids
+    ]
+    UserTagVector.objects.bulk_create(
+        vectors, batch_size=500, update_conflicts=True,
+        unique_fields=['profile'], update_fields=['vector', 'latest_post_at', 'updated_at']
+    )
+    return len(vectors)
+
+
+def refresh_all_user_vectors(batch_size=500):
+    """Backfill vectors for every author of a public post"""
+    from .models import Post
+
+    author_ids = sorted(set(Post.objects.filter(is_public=True).values_list('author_id', flat=True)))
+    for start in range(0, len(author_ids), batch_size):
+        refresh_user_vectors(author_ids[start:start + batch_size])
+    return len(author_ids)
+
+
+class UserIndex:
+    def __init__(self, seed=42):
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((LSH_TABLES * LSH_BITS, EMBEDDING_DIM)).astype(np.float32)
+        self._bit_values = (1 << np.arange(LSH_BITS)).astype(np.int64)
+        self._lock = threading.Lock()
+        self._ids = []             # row -> profile id
+        self._rows = {}            # profile id -> row
+        self._raw = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._unit = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._codes = np.zeros((0, LSH_TABLES), dtype=np.int64)
+        self._buckets = [dict() for _ in range(LSH_TABLES)]  # code -> set of rows
+        self._idf = np.ones(EMBEDDING_DIM, dtype=np.float32)
+        self._idf_population = 0
+        self._loaded_through = None
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _weigh(self, raw):
+        weighted = raw * self._idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return np.divide(weighted, norms, out=np.zeros_like(weighted), where=norms > 0)
+
+    def _hash(self, unit):
+        bits = (unit @ self._planes.T > 0).reshape(len(unit), LSH_TABLES, LSH_BITS)
+        return bits.astype(np.int64) @ self._bit_values
+
+    def _place(self, rows):
+        for row in rows:
+            for table, code in enumerate(self._codes[row]):
+                self._buckets[table].get(int(code), set()).discard(row)
+        self._unit[rows] = self._weigh(self._raw[rows])
+        self._codes[rows] = self._hash(self._unit[rows])
+        for row in rows:
+            if not self._unit[row].any():
+                continue
+            for table, code in enumerate(self._codes[row]):
+                self._buckets[table].setdefault(int(code), set()).add(row)
+
+    def _rebuild(self):
+        population = int(self._raw.any(axis=1).sum())
+        doc_freq = (self._raw != 0).sum(axis=0)
+        self._idf = (np.log((1 + population) / (1 + doc_freq)) + 1).astype(np.float32)
+        self._idf_population = population
+        self._buckets = [dict() for _ in range(LSH_TABLES)]
+        self._codes = np.zeros((len(self._ids), LSH_TABLES), dtype=np.int64)
+        self._place(np.arange(len(self._ids)))
+
+    def load(self, vectors):
+        """Add or replace rows from {profile_id: raw float32 vector}"""
+        if not vectors:
+            return
+        with self._lock:
+            new_ids = [pid for pid in vectors if pid not in self._rows]
+            if new_ids:
+                for pid in new_ids:
+                    self._rows[pid] = len(self._ids)
+                    self._ids.append(pid)
+                grow = len(new_ids)
+                self._raw = np.vstack([self._raw, np.zeros((grow, EMBEDDING_DIM), dtype=np.float32)])
+                self._unit = np.vstack([self._unit, np.zeros((grow, EMBEDDING_DIM), dtype=np.float32)])
+                self._codes = np.vstack([self._codes, np.zeros((grow, LSH_TABLES), dtype=np.int64)])
+            rows = np.array([self._rows[pid] for pid in vectors])
+            self._raw[rows] = np.stack(list(vectors.values()))
+            if len(self._ids) >= self._idf_population * IDF_REBUILD_GROWTH:
+                self._rebuild()
+            else:
+                # Existing rows keep their codes; only changed ones are re-hashed
+                self._place(rows)
+
+    def refresh(self):
+        """Load vectors written since the last refresh from the database"""
+        from .models import UserTagVector
+
+        rows = UserTagVector.objects.all()
+        if self._loaded_through is not None:
+            rows = rows.filter(updated_at__gte=self._loaded_through)
+        through = rows.aggregate(latest=Max('updated_at'))['latest']
+        vectors = {
+            pid: np.frombuffer(bytes(vector), dtype=np.float32)
+            for pid, vector in rows.values_list('profile_id', 'vector').iterator(chunk_size=2000)
+        }
+        self.load(vectors)
+        if through is not None:
+            self._loaded_through = through
+        self.refreshed_at = time.monotonic()
+        return len(vectors)
+
+    def _candidates(self, unit):
+        if len(self._ids) <= BRUTE_FORCE_MAX:
+            return np.arange(len(self._ids))
+        codes = self._hash(unit[None, :])[0]
+        probes = [0] + [1 << bit for bit in range(LSH_BITS)]
+        found = set()
+        for table, code in enumerate(codes):
+            buckets = self._buckets[table]
+            for flip in probes:
+                found.update(buckets.get(int(code) ^ flip, ()))
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def query(self, raw, k=50, exclude=()):
+        """[(profile_id, cosine)] of the k most similar users to a raw tag vector, best first"""
+        with self._lock:
+            unit = self._weigh(np.asarray(raw, dtype=np.float32))
+            if not unit.any() or not self._ids:
+                return []
+            rows = self._candidates(unit)
+            if not len(rows):
+                return []
+            scores = self._unit[rows] @ unit
+            if len(rows) > k + len(exclude):
+                top = np.argpartition(-scores, k + len(exclude))[:k + len(exclude)]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            results = []
+            for i in order:
+                pid = self._ids[rows[i]]
+                if scores[i] <= 0 or pid in exclude:
+                    continue
+                results.append((pid, float(scores[i])))
+                if len(results) == k:
+                    break
+            return results
+
+    def score(self, raw, profile_ids):
+        """{profile_id: cosine} for specific users (e.g. search results); users without a vector score 0"""
+        with self._lock:
+            unit = self._weigh(np.asarray(raw, dtype=np.float32))
+            return {
+                pid: float(self._unit[self._rows[pid]] @ unit) if pid in self._rows else 0.0
+                for pid in profile_ids
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_user_index():
+    """This process's index, refreshed at most every USER_INDEX_REFRESH_SECONDS"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = UserIndex()
+            _index.refresh()
+        elif time.monotonic() - _index.refreshed_at >= settings.USER_INDEX_REFRESH_SECONDS:
+            _index.refresh()
+        return _index
+
+
+def reset_user_index():
+    """Drop this process's index (tests, or after a bulk backfill)"""
+    global _index
+    with _index_lock:
+        _index = None
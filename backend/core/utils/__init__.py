@@ -6,11 +6,18 @@ Utility functions for the core app
 from .avatar_utils import (
     generate_default_avatar_url,
     get_avatar_url_from_profile,
+    resolve_default_avatar_url,
+    storable_default_avatar_url,
     ensure_avatar_for_profile
 )
+from .media_urls import media_url, get_variant_urls
 
 __all__ = [
     'generate_default_avatar_url',
     'get_avatar_url_from_profile',
+    'resolve_default_avatar_url',
+    'storable_default_avatar_url',
     'ensure_avatar_for_profile',
+    'media_url',
+    'get_variant_urls',
 ]
@@ -0,0 +1,105 @@
+# core/utils/avatar_renderer.py
+"""
+Deterministic identicon avatars rendered locally.
+
+An avatar is fully described by the SHA-256 digest of its seed (usually the
+username), so URLs can be built without touching disk and the image itself is
+rendered in memory by the media view whenever a client asks for it.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from io import BytesIO
+
+# Default avatars live here under MEDIA_ROOT; names never change content
+DEFAULT_AVATAR_DIR = 'avatars/default/'
+DEFAULT_AVATAR_RE = re.compile(r'^avatars/default/([0-9a-f]{32})\.(svg|png)$')
+
+GRID = 5
+# Same pastel backgrounds the old dicebear URLs asked for
+BACKGROUNDS = ['#b6e3f4', '#c0aede', '#d1d4f9']
+
+
+@lru_cache(maxsize=50000)
+def avatar_digest(seed):
+    """32-hex-char digest identifying the avatar for a seed"""
+    return hashlib.sha256(seed.encode('utf-8')).hexdigest()[:32]
+
+
+def avatar_name(seed, fmt='svg'):
+    """Storage name (relative to MEDIA_ROOT) of a seed's default avatar"""
+    return f'{DEFAULT_AVATAR_DIR}{avatar_digest(seed)}.{fmt}'
+
+
+def _layout(digest):
+    """Return (foreground hex colour, background hex colour, set of filled (row, col) cells)"""
+    value = int(digest, 16)
+    hue = value % 360
+    saturation = 45 + (value >> 9) % 25
+    lightness = 40 + (value >> 17) % 15
+    foreground = _hsl_to_hex(hue, saturation, lightness)
+    background = BACKGROUNDS[(value >> 25) % len(BACKGROUNDS)]
+
+    # Mirror the left half onto the right for a symmetric pattern
+    bits = value >> 32
+    cells = set()
+    half = (GRID + 1) // 2
+    for row in range(GRID):
+        for col in range(half):
+            if bits & 1:
+                cells.add((row, col))
+                cells.add((row, GRID - 1 - col))
+            bits >>= 1
+    return foreground, background, cells
+
+
+def _hsl_to_hex(h, s, l):
+    s /= 100.0
+    l /= 100.0
+    c = (1 - abs(2 * l - 1)) * s
+    x = c * (1 - abs((h / 60.0) % 2 - 1))
+    m = l - c / 2
+    r, g, b = [
+        (c, x, 0), (x, c, 0), (0, c, x), (0, x, c), (x, 0, c), (c, 0, x)
+    ][int(h // 60) % 6]
+    return '#{:02x}{:02x}{:02x}'.format(*(int(round((v + m) * 255)) for v in (r, g, b)))
+
+
+def render_svg(digest):
+    foreground, background, cells = _layout(digest)
+    size = GRID + 1  # half-cell margin on each side
+    rects = ''.join(
+        f'<rect x="{col + 0.5}" y="{row + 0.5}" width="1" height="1"/>'
+        for row, col in sorted(cells)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="{background}"/>'
+        f'<g fill="{foreground}">{rects}</g></svg>'
+    ).encode('utf-8')
+
+
+def render_png(digest, size=240):
+    from PIL import Image, ImageDraw
+
+    foreground, background, cells = _layout(digest)
+    cell = size / (GRID + 1)
+    img = Image.new('RGB', (size, size), background)
+    draw = ImageDraw.Draw(img)
+    for row, col in cells:
+        x = (col + 0.5) * cell
+        y = (row + 0.5) * cell
+        draw.rectangle([x, y, x + cell - 1, y + cell - 1], fill=foreground)
+    out = BytesIO()
+    img.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+
+@lru_cache(maxsize=1024)
+def render_default_avatar(name):
+    """Render the avatar for a storage name, or return None if it is not a default-avatar name"""
+    match = DEFAULT_AVATAR_RE.match(name)
+    if not match:
+        return None
+    digest, fmt = match.groups()
+    return render_svg(digest) if fmt == 'svg' else render_png(digest)
@@ -2,43 +2,62 @@
 """
 Avatar utility functions for consistent avatar handling across the application
 """
-import hashlib
+from urllib.parse import urlparse, parse_qs
 
+from django.conf import settings
 
-def generate_default_avatar_url(username, seed=None):
+from .avatar_renderer import DEFAULT_AVATAR_DIR, avatar_name
+
+LEGACY_AVATAR_HOST = 'api.dicebear.com'
+
+
+def generate_default_avatar_url(username, seed=None, request=None):
     """
-    Generate a consistent default avatar URL using dicebear API
+    Generate a consistent default avatar URL
+    
+    The avatar is a locally rendered identicon (see avatar_renderer); building
+    the URL is a cached hash lookup and never touches disk or the network.
     
     Args:
         username: User's username
         seed: Optional seed for consistent avatar generation (defaults to username)
+        request: Optional Django request object for building absolute URIs
     
     Returns:
-        str: Full URL to dicebear avatar
+        str: URL of the avatar under MEDIA_URL
     """
-    if not seed:
-        seed = username
-    
-    # Use a variety of dicebear styles and options for diverse avatars
-    styles = [
-        'avataaars',
-        'big-smile',
-        'bottts',
-        'fun-emoji',
-        'pixel-art',
-        'thumbs'
-    ]
-    
-    # Hash username to consistently select a style
-    username_hash = int(hashlib.md5(username.encode()).hexdigest(), 16)
-    style = styles[username_hash % len(styles)]
-    
-    # Additional styling options for avataaars style
-    if style == 'avataaars':
-        return f"https://api.dicebear.com/7.x/{style}/svg?seed={seed}&mouth=smile&eyes=happy&backgroundColor=b6e3f4,c0aede,d1d4f9"
-    
-    # For other styles, use basic config
-    return f"https://api.dicebear.com/7.x/{style}/svg?seed={seed}&backgroundColor=b6e3f4,c0aede,d1d4f9"
+    url = f"{settings.MEDIA_URL}{avatar_name(seed or username)}"
+    return request.build_absolute_uri(url) if request else url
+
+
+def resolve_default_avatar_url(url, username, request=None):
+    """
+    Map a stored default_avatar_url to the URL clients should load.
+    Legacy dicebear URLs are replaced by the local avatar for the same seed.
+    """
+    if not url:
+        return generate_default_avatar_url(username, request=request)
+    parsed = urlparse(url)
+    if parsed.netloc == LEGACY_AVATAR_HOST:
+        seed = parse_qs(parsed.query).get('seed', [username])[0]
+        return generate_default_avatar_url(username, seed=seed, request=request)
+    if request and url.startswith('/'):
+        return request.build_absolute_uri(url)
+    return url
+
+
+def storable_default_avatar_url(url):
+    """
+    Value to keep in UserProfile.default_avatar_url for a URL a client sent
+    back (e.g. picked from DefaultAvatarListView): our own default avatars are
+    stored as their relative media path, so the host is added per request.
+    """
+    if not url:
+        return url
+    path = urlparse(url).path
+    if path.startswith(f"{settings.MEDIA_URL}{DEFAULT_AVATAR_DIR}"):
+        return path
+    return url
 
 
 def get_avatar_url_from_profile(profile, request=None):
@@ -48,7 +67,7 @@ def get_avatar_url_from_profile(profile, request=None):
     Priority:
     1. Custom uploaded avatar (if exists)
     2. default_avatar_url (if set)
-    3. Generated dicebear avatar
+    3. Generated identicon avatar
     
     Args:
         profile: UserProfile instance
@@ -68,11 +87,8 @@ def get_avatar_url_from_profile(profile, request=None):
             pass
     
     # Priority 2: User-selected default avatar URL
-    if profile.default_avatar_url:
-        return profile.default_avatar_url
-    
     # Priority 3: Generate default avatar
-    return generate_default_avatar_url(profile.user.username)
+    return resolve_default_avatar_url(profile.default_avatar_url, profile.user.username, request)
 
 
 def ensure_avatar_for_profile(profile, save=True):
@@ -0,0 +1,134 @@
+# core/utils/media_processing.py
+"""
+CPU-bound media processing functions.
+
+Everything here runs inside the background process pool (see core/background.py),
+so functions must stay picklable and must not touch Django settings or the ORM:
+they take file paths in and return plain data out.
+"""
+import json
+import shutil
+import subprocess
+import wave
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+# name -> bounding box for generated thumbnails
+THUMBNAIL_SIZES = {
+    'sm': (150, 150),
+    'md': (300, 300),
+    'lg': (720, 720),
+}
+
+# Maximum accepted dimensions (matches core.validators.validate_image_file)
+MAX_IMAGE_DIMENSION = 8000
+
+
+def get_output_formats():
+    """Formats to transcode thumbnails into; AVIF only if this Pillow build supports it"""
+    formats = ['webp']
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+
+def _flatten_alpha(img):
+    """Convert RGBA/LA/P images to RGB on a white background"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _encode(img, fmt, quality=80):
+    out = BytesIO()
+    img.save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue()
+
+
+def process_image(path, sizes=None, formats=None):
+    """
+    Verify, orient and strip an image, then build thumbnails.
+
+    Returns a dict with:
+        width, height: dimensions of the (EXIF-oriented) original
+        stripped: re-encoded original without metadata, or None if it had none
+        variants: {size_name: {format: bytes}}
+
+    Raises ValueError if the file is not a valid image.
+    """
+    sizes = sizes or THUMBNAIL_SIZES
+    formats = formats or get_output_formats()
+
+    try:
+        with Image.open(path) as probe:
+            probe.verify()
+    except Exception as e:
+        raise ValueError(f'Invalid or corrupted image file: {e}')
+
+    with Image.open(path) as img:
+        if img.width > MAX_IMAGE_DIMENSION or img.height > MAX_IMAGE_DIMENSION:
+            raise ValueError('Image dimensions too large')
+
+        original_format = img.format or 'PNG'
+        has_metadata = bool(img.info.get('exif')) or bool(img.getexif())
+
+        # Animated GIFs keep their frames; only the first frame is thumbnailed
+        img.seek(0)
+        oriented = ImageOps.exif_transpose(img)
+
+        stripped = None
+        if has_metadata and original_format in ('JPEG', 'PNG', 'WEBP'):
+            clean = oriented if original_format != 'JPEG' else _flatten_alpha(oriented)
+            out = BytesIO()
+            save_kwargs = {'quality': 90} if original_format in ('JPEG', 'WEBP') else {}
+            clean.save(out, format=original_format, **save_kwargs)
+            stripped = out.getvalue()
+
+        base = _flatten_alpha(oriented)
+        variants = {}
+        for name, box in sizes.items():
+            thumb = base.copy()
+            thumb.thumbnail(box, Image.Resampling.LANCZOS)
+            variants[name] = {fmt: _encode(thumb, fmt) for fmt in formats}
+
+        return {
+            'width': oriented.width,
+            'height': oriented.height,
+            'stripped': stripped,
+            'variants': variants,
+        }
+
+
+def probe_duration(path):
+    """
+    Return the duration of an audio/video file in whole seconds, or None if unknown.
+    WAV is read natively; other containers need ffprobe on the PATH.
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            frames = wav.getnframes()
+            rate = wav.getframerate()
+            if rate:
+                return int(round(frames / float(rate)))
+    except (wave.Error, EOFError, OSError):
+        pass
+
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+            capture_output=True, timeout=30, check=True
+        )
+        duration = json.loads(result.stdout or b'{}').get('format', {}).get('duration')
+        return int(round(float(duration))) if duration else None
+    except (subprocess.SubprocessError, ValueError, OSError):
+        return None
@@ -0,0 +1,18 @@
+# core/utils/media_urls.py
+"""
+URLs for stored media and the thumbnails the media pipeline derives from it
+"""
+
+
+def media_url(storage, name, request=None):
+    """URL for a stored file, absolute when a request is available"""
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def get_variant_urls(field_file, variants, request=None):
+    """Map {size: {format: storage name}} to {size: {format: url}}"""
+    return {
+        size: {fmt: media_url(field_file.storage, name, request) for fmt, name in formats.items()}
+        for size, formats in (variants or {}).items()
+    }
@@ -0,0 +1,176 @@
+# core/utils/tags.py
+"""
+Hashtag parsing and normalisation, and the Tag/PostTag index.
+
+Post.tags keeps the normalised list for display; every query that filters
+or counts by tag goes through PostTag (post, tag) rows instead, which
+sync_post_tags keeps in step on each post save and backfill_post_tags
+fills for older posts.
+"""
+import base64
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+HASHTAG_RE = re.compile(r"#(\w+)")
+MAX_TAGS_PER_POST = 15
+MAX_TAG_LENGTH = 100
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def normalize_tag(tag):
+    """'#Foo Bar ' -> 'foobar'; '' for anything that is not a usable tag"""
+    if not isinstance(tag, str):
+        return ''
+    return ''.join(tag.lstrip('#').lower().split())[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(tags, limit=MAX_TAGS_PER_POST):
+    """Normalised, de-duplicated (first occurrence wins) and capped list of tags"""
+    normalized = [normalize_tag(tag) for tag in tags or []]
+    return list(dict.fromkeys(t for t in normalized if t))[:limit]
+
+
+def extract_hashtags(text):
+    """#hashtags written in a caption or comment, in order"""
+    return HASHTAG_RE.findall(text or '')
+
+
+def tags_for_post(tags, text=''):
+    """The tags a post is saved with: explicit tags, else the hashtags in its text"""
+    return normalize_tags(tags or extract_hashtags(text))
+
+
+def extract_post_tags(rows):
+    """
+    [(post_id, text)] -> [(post_id, tags)] for the posts whose text has
+    hashtags. Pure and picklable: the hashtag backfill runs it in a process pool.
+    """
+    extracted = []
+    for post_id, text in rows:
+        tags = normalize_tags(HASHTAG_RE.findall(text or ''))
+        if tags:
+            extracted.append((post_id, tags))
+    return extracted
+
+
+def ensure_tags(names):
+    """{name: tag id} for normalised names, creating missing Tag rows (two queries)"""
+    from ..models import Tag
+
+    names = set(names)
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def sync_post_tags(post):
+    """Make post's PostTag rows match post.tags (and its visibility)"""
+    from ..models import PostTag
+
+    tag_ids = ensure_tags(normalize_tags(post.tags))
+    current = dict(PostTag.objects.filter(post=post).values_list('tag_id', 'is_public'))
+    wanted = set(tag_ids.values())
+
+    stale = set(current) - wanted
+    if stale:
+        PostTag.objects.filter(post=post, tag_id__in=stale).delete()
+    PostTag.objects.bulk_create(
+        [
+            PostTag(post=post, tag_id=tag_id, created_at=post.created_at, is_public=post.is_public)
+            for tag_id in wanted - set(current)
+        ],
+        ignore_conflicts=True,
+    )
+    if any(current[tag_id] != post.is_public for tag_id in wanted & set(current)):
+        PostTag.objects.filter(post=post).update(is_public=post.is_public)
+
+
+def replace_post_tags(per_post):
+    """
+    Rewrite the PostTag rows of many posts at once, for writes that bypass
+    save() (bulk_update). per_post is [(post_id, tags, created_at, is_public)].
+    """
+    from ..models import PostTag
+
+    if not per_post:
+        return 0
+    tag_ids = ensure_tags(name for _, names, _, _ in per_post for name in names)
+    PostTag.objects.filter(post_id__in=[post_id for post_id, _, _, _ in per_post]).delete()
+    rows = [
+        PostTag(post_id=post_id, tag_id=tag_ids[name], created_at=created_at, is_public=is_public)
+        for post_id, names, created_at, is_public in per_post
+        for name in normalize_tags(names)
+    ]
+    PostTag.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def backfill_post_tags(batch_size=2000):
+    """Create PostTag rows for every post, batch_size posts at a time. Returns rows written."""
+    from ..models import Post, PostTag
+
+    written = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'tags', 'created_at', 'is_public')[:batch_size]
+        )
+        if not batch:
+            return written
+        last_id = batch[-1][0]
+        per_post = [(post_id, normalize_tags(tags), created_at, is_public)
+                    for post_id, tags, created_at, is_public in batch]
+        tag_ids = ensure_tags(name for _, names, _, _ in per_post for name in names)
+        rows = [
+            PostTag(post_id=post_id, tag_id=tag_ids[name], created_at=created_at, is_public=is_public)
+            for post_id, names, created_at, is_public in per_post
+            for name in names
+        ]
+        PostTag.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        written += len(rows)
+
+
+def encode_cursor(created_at, post_id):
+    """Opaque keyset cursor for the position just after (created_at, post_id)"""
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f'{micros}:{post_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, post_id) from encode_cursor; ValueError if it was tampered with"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        micros, post_id = raw.split(':')
+        post_id = int(post_id)
+        if not 0 < post_id < 2 ** 63:
+            raise ValueError('post id out of range')
+        return _EPOCH + timedelta(microseconds=int(micros)), post_id
+    except (TypeError, ValueError, OverflowError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def tag_page(tag, limit, cursor=None, exclude_author_ids=()):
+    """
+    Newest-first post ids carrying a tag, read along the PostTag
+    (tag, -created_at, -post) index. Returns (post_ids, next_cursor);
+    next_cursor is None on the last page. Every matching post is reachable,
+    however old, and each page costs O(limit).
+    """
+    from ..models import PostTag, Tag
+
+    tag_id = Tag.objects.filter(name=normalize_tag(tag)).values_list('id', flat=True).first()
+    if tag_id is None:
+        return [], None
+    rows = PostTag.objects.filter(tag_id=tag_id)
+    if exclude_author_ids:
+        rows = rows.exclude(post__author_id__in=exclude_author_ids)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        rows = rows.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lt=post_id))
+    page = list(rows.order_by('-created_at', '-post_id').values_list('post_id', 'created_at')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1][1], page[limit - 1][0]) if len(page) > limit else None
+    return [post_id for post_id, _ in page[:limit]], next_cursor
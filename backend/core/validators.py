@@ -18,12 +18,24 @@ MAX_DOCUMENT_SIZE = 25 * 1024 * 1024  # 25MB
 # Allowed file types
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
 ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/webm', 'video/quicktime', 'video/x-msvideo']
-ALLOWED_AUDIO_TYPES = ['audio/mpeg', 'audio/wav', 'audio/ogg', 'audio/webm', 'audio/mp4']
+ALLOWED_AUDIO_TYPES = ['audio/mpeg', 'audio/wav', 'audio/x-wav', 'audio/ogg', 'audio/webm', 'audio/mp4']
 ALLOWED_DOCUMENT_TYPES = ['application/pdf', 'application/msword', 
                           'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
                           'text/plain']
 
 
+# Size limit per attachment category (used for incremental checks on chunked uploads)
+MAX_SIZE_BY_TYPE = {
+    'image': MAX_IMAGE_SIZE,
+    'video': MAX_VIDEO_SIZE,
+    'audio': MAX_AUDIO_SIZE,
+    'document': MAX_DOCUMENT_SIZE,
+}
+
+# Bytes needed from the start of a file to identify its type
+SNIFF_BYTES = 512
+
+
 def sanitize_filename(filename):
     """Remove dangerous characters from filename"""
     # Keep only alphanumeric, dots, dashes, underscores
@@ -49,8 +61,12 @@ def validate_file_size(file, max_size, file_type_name):
         raise ValidationError(f'{file_type_name} file too large. Maximum size is {max_mb}MB.')
 
 
-def validate_image_file(file):
-    """Validate image file type and size"""
+def validate_image_file(file, deep=True):
+    """
+    Validate image file type and size.
+    With deep=False the Pillow verification is skipped; callers must verify
+    the image later (e.g. in the background media pipeline).
+    """
     # Check MIME type
     mime_type = get_safe_mime_type(file)
     if mime_type not in ALLOWED_IMAGE_TYPES:
@@ -59,6 +75,9 @@ def validate_image_file(file):
     # Check file size
     validate_file_size(file, MAX_IMAGE_SIZE, 'Image')
     
+    if not deep:
+        return True
+    
     # Verify it's actually an image using Pillow
     try:
         img = Image.open(file)
@@ -151,8 +170,11 @@ def get_file_type(filename):
         return None
 
 
-def validate_chat_attachment(file):
-    """Main validation function for chat attachments"""
+def validate_chat_attachment(file, deep=True):
+    """
+    Main validation function for chat attachments.
+    Pass deep=False on request paths to skip image decoding.
+    """
     # Use legacy filename check for initial dispatch, but validators use safe check
     file_type = get_file_type(file.name)
     
@@ -161,7 +183,7 @@ def validate_chat_attachment(file):
     
     # Validate based on type
     if file_type == 'image':
-        validate_image_file(file)
+        validate_image_file(file, deep=deep)
     elif file_type == 'video':
         validate_video_file(file)
     elif file_type == 'audio':
@@ -171,3 +193,85 @@ def validate_chat_attachment(file):
     
     file.seek(0)
     return file_type
+
+
+def sniff_mime_type(header):
+    """
+    Identify a file's MIME type from its leading bytes (magic numbers).
+    Returns None when the content matches no allowed type.
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if header[:4] == b'RIFF':
+        kind = header[8:12]
+        if kind == b'WEBP':
+            return 'image/webp'
+        if kind == b'WAVE':
+            return 'audio/wav'
+        if kind == b'AVI ':
+            return 'video/x-msvideo'
+    if header[4:8] == b'ftyp':
+        brand = header[8:12]
+        if brand == b'qt  ':
+            return 'video/quicktime'
+        if brand in (b'M4A ', b'M4B '):
+            return 'audio/mp4'
+        return 'video/mp4'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    if header.startswith(b'OggS'):
+        return 'audio/ogg'
+    if header.startswith(b'ID3') or header[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'audio/mpeg'
+    if header.startswith(b'%PDF'):
+        return 'application/pdf'
+    if header.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'application/msword'
+    if header.startswith(b'PK\x03\x04'):
+        return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    if header and b'\x00' not in header:
+        try:
+            header.decode('utf-8')
+            return 'text/plain'
+        except UnicodeDecodeError:
+            # The sniff window may split a multi-byte character
+            try:
+                header[:-3].decode('utf-8')
+                return 'text/plain'
+            except UnicodeDecodeError:
+                pass
+    return None
+
+
+def validate_sniffed_type(header, file_type):
+    """
+    Check that a file's content matches the category declared by its name.
+    WebM containers are accepted for both audio and video.
+    """
+    mime_type = sniff_mime_type(header)
+    if mime_type == 'video/webm' and file_type == 'audio':
+        mime_type = 'audio/webm'
+
+    allowed = {
+        'image': ALLOWED_IMAGE_TYPES,
+        'video': ALLOWED_VIDEO_TYPES,
+        'audio': ALLOWED_AUDIO_TYPES,
+        'document': ALLOWED_DOCUMENT_TYPES,
+    }.get(file_type, [])
+    if mime_type not in allowed:
+        raise ValidationError('File content does not match its type')
+    return mime_type
+
+
+def validate_upload_size(file_type, size):
+    """Raise if size exceeds the limit for the attachment category"""
+    max_size = MAX_SIZE_BY_TYPE.get(file_type)
+    if max_size is None:
+        raise ValidationError('Unsupported file type')
+    if size > max_size:
+        max_mb = max_size / (1024 * 1024)
+        raise ValidationError(f'{file_type.capitalize()} file too large. Maximum size is {max_mb}MB.')
@@ -1,14 +1,16 @@
 
 # core/views.py
+import hmac
 import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.urls import reverse
-from django.http import HttpResponseRedirect, JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth import login as auth_login, logout as auth_logout
 from django.contrib.auth import get_user_model
 from django.db.models import Q, Count, Prefetch
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, views, response, permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
@@ -18,7 +20,7 @@ from rest_framework import serializers  # Needed for SharedPostSerializer
 from django.contrib.auth.models import User  
 from .models import (
     UserProfile, Post, UserEvent, Comment,
-    Follow, Notification, SharedPost
+    Follow, Notification, SharedPost, PostTag
 )
 from .serializers import (
     UserProfileSerializer, PostSerializer,
@@ -27,6 +29,19 @@ from .serializers import (
 )
 from .security.encryption import decrypt_text
 from .services.post_service import PostService
+from .services.media_service import MediaService
+from .services.follow_service import FollowService
+from .services.relationship_service import RelationshipService, RELATIONSHIP_BITS, MAX_RELATIONSHIP_IDS
+from .services.similarity_service import PostSimilarityService
+from .events import MAX_IMPRESSION_BATCH, record_impressions, record_view
+from .user_embeddings import get_user_index, tag_counts, tag_vector
+from .utils.tags import normalize_tags, tag_page, tags_for_post
+from .recommendation_snapshots import is_stale, read_snapshot
+from .profiling import profile_buffer
+from . import metrics
+from .utils.avatar_utils import (
+    generate_default_avatar_url, get_avatar_url_from_profile, storable_default_avatar_url
+)
 
 import logging
 from django.shortcuts import render
@@ -203,10 +218,7 @@ def login_view(request):
             avatar_url = None
             try:
                 profile = user.userprofile
-                if profile.avatar:
-                    avatar_url = request.build_absolute_uri(profile.avatar.url)
-                else:
-                    avatar_url = profile.default_avatar_url
+                avatar_url = get_avatar_url_from_profile(profile, request)
             except Exception:
                 pass
 
@@ -448,10 +460,15 @@ class MeProfileView(views.APIView):
         if not profile:
              return response.Response(status=status.HTTP_401_UNAUTHORIZED)
              
+        # Only the columns changed here are written: followers_count and
+        # following_count are updated concurrently with F() by FollowService
+        changed = set()
+
         # Support both multipart (file upload) and JSON (fields update)
         if 'avatar' in request.FILES:
             profile.avatar = request.FILES['avatar']
             profile.default_avatar_url = None # Clear default if custom uploaded
+            changed.update(['avatar', 'default_avatar_url'])
             
         data = request.data
         
@@ -467,23 +484,33 @@ class MeProfileView(views.APIView):
                 request.user.username = new_username
                 request.user.save()
 
-        if 'bio' in data: profile.bio = data['bio']
-        if 'nickname' in data: profile.nickname = data['nickname']
-        if 'is_private' in data: profile.is_private = str(data['is_private']).lower() == 'true'
+        if 'bio' in data:
+            profile.bio = data['bio']
+            changed.add('bio')
+        if 'nickname' in data:
+            profile.nickname = data['nickname']
+            changed.add('nickname')
+        if 'is_private' in data:
+            profile.is_private = str(data['is_private']).lower() == 'true'
+            changed.add('is_private')
         if 'interests' in data:
             try:
-                profile.interests = data['interests'] if isinstance(data['interests'], list) else []
+                profile.interests = normalize_tags(data['interests'], limit=50) if isinstance(data['interests'], list) else []
+                changed.add('interests')
             except: pass
             
         if 'default_avatar_url' in data:
-            profile.default_avatar_url = data['default_avatar_url']
+            profile.default_avatar_url = storable_default_avatar_url(data['default_avatar_url'])
+            changed.add('default_avatar_url')
             # If they choose a default, they might want to clear their custom one
             # or we just keep it and let the serializer/frontend handle priorities.
             # Usually setting default_avatar_url means "use this instead of my photo"
             if data['default_avatar_url']:
                 profile.avatar = None
-            
-        profile.save()
+                changed.add('avatar')
+
+        if changed:
+            profile.save(update_fields=sorted(changed))
         serializer = UserProfileSerializer(profile, context={'request': request})
         return response.Response(serializer.data)
 
@@ -572,29 +599,15 @@ class PostList(generics.ListCreateAPIView):
             except Exception as e:
                 logger.warning(f"Error parsing tags: {e}")
         
-        # Extract from content if empty
+        # Explicit tags, else the #hashtags in the text; normalised and capped
         content = serializer.validated_data.get('content', '')
         caption = serializer.validated_data.get('caption', '')
-        text = caption or content
-        
-        if not tags and text:
-            import re
-            regex_tags = re.findall(r"#(\w+)", text)
-            tags.extend(regex_tags)
-        
-        # Clean tags: remove #, convert to lowercase, strip whitespace, remove empty
-        tags = [
-            tag.lstrip('#').lower().strip().replace(' ', '').replace('\t', '').replace('\n', '')
-            for tag in tags 
-            if tag and tag.strip()
-        ]
-        # Remove duplicates and limit to 15 tags
-        tags = list(dict.fromkeys(tags))[:15]  # dict.fromkeys preserves order while removing duplicates
-        # Filter out any empty strings that might have resulted from cleaning
-        tags = [t for t in tags if t]
+        tags = tags_for_post(tags, caption or content)
         
         # Save with author and tags
-        serializer.save(author=profile, tags=tags)
+        post = serializer.save(author=profile, tags=tags)
+        if post.image:
+            transaction.on_commit(lambda: MediaService.enqueue_post_image(post.id))
 
 class GetFollowingUsersView(views.APIView):
     """Get list of users that current user follows (for sharing)"""
@@ -701,7 +714,7 @@ class SharePostWithUsersView(views.APIView):
         message = request.data.get('message', '')
         
         try:
-            result = PostService.share_post_with_users(profile, pk, user_ids, message)
+            result = PostService.share_post_with_users(profile, pk, user_ids, message, request=request)
             return response.Response(result)
         except ValidationError as e:
             return response.Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -956,6 +969,11 @@ class MyCommentsView(generics.ListAPIView):
 
 
 # In core/views.py, replace the PostExploreView class:
+# Posts per tag page in explore (?tag=...&cursor=...)
+TAG_PAGE_SIZE = 200
+MAX_TAG_PAGE_SIZE = 500
+
+
 class PostExploreView(views.APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -973,19 +991,24 @@ class PostExploreView(views.APIView):
         
         # Exclude current user's posts if logged in 
         # (Though Following shows them, Explore usually doesn't, but we keep this standard for discovery)
+        hidden_author_ids = []
         if profile:
-            qs = qs.exclude(author=profile)
-            
             # Exclude posts from blocked users
-            blocked_ids = _get_blocked_profile_ids(profile)
-            if blocked_ids:
-                qs = qs.exclude(author_id__in=blocked_ids)
+            hidden_author_ids = [profile.id, *_get_blocked_profile_ids(profile)]
+            qs = qs.exclude(author_id__in=hidden_author_ids)
         
-        # Tag filtering
+        next_cursor = None
         if tag:
-            normalized_tag = tag.lstrip('#').lower()
-            qs = qs.order_by("-created_at")
-            posts_pool = qs[:1000]
+            # Tag page: walk the PostTag (tag, created_at, post) index from the
+            # cursor, so every matching post is reachable however old it is
+            try:
+                limit = min(max(int(request.GET.get("limit", TAG_PAGE_SIZE)), 1), MAX_TAG_PAGE_SIZE)
+                page_ids, next_cursor = tag_page(
+                    tag, limit, cursor=request.GET.get("cursor") or None, exclude_author_ids=hidden_author_ids
+                )
+            except ValueError:
+                return response.Response({"detail": "Invalid cursor or limit."}, status=status.HTTP_400_BAD_REQUEST)
+            posts_pool = qs.filter(id__in=page_ids)
         else:
             # No tag: Get a pool of recent posts to rank
             qs = qs.order_by("-created_at")
@@ -993,6 +1016,15 @@ class PostExploreView(views.APIView):
         
         # Convert to list to avoid repeated queries and allow manual ranking
         candidate_posts = list(posts_pool)
+
+        # Posts similar to what this user liked/saved/shared (offline item-item
+        # neighbors) join the pool even when they are older than the recent window
+        recommended = PostSimilarityService.recommend_for(profile) if profile else {}
+        if recommended and not tag:
+            pooled_ids = {p.id for p in candidate_posts}
+            missing = [pid for pid in recommended if pid not in pooled_ids]
+            if missing:
+                candidate_posts.extend(qs.filter(id__in=missing, is_public=True))
         
         # For authenticated users, identify liked/saved posts in the batch
         liked_post_ids = set()
@@ -1011,30 +1043,25 @@ class PostExploreView(views.APIView):
             ).values_list('post_id', flat=True))
 
         # Ranking Algorithm
+        my_interests = set(normalize_tags(profile.interests, limit=None)) if profile else set()
         ranked_results = []
         for p in candidate_posts:
-            # Tag Filter (if requested)
-            if tag:
-                normalized_tag = tag.lstrip('#').lower()
-                post_tags = [t.lower() for t in (p.tags or [])]
-                if normalized_tag not in post_tags:
-                    continue
-            
             # Calculate Relevance Score
             score = 0
             
             # 1. Interest Match Boost (Lowered slightly to favor recency)
-            if profile and profile.interests and p.tags:
-                my_interests = [i.strip().lower() for i in profile.interests if i.strip()]
-                post_tags = [t.lower() for t in p.tags]
-                shared = set(my_interests) & set(post_tags)
+            if my_interests and p.tags:
+                shared = my_interests & set(p.tags)
                 score += len(shared) * 10 
             
-            # 2. Popularity Boost (Lowered to ensure new posts win)
+            # 2. "You may like" boost from co-engagement with the user's own likes
+            score += recommended.get(p.id, 0) * 20
+
+            # 3. Popularity Boost (Lowered to ensure new posts win)
             score += (p.annotated_likes_count * 2)
             score += (p.annotated_comments_count * 5)
             
-            # 3. Recency Weight (CRITICAL BOOST)
+            # 4. Recency Weight (CRITICAL BOOST)
             # Freshness is now the dominant factor
             hours_since = (timezone.now() - p.created_at).total_seconds() / 3600
             if hours_since < 24:
@@ -1057,11 +1084,7 @@ class PostExploreView(views.APIView):
             p = item['post']
 
             
-            author_avatar = None
-            if p.author.avatar:
-                author_avatar = request.build_absolute_uri(p.author.avatar.url)
-            else:
-                author_avatar = p.author.default_avatar_url or f"https://api.dicebear.com/7.x/avataaars/svg?seed={p.author.user.username}"
+            author_avatar = get_avatar_url_from_profile(p.author, request)
 
             is_following = False
             if profile:
@@ -1097,8 +1120,35 @@ class PostExploreView(views.APIView):
                 "explore_score": item['score'] # Debug/info field
             })
             
-        return response.Response(out)
+        resp = response.Response(out)
+        if next_cursor:
+            resp["X-Next-Cursor"] = next_cursor
+        return resp
+
+
+class SimilarPostsView(views.APIView):
+    """'More like this': a post's precomputed collaborative-filtering neighbors"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk, format=None):
+        post = get_object_or_404(Post, pk=pk)
+        try:
+            limit = min(max(int(request.GET.get("limit", 12)), 1), 50)
+        except ValueError:
+            limit = 12
+
+        neighbor_ids = PostSimilarityService.similar_post_ids(post.id)
+        qs = Post.objects.filter(id__in=neighbor_ids, is_public=True).select_related("author__user")
+        profile = _get_profile(request)
+        if profile:
+            blocked_ids = _get_blocked_profile_ids(profile)
+            if blocked_ids:
+                qs = qs.exclude(author_id__in=blocked_ids)
 
+        by_id = {p.id: p for p in qs}
+        posts = [by_id[pid] for pid in neighbor_ids if pid in by_id][:limit]
+        serializer = PostSerializer(posts, many=True, context={"request": request})
+        return response.Response(serializer.data)
 
 
 class DeleteAllThreadsView(views.APIView):
@@ -1110,12 +1160,9 @@ class DeleteAllThreadsView(views.APIView):
         if not profile:
             return response.Response(status=status.HTTP_401_UNAUTHORIZED)
         
-        # In this logic, we mark messages as deleted for the user
-        threads = ChatThread.objects.filter(participants=profile)
-        for thread in threads:
-            messages = thread.messages.all()
-            for msg in messages:
-                msg.deleted_by.add(profile)
+        from chat.models import ThreadMembership
+        # Clear history in every thread the user is in (one UPDATE of their membership rows)
+        ThreadMembership.objects.filter(profile=profile).update(history_cleared_before=timezone.now())
         
         return response.Response({"detail": "All conversations cleared from your list."}, status=status.HTTP_200_OK)
 # Add this view for creating comments on specific posts
@@ -1202,69 +1249,12 @@ class SharePostView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        from django.db import transaction
-        
-        shared_count = 0
         try:
             with transaction.atomic():
-                for target_profile_id in user_ids:
-                    try:
-                        target_profile = UserProfile.objects.get(pk=target_profile_id)
-                        if target_profile == profile:
-                            continue
-
-                        # BLOCK CHECK
-                        if target_profile.id in _get_blocked_profile_ids(profile):
-                            continue
-
-                        # Find or create a 1-on-1 thread
-                        from django.db.models import Count
-                        thread = ChatThread.objects.filter(
-                            participants=profile
-                        ).filter(
-                            participants=target_profile
-                        ).annotate(
-                            num_participants=Count('participants')
-                        ).filter(
-                            num_participants=2
-                        ).first()
-                        
-                        if not thread:
-                            thread = ChatThread.objects.create(status='active', initiator=profile)
-                            thread.participants.add(profile, target_profile)
-
-                        # Create the chat message
-                        msg_content = share_message if share_message else ""
-                        
-                        msg = ChatMessage.objects.create(
-                            thread=thread,
-                            sender=profile,
-                            content=msg_content
-                        )
-                        
-                        # Create shared post linked to the message
-                        shared_post = SharedPost.objects.create(
-                            post=post,
-                            shared_by=profile,
-                            shared_with=target_profile,
-                            chat_message=msg,
-                            message=share_message
-                        )
-                        
-                        # Create notification
-                        Notification.objects.create(
-                            user=target_profile,
-                            actor=profile,
-                            notification_type='message',
-                            message=f"{profile.user.username} shared a post with you"
-                        )
-                        shared_count += 1
-                        
-                    except UserProfile.DoesNotExist:
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error sharing post: {e}")
-                        continue
+                result = PostService.bulk_share(
+                    profile, post, user_ids, share_message, request=request, notification_type='message'
+                )
+                shared_count = result['shared_count']
 
                 # Track share event (use get_or_create to avoid duplicates)
                 UserEvent.objects.get_or_create(
@@ -1272,32 +1262,18 @@ class SharePostView(views.APIView):
                     post=post,
                     event_type="share"
                 )
-                
-                # If we shared with exactly one user, return the thread id for redirection
-                last_thread_id = None
-                if len(user_ids) == 1:
-                    try:
-                        target_profile = UserProfile.objects.get(pk=user_ids[0])
-                        thread = ChatThread.objects.filter(
-                            participants=profile
-                        ).filter(
-                            participants=target_profile
-                        ).annotate(
-                            num_participants=Count('participants')
-                        ).filter(
-                            num_participants=2
-                        ).first()
-                        if thread:
-                            last_thread_id = thread.id
-                    except:
-                        pass
 
-                return response.Response({
-                    "status": "success",
-                    "shared_count": shared_count,
-                    "thread_id": last_thread_id,
-                    "message": f"Post shared with {shared_count} users"
-                })
+            # If we shared with exactly one user, return the thread id for redirection
+            last_thread_id = None
+            if len(result['threads']) == 1 and len(user_ids) == 1:
+                last_thread_id = next(iter(result['threads'].values()))
+
+            return response.Response({
+                "status": "success",
+                "shared_count": shared_count,
+                "thread_id": last_thread_id,
+                "message": f"Post shared with {shared_count} users"
+            })
         except Exception as e:
              logger.error(f"Transaction failed: {e}")
              return response.Response(
@@ -1387,11 +1363,11 @@ class PostsFeedView(views.APIView):
         if profile:
             # Q(author=profile) -> My posts
             # Q(is_public=True) -> All public posts
-            # Q(author__followers__follower=profile) -> Posts by authors I follow
+            # Q(author__followers_set__follower=profile) -> Posts by authors I follow
             qs = Post.objects.filter(
                 Q(author=profile) | 
                 Q(is_public=True) | 
-                Q(author__followers__follower=profile)
+                Q(author__followers_set__follower=profile)
             ).distinct()
             
             # EXCLUDE posts from blocked users
@@ -1467,10 +1443,27 @@ class FollowingPostsView(views.APIView):
 # Events
 # -------------------------
 class EventCreate(generics.CreateAPIView):
+    """
+    Record a like/save/share event. Views are not written here: they go to the
+    impression buffer (core/events.py) and are flushed in bulk.
+    """
     queryset = UserEvent.objects.all()
     serializer_class = UserEventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def create(self, request, *args, **kwargs):
+        if request.data.get('event_type') != 'view':
+            return super().create(request, *args, **kwargs)
+        profile = _get_profile(request)
+        if profile is None:
+            raise permissions.PermissionDenied("Authenticated user with profile required")
+        try:
+            post_id = int(request.data.get('post'))
+        except (TypeError, ValueError):
+            return response.Response({"detail": "post is required"}, status=status.HTTP_400_BAD_REQUEST)
+        record_view(profile, post_id, source=str(request.data.get('source', '')))
+        return response.Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
+
     def perform_create(self, serializer):
         profile = _get_profile(self.request)
         if profile is None:
@@ -1478,6 +1471,35 @@ class EventCreate(generics.CreateAPIView):
         serializer.save(user=profile)
 
 
+class ImpressionBatchView(views.APIView):
+    """
+    Report posts shown to the current user: POST {"source": "feed", "post_ids": [1, 2, 3]}.
+    Buffered and deduplicated in memory; nothing is written during the request.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        profile = _get_profile(request)
+        if not profile:
+            return response.Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        post_ids = request.data.get('post_ids', [])
+        if not isinstance(post_ids, list):
+            return response.Response({"detail": "post_ids must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            post_ids = list(dict.fromkeys(int(pid) for pid in post_ids))
+        except (TypeError, ValueError):
+            return response.Response({"detail": "post_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(post_ids) > MAX_IMPRESSION_BATCH:
+            return response.Response(
+                {"detail": f"At most {MAX_IMPRESSION_BATCH} post_ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        accepted = record_impressions(profile, post_ids, source=str(request.data.get('source', '')))
+        return response.Response({"accepted": accepted}, status=status.HTTP_202_ACCEPTED)
+
+
 # -------------------------
 # Recommendations
 # -------------------------
@@ -1515,6 +1537,54 @@ class RecommendationView(views.APIView):
                 suggestions.add(token.lstrip("#"))
         return response.Response({"recommendations": list(suggestions)[:8]})
 
+class SuggestedUsersView(views.APIView):
+    """
+    People you may like, served from the user's precomputed snapshot.
+    Stale snapshots are returned as-is while a refresh runs in the background.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        profile = _get_profile(request)
+        if not profile:
+            return response.Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        snapshot = read_snapshot(profile)
+        if snapshot is None:
+            return response.Response({"results": [], "computed_at": None, "stale": True})
+
+        # Follows and blocks made since the snapshot was computed still apply
+        items = snapshot.items
+        hidden = set(Follow.objects.filter(
+            follower=profile, followee_id__in=[item["profile_id"] for item in items]
+        ).values_list("followee_id", flat=True))
+        hidden |= set(_get_blocked_profile_ids(profile))
+        profiles = UserProfile.objects.select_related("user").filter(user__is_active=True).in_bulk(
+            [item["profile_id"] for item in items if item["profile_id"] not in hidden]
+        )
+
+        results = []
+        for item in items:
+            other = profiles.get(item["profile_id"])
+            if other is None:
+                continue
+            results.append({
+                "id": other.id,
+                "user_id": other.user.id,
+                "username": other.user.username,
+                "nickname": other.nickname or "",
+                "avatar": get_avatar_url_from_profile(other, request),
+                "score": item["score"],
+                "reason": item["reason"],
+                "matched_tags": item["matched_tags"],
+                "activity_badge": item["activity_badge"],
+            })
+        return response.Response({
+            "results": results,
+            "computed_at": snapshot.computed_at,
+            "stale": is_stale(snapshot),
+        })
+
 # Replace your existing DiscoverView in core/views.py with this enhanced version
 # Add this import at the top of core/views.py
 from django.utils import timezone
@@ -1568,7 +1638,6 @@ class DiscoverView(views.APIView):
                     Q(user__first_name__icontains=search_query) |
                     Q(user__last_name__icontains=search_query)
                 )
-                logger.info(f"[DiscoverView] Applied search filter, {others_qs.count()} users match search")
                 
             # Handle guest users (no authentication)
             if not profile:
@@ -1636,13 +1705,9 @@ class DiscoverView(views.APIView):
                 my_posts = list(my_posts_qs)
             logger.info(f"[DiscoverView] Found {len(my_posts)} posts matching filter '{filter_type}'")
             
-            for post in my_posts:
-                if post.tags:
-                    normalized_tags = [t.lower().strip() for t in post.tags if t and t.strip()]
-                    my_tags.update(normalized_tags)
-                    logger.info(f"[DiscoverView] Post {post.id} has tags: {post.tags} -> normalized: {normalized_tags}")
-                else:
-                    logger.info(f"[DiscoverView] Post {post.id} has NO tags")
+            my_tags.update(
+                PostTag.objects.filter(post__in=my_posts).values_list('tag__name', flat=True).distinct()
+            )
             
             logger.info(f"[DiscoverView] User's FINAL TAGS: {sorted(list(my_tags))}")
 
@@ -1654,77 +1719,59 @@ class DiscoverView(views.APIView):
                     "message": "Start posting with #hashtags to discover people with similar interests!"
                 })
             
-            # Find matches based on shared hashtags
+            # Rank people by cosine similarity of IDF-weighted tag vectors
+            # (core/user_embeddings.py) instead of scanning profiles one by one
+            my_vector = tag_vector(tag_counts(post.tags for post in my_posts))
+            index = get_user_index()
+            if search_query:
+                # Search narrows the set in SQL; similarity only orders it
+                candidates = list(others_qs[:500])
+                scores = index.score(my_vector, [p.id for p in candidates])
+                ranked = sorted(candidates, key=lambda p: scores[p.id], reverse=True)
+            else:
+                nearest = index.query(my_vector, k=limit * 3, exclude={profile.id})
+                scores = dict(nearest)
+                allowed = others_qs.filter(id__in=list(scores))
+                if their_time_filter:
+                    # Only people who posted within their window
+                    allowed = allowed.filter(tag_vector__latest_post_at__gte=their_time_filter)
+                by_id = {p.id: p for p in allowed}
+                ranked = [by_id[pid] for pid, _ in nearest if pid in by_id]
+            logger.info(f"[DiscoverView] Ranked {len(ranked)} candidate profiles by tag similarity")
+
+            # Shared tags for the reason line, from one query over the shortlisted people
+            other_tags_qs = PostTag.objects.filter(post__author__in=ranked[:limit * 2], is_public=True)
+            if their_time_filter:
+                other_tags_qs = other_tags_qs.filter(created_at__gte=their_time_filter)
+            tags_by_author = {}
+            for author_id, tag_name in other_tags_qs.values_list('post__author_id', 'tag__name').distinct():
+                tags_by_author.setdefault(author_id, set()).add(tag_name)
+
             matches = []
-            other_profiles = list(others_qs[:500])  # Check up to 500 users for matches
-            logger.info(f"[DiscoverView] Checking {len(other_profiles)} other profiles for matches")
-            
-            for other_profile in other_profiles:
-                try:
-                    # Apply search filter first if provided (optimization)
-                    is_search_match = False
-                    if search_query:
-                        username_match = search_query in other_profile.user.username.lower()
-                        bio_match = search_query in (other_profile.bio or '').lower()
-                        nickname_match = search_query in (other_profile.nickname or '').lower()
-                        is_search_match = username_match or bio_match or nickname_match
-                        
-                        if not is_search_match and not my_tags:
-                            continue # No search match and no tags to check
-
-                    # Collect tags and check for overlap
-                    # Apply the same time filter to other users' posts
-                    other_posts_qs = Post.objects.filter(
-                        author=other_profile, 
-                        is_public=True
-                    ).order_by('-created_at', '-id')
-                    
-                    # Apply THEIR time filter (longer window)
-                    if their_time_filter:
-                        other_posts_qs = other_posts_qs.filter(created_at__gte=their_time_filter)
-                    
-                    other_posts = list(other_posts_qs[:100])
-                    
-                    # Skip users with no posts in the filtered time range
-                    if not other_posts and filter_type != 'all_time':
-                        continue
-                    
-                    other_tags = set()
-                    for post in other_posts:
-                        if post.tags:
-                            normalized_tags = [t.lower().strip() for t in post.tags if t and t.strip()]
-                            other_tags.update(normalized_tags)
-                    
-                    common_tags = my_tags & other_tags
-                    
-                    # Include if search matches OR has common tags
-                    if is_search_match or common_tags:
-                        shared_tags_list = sorted(list(common_tags))
-                        
-                        if common_tags:
-                            reason = f"You both post about #{shared_tags_list[0]}"
-                            if len(shared_tags_list) > 1:
-                                reason += f" and #{shared_tags_list[1]}"
-                        else:
-                            reason = "Matched your search"
-
-                        matches.append({
-                            "data": other_profile,
-                            "reason": reason,
-                            "shared_count": len(common_tags),
-                            "tags": list(other_tags)[:5],
-                            "is_match": True,
-                            "shared_tags": shared_tags_list[:3],
-                            "is_search_match": is_search_match
-                        })
-                except Exception as e:
-                    logger.error(f"[DiscoverView] Error processing profile {other_profile.id}: {e}")
+            for other_profile in ranked[:limit * 2]:
+                other_tags = tags_by_author.get(other_profile.id, set())
+                common_tags = my_tags & other_tags
+                # Hash collisions can score people with nothing actually in common
+                if not common_tags and not search_query:
                     continue
-            
-            logger.info(f"[DiscoverView] Found {len(matches)} total matches")
+                shared_tags_list = sorted(common_tags)
+                if common_tags:
+                    reason = f"You both post about #{shared_tags_list[0]}"
+                    if len(shared_tags_list) > 1:
+                        reason += f" and #{shared_tags_list[1]}"
+                else:
+                    reason = "Matched your search"
+                matches.append({
+                    "data": other_profile,
+                    "reason": reason,
+                    "shared_count": len(common_tags),
+                    "tags": list(other_tags)[:5],
+                    "is_match": True,
+                    "shared_tags": shared_tags_list[:3],
+                    "is_search_match": bool(search_query)
+                })
 
-            # Sort by search match priority then number of shared hashtags (descending)
-            matches.sort(key=lambda x: (x.get('is_search_match', False), x['shared_count']), reverse=True)
+            logger.info(f"[DiscoverView] Found {len(matches)} total matches")
             
             # Build response
             results = []
@@ -1774,14 +1821,7 @@ class DiscoverView(views.APIView):
                     restriction_type='block'
                 ).exists()
             
-            # Build avatar URL
-            avatar_url = None
-            if user_profile.avatar:
-                avatar_url = request.build_absolute_uri(user_profile.avatar.url)
-            elif user_profile.default_avatar_url:
-                avatar_url = user_profile.default_avatar_url
-            else:
-                avatar_url = f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_profile.user.username}"
+            avatar_url = get_avatar_url_from_profile(user_profile, request)
                 
             return {
                 "id": user_profile.id,
@@ -1803,7 +1843,7 @@ class DiscoverView(views.APIView):
                 "id": user_profile.id,
                 "user_id": user_profile.user.id,
                 "username": user_profile.user.username,
-                "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_profile.user.username}",
+                "avatar": generate_default_avatar_url(user_profile.user.username, request=request),
                 "bio": "",
                 "nickname": "",
                 "is_following": False,
@@ -1825,31 +1865,15 @@ class TrendingTagsView(views.APIView):
             limit = int(request.GET.get('limit', 15))
             days = int(request.GET.get('days', 30))
             
-            # Get posts from the last N days
+            # Count public posts per tag over the last N days in SQL
             cutoff = timezone.now() - timedelta(days=days)
-            posts = Post.objects.filter(
+            trending = PostTag.objects.filter(
                 created_at__gte=cutoff,
                 is_public=True
-            ).values_list('tags', flat=True)
-            
-            # Count tag frequency
-            tag_frequency = {}
-            for tags_list in posts:
-                if tags_list:
-                    for tag in tags_list:
-                        clean_tag = tag.lower().strip()
-                        if clean_tag:
-                            tag_frequency[clean_tag] = tag_frequency.get(clean_tag, 0) + 1
-            
-            # Sort by frequency and return top N
-            trending = sorted(
-                tag_frequency.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:limit]
+            ).values('tag__name').annotate(uses=Count('id')).order_by('-uses', 'tag__name')[:limit]
             
             # Return only tag names (not counts for privacy)
-            result = [tag for tag, count in trending]
+            result = [row['tag__name'] for row in trending]
             
             logger.info(f"[TrendingTags] Returning {len(result)} trending tags")
             
@@ -1901,6 +1925,38 @@ class DebugMyPostsView(views.APIView):
         return response.Response(result)
 
 
+class RequestProfileListView(views.APIView):
+    """
+    Staff only: recent sampled request profiles from this process (see core/profiling.py),
+    newest first. ?path=/api/chat/ filters by path prefix, ?limit= caps the list.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, format=None):
+        try:
+            limit = max(1, int(request.GET.get('limit', 100)))
+        except ValueError:
+            return response.Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        entries = profile_buffer.entries(path=request.GET.get('path'), limit=limit)
+        return response.Response({'count': len(entries), 'results': entries})
+
+
+def metrics_view(request):
+    """
+    This worker's metrics in the Prometheus text format (see core/metrics.py).
+    Staff session, or "Authorization: Bearer <METRICS_TOKEN>" for a scraper.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    authorized = (
+        (token and header.startswith('Bearer ') and hmac.compare_digest(header[7:], token))
+        or (request.user.is_authenticated and request.user.is_staff)
+    )
+    if not authorized:
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # -------------------------
 # Duplicate class removed. Use the one starting at line 1184 instead.
 
@@ -1938,7 +1994,7 @@ class FollowUser(views.APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        obj, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+        created = FollowService.follow(follower, followee)
         if created:
              Notification.objects.create(
                 user=followee,
@@ -1947,7 +2003,7 @@ class FollowUser(views.APIView):
                 message=f"{follower.user.username} started following you"
              )
         
-        return response.Response({"status": "ok", "followers_count": followee.followers.count(), "is_following": True})
+        return response.Response({"status": "ok", "followers_count": FollowService.get_followers_count(followee), "is_following": True})
 
 
 class UnfollowUser(views.APIView):
@@ -1958,8 +2014,8 @@ class UnfollowUser(views.APIView):
         followee = _get_profile_by_id_or_uuid(pk)
         
         if followee:
-            Follow.objects.filter(follower=follower, followee=followee).delete()
-            return response.Response({"status": "ok", "followers_count": followee.followers.count(), "is_following": False})
+            FollowService.unfollow(follower, followee)
+            return response.Response({"status": "ok", "followers_count": FollowService.get_followers_count(followee), "is_following": False})
             
         return response.Response({"status": "ok"})
 
@@ -2050,7 +2106,9 @@ class PostUpdateView(views.APIView):
                 tags = re.findall(r"#(\w+)", content)
                 serializer.validated_data['tags'] = tags
             
-            serializer.save()
+            post = serializer.save()
+            if 'image' in serializer.validated_data and post.image:
+                transaction.on_commit(lambda: MediaService.enqueue_post_image(post.id))
             return response.Response(serializer.data)
         return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -2167,36 +2225,6 @@ class NotificationUnreadCountView(views.APIView):
         unread_count = qs.count()
         return response.Response({"unread_count": unread_count})
 
-class DefaultAvatarListView(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
-
-    def get(self, request, format=None):
-        # Different styles for more variety
-        styles = ['avataaars', 'thumbs', 'shapes', 'fun-emoji', 'bottts-neutral']
-        seeds = [
-            'Felix', 'Aneka', 'Mason', 'Jocelyn', 'Ginger', 
-            'Sunny', 'Joy', 'Bibi', 'Bella', 'Sam',
-            'Leo', 'Ruby', 'Oliver', 'Lucy', 'Milo',
-            'Sasha', 'Bear', 'Roxy', 'Nala', 'Rocky'
-        ]
-        
-        avatars = []
-        for style in styles:
-            for seed in seeds:
-                # Add specific parameters for each style to make them look premium
-                params = ""
-                if style == 'avataaars':
-                    params = "&mouth=smile&eyes=happy"
-                elif style == 'fun-emoji':
-                    params = "&rotate=10"
-                
-                avatars.append(f"https://api.dicebear.com/7.x/{style}/svg?seed={seed}{params}")
-                
-        # Shuffle for variety
-        import random
-        random.shuffle(avatars)
-        
-        return response.Response({"avatars": avatars[:100]}) # Return a good variety
 class PasswordResetRequestView(views.APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -2303,6 +2331,44 @@ class CheckFollowingStatusView(views.APIView):
             )
 
 
+class RelationshipStatusView(views.APIView):
+    """
+    Relationship bitmasks between the current user and up to
+    MAX_RELATIONSHIP_IDS profiles: GET ?ids=1,2,3 or POST {"ids": [1, 2, 3]}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        return self._resolve(request, request.query_params.get('ids', '').split(','))
+
+    def post(self, request, format=None):
+        ids = request.data.get('ids', [])
+        if not isinstance(ids, list):
+            return response.Response({"detail": "ids must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._resolve(request, ids)
+
+    def _resolve(self, request, raw_ids):
+        profile = _get_profile(request)
+        if not profile:
+            return response.Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            ids = list(dict.fromkeys(int(pid) for pid in raw_ids if str(pid).strip()))
+        except (TypeError, ValueError):
+            return response.Response({"detail": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_RELATIONSHIP_IDS:
+            return response.Response(
+                {"detail": f"At most {MAX_RELATIONSHIP_IDS} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        masks = RelationshipService.resolve(profile, ids)
+        return response.Response({
+            "bits": RELATIONSHIP_BITS,
+            "relationships": {str(pid): masks[pid] for pid in ids},
+        })
+
+
 class UserProfileByIdView(views.APIView):
     """Get user profile by profile ID (not user ID)"""
     permission_classes = [permissions.IsAuthenticated]
@@ -2403,13 +2469,7 @@ class FollowingPostsListView(views.APIView):
             likes_count = UserEvent.objects.filter(post=p, event_type="like").count()
             comments_count = p.comments.count()
             
-            author_avatar = None
-            if p.author.default_avatar_url:
-                author_avatar = p.author.default_avatar_url
-            elif p.author.avatar:
-                author_avatar = request.build_absolute_uri(p.author.avatar.url)
-            else:
-                author_avatar = f"https://api.dicebear.com/7.x/avataaars/svg?seed={p.author.user.username}&mouth=smile&eyes=happy"
+            author_avatar = get_avatar_url_from_profile(p.author, request)
 
             # Check if following and blocked
             is_following = Follow.objects.filter(follower=profile, followee=p.author).exists()
@@ -2453,6 +2513,14 @@ class FollowingPostsListView(views.APIView):
         return response.Response(out)
 
 
+def _default_avatar_samples(request):
+    """Sample avatars offered in the picker (fixed seeds), as absolute URLs for this request"""
+    return [
+        {'id': f"avatar_{i}", 'url': generate_default_avatar_url(f"seed_{i + 100}", request=request)}
+        for i in range(20)
+    ]
+
+
 class DefaultAvatarListView(views.APIView):
     """
     Returns a list of predefined default avatar samples.
@@ -2460,20 +2528,5 @@ class DefaultAvatarListView(views.APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, format=None):
-        from .utils.avatar_utils import generate_default_avatar_url
-        
-        avatars = []
-        styles = ['avataaars', 'big-smile', 'bottts', 'fun-emoji', 'pixel-art', 'thumbs']
-        
-        # Generate 20 diverse samples
-        for i in range(20):
-            style = styles[i % len(styles)]
-            seed = f"seed_{i+100}"
-            url = f"https://api.dicebear.com/7.x/{style}/svg?seed={seed}&backgroundColor=b6e3f4,c0aede,d1d4f9"
-            avatars.append({
-                'id': f"avatar_{i}",
-                'url': url
-            })
-            
-        return response.Response({'avatars': avatars})
+        return response.Response({'avatars': _default_avatar_samples(request)})
 
@@ -5,7 +5,7 @@ import random
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 django.setup()
 
-from chat.models import ChatThread, UserProfile
+from chat.models import ChatThread, ThreadMembership, UserProfile
 
 def create_test_groups():
     users = list(UserProfile.objects.all()[:10])
@@ -27,7 +27,7 @@ def create_test_groups():
             status='active'
         )
         thread.participants.add(*members)
-        thread.admins.add(members[0])
+        thread.set_member_state(members[0], role=ThreadMembership.ROLE_ADMIN)
         
         print(f"Created group: {group_name} with {len(members)} members. Owner: {members[0].user.username}")
 
@@ -6,6 +6,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import core.routing
+from core.metrics import WebSocketMetricsMiddleware
 
 django_asgi_app = get_asgi_application()
 
@@ -13,9 +14,9 @@ from channels.security.websocket import AllowedHostsOriginValidator
 
 application = ProtocolTypeRouter({
 	"http": django_asgi_app,
-	"websocket": AuthMiddlewareStack(
+	"websocket": WebSocketMetricsMiddleware(AuthMiddlewareStack(
         URLRouter(
             core.routing.websocket_urlpatterns
         )
-    ),
+    )),
 })
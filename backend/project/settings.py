@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'core.profiling.RequestProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -132,6 +134,62 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background media pipeline (core/background.py)
+# Thumbnails, EXIF stripping and duration probing run off the request thread.
+BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER', 'False').lower() in ('1', 'true', 'yes')
+BACKGROUND_THREAD_WORKERS = int(os.environ.get('BACKGROUND_THREAD_WORKERS', '4'))
+MEDIA_PROCESSING_WORKERS = int(os.environ.get('MEDIA_PROCESSING_WORKERS', '2'))
+
+# Write-behind impression/view ingestion (core/events.py)
+# Events are deduplicated per window in memory and flushed in bulk.
+EVENT_FLUSH_INTERVAL = int(os.environ.get('EVENT_FLUSH_INTERVAL', '10'))  # seconds
+EVENT_BUFFER_MAX = int(os.environ.get('EVENT_BUFFER_MAX', '5000'))  # flush early past this many
+IMPRESSION_DEDUP_WINDOW = int(os.environ.get('IMPRESSION_DEDUP_WINDOW', '1800'))  # seconds
+
+# Similar-user search for Discover (core/user_embeddings.py)
+# Each process reloads changed tag vectors at most this often.
+USER_INDEX_REFRESH_SECONDS = int(os.environ.get('USER_INDEX_REFRESH_SECONDS', '60'))
+
+# Precomputed "people you may like" (core/recommendation_snapshots.py)
+RECOMMENDATION_SNAPSHOT_TTL = int(os.environ.get('RECOMMENDATION_SNAPSHOT_TTL', str(6 * 60 * 60)))  # seconds
+RECOMMENDATION_ACTIVE_DAYS = int(os.environ.get('RECOMMENDATION_ACTIVE_DAYS', '14'))  # skip users idle longer
+
+# Store uploaded media once per unique content (core/storage.py)
+MEDIA_CONTENT_ADDRESSED = os.environ.get('MEDIA_CONTENT_ADDRESSED', 'True').lower() in ('1', 'true', 'yes')
+
+# Media serving (core/media_views.py)
+# Set to 'nginx' (X-Accel-Redirect) or 'xsendfile' (X-Sendfile) to let the
+# front-end server stream full files; the view still does access checks.
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_SENDFILE_URL_PREFIX = os.environ.get('MEDIA_SENDFILE_URL_PREFIX', '/protected-media/')
+
+# Resumable chat uploads (chat/upload_views.py)
+# Partial files live outside MEDIA_ROOT so they are never served.
+CHAT_UPLOAD_TEMP_DIR = os.environ.get('CHAT_UPLOAD_TEMP_DIR', str(BASE_DIR / 'upload_tmp'))
+CHAT_UPLOAD_CHUNK_SIZE = 1024 * 1024  # suggested to clients
+CHAT_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHAT_UPLOAD_CHUNK_CLAIM_SECONDS = 300  # a chunk claim older than this is treated as abandoned
+CHAT_UPLOAD_SESSION_TTL_HOURS = 24
+
+# Per-request instrumentation (core/profiling.py)
+# Sampled and slow requests are kept for staff at /api/internal/profiles/.
+# Responses to staff carry a Server-Timing breakdown; REQUEST_PROFILING_SERVER_TIMING
+# sends it to everyone (local development only: query counts reveal which
+# privacy/block branch a request took). Set REQUEST_PROFILING_DUMP_DIR to also
+# write cProfile dumps of sampled requests slower than SLOW_MS.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'True').lower() in ('1', 'true', 'yes')
+REQUEST_PROFILING_SERVER_TIMING = os.environ.get('REQUEST_PROFILING_SERVER_TIMING', 'False').lower() in ('1', 'true', 'yes')
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '0.05'))
+REQUEST_PROFILING_SLOW_MS = int(os.environ.get('REQUEST_PROFILING_SLOW_MS', '500'))  # 0 disables
+REQUEST_PROFILING_BUFFER_SIZE = int(os.environ.get('REQUEST_PROFILING_BUFFER_SIZE', '500'))
+REQUEST_PROFILING_DUMP_DIR = os.environ.get('REQUEST_PROFILING_DUMP_DIR') or None
+
+# Prometheus-style metrics (core/metrics.py), per worker process
+# Served at /api/internal/metrics/ to staff, or to a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # settings.py
 AI_FEATURES_ENABLED = os.environ.get('AI_FEATURES_ENABLED', 'True').lower() in ('1', 'true', 'yes')
@@ -154,9 +212,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'upload-offset',
+    'content-range',
 ]
 
-CORS_EXPOSE_HEADERS = ['Set-Cookie']
+CORS_EXPOSE_HEADERS = ['Set-Cookie', 'X-Next-Cursor', 'Server-Timing', 'Upload-Offset']
 CORS_ALLOW_CREDENTIALS = True
 # Optional: For development, you can be less restrictive
 # CAUTION: CORS_ALLOW_ALL_ORIGINS cannot be True if CORS_ALLOW_CREDENTIALS is True
@@ -1,7 +1,7 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from core.media_views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,8 +11,7 @@ urlpatterns = [
     
     # Mount chat app
     path('api/chat/', include('chat.urls')),
-]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # User-uploaded media (range requests, ETags, chat attachment access checks)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+]